@@ -0,0 +1,84 @@
+"""
+Cold-start import time of the bot and worker processes.
+
+Each measurement runs in a fresh interpreter with `python -X importtime`,
+so nothing is cached in sys.modules. Reports the median total over
+several runs and the slowest top-level packages of the last run.
+
+Usage:
+    python benchmarks/import_time.py [--runs 5] [--top 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# What each process imports before it can serve its first update / task
+TARGETS = {
+    # bot.py imports (the module itself builds the AsyncTeleBot and validates config)
+    "bot": [
+        "aiohttp", "telebot.async_telebot", "core.state_manager", "db.async_database", "db.write_behind",
+        "tasks.blob_store", "tasks.events", "tasks.telegram_files", "tasks.signatures",
+    ],
+    # The Celery worker imports celery_app's include list
+    "worker": ["tasks.tasks", "tasks.events"],
+}
+
+
+def _measure(modules: List[str]) -> Tuple[float, Dict[str, float]]:
+    """Total import time (s) and cumulative time per top-level package"""
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total = 0
+    packages: Dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level
+        if not name[1:].startswith(" "):
+            # Top-level import: its cumulative time covers everything below it
+            total += int(cumulative)
+            packages[name.strip().split(".")[0]] += int(cumulative) / 1e6
+    return total / 1e6, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for target, modules in TARGETS.items():
+        try:
+            timings = []
+            for _ in range(args.runs):
+                total, packages = _measure(modules)
+                timings.append(total)
+        except RuntimeError as e:
+            print(f"{target}: import failed: {e}")
+            continue
+
+        print(f"{target}: median {statistics.median(timings):.3f}s over {args.runs} runs "
+              f"(min {min(timings):.3f}s, max {max(timings):.3f}s)")
+        slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for package, seconds in slowest:
+            print(f"    {package:<28} {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,35 +2,50 @@
 SMM Bot - Main bot file
 Intuitive multi-tool for SMM specialists
 """
-import telebot
+import asyncio
+from urllib.parse import urlparse
+
+from aiohttp import web
 from telebot import types
-import time
-import base64
+from telebot.async_telebot import AsyncTeleBot
 from io import BytesIO
 
-from core.config import BOT_TOKEN, validate_config
-from core.state_manager import state_manager
-from db.database import db
-from tasks.celery_app import celery_app
-from tasks.tasks import (
+from core.config import (
+    BOT_TOKEN, WORKER_FILE_FETCH, WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_SECRET,
+    CHAT_TIMEOUT, validate_config
+)
+from core.state_manager import async_state_manager as state_manager
+from db.async_database import async_db
+from db.write_behind import write_behind
+from tasks.blob_store import get_blob_store
+from tasks.events import task_dispatcher
+from tasks.telegram_files import telegram_ref
+from tasks.signatures import (
     analyze_channel_task,
     generate_posts_task,
-    fetch_news_task,
-    generate_post_from_news_task,
+    generate_post_ideas_task,
     generate_image_task,
     edit_image_task,
     remove_watermark_task,
     add_watermark_task,
+    remove_background_task,
+    transcribe_audio_task,
+    generate_video_task,
+    image_to_video_task,
     translate_text_task,
     advanced_tts_task,
-    chat_with_ai_task
+    chat_with_ai_task,
+    submit
 )
 
 # Validate config
 validate_config()
 
-# Initialize bot
-bot = telebot.TeleBot(BOT_TOKEN, parse_mode="HTML")
+# Initialize bot (handlers run as coroutines on one event loop)
+bot = AsyncTeleBot(BOT_TOKEN, parse_mode="HTML")
+
+# Media is exchanged with workers by blob reference
+blob_store = get_blob_store()
 
 # Constants
 STATES = {
@@ -55,6 +70,17 @@ STATES = {
 }
 
 
+async def media_ref_for(file_id: str) -> str:
+    """Reference to an uploaded Telegram file for workers"""
+    if WORKER_FILE_FETCH:
+        # Worker downloads the file itself, the update loop stays free
+        return telegram_ref(file_id)
+
+    file_info = await bot.get_file(file_id)
+    data = await bot.download_file(file_info.file_path)
+    return await asyncio.to_thread(blob_store.put, data)
+
+
 # ===== KEYBOARDS =====
 
 def main_menu_keyboard():
@@ -231,24 +257,24 @@ def image_to_video_model_keyboard():
 # ===== START & HELP =====
 
 @bot.message_handler(commands=['start'])
-def start_handler(message):
+async def start_handler(message):
     """Start command handler"""
     user_id = message.from_user.id
     username = message.from_user.username
     first_name = message.from_user.first_name
 
     # Clear any existing state
-    state_manager.clear_state(user_id)
-    state_manager.clear_user_data(user_id)
+    await state_manager.clear_state(user_id)
+    await state_manager.clear_user_data(user_id)
 
-    # Add user to database
-    db.add_user(user_id, username, first_name)
+    # Add user to database (buffered, flushed in batches)
+    await write_behind.add_user_async(user_id, username, first_name)
 
     # Show main menu
-    show_main_menu(message)
+    await show_main_menu(message)
 
 
-def show_main_menu(message):
+async def show_main_menu(message):
     """Show main menu"""
     welcome_text = """👋 <b>Добро пожаловать в SMM Bot!</b>
 
@@ -269,7 +295,7 @@ def show_main_menu(message):
 
 Выберите категорию из меню ниже."""
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         welcome_text,
         reply_markup=main_menu_keyboard()
@@ -277,7 +303,7 @@ def show_main_menu(message):
 
 
 @bot.message_handler(commands=['help'])
-def help_handler(message):
+async def help_handler(message):
     """Help command handler"""
     help_text = """<b>📚 Справка по SMM Bot</b>
 
@@ -366,16 +392,16 @@ def help_handler(message):
 • Изображения оптимизированы для Telegram
 • Чем подробнее промпт, тем лучше результат"""
 
-    bot.send_message(message.chat.id, help_text)
+    await bot.send_message(message.chat.id, help_text)
 
 
 # ===== MENU BUTTON HANDLERS =====
 
 # Category handlers
 @bot.message_handler(func=lambda m: m.text == "📝 Текст")
-def text_category_handler(message):
+async def text_category_handler(message):
     """Text category handler"""
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "📝 <b>Текст</b>\n\n"
         "Выберите операцию:",
@@ -384,9 +410,9 @@ def text_category_handler(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "🎨 Изображения")
-def image_category_handler(message):
+async def image_category_handler(message):
     """Image category handler"""
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🎨 <b>Изображения</b>\n\n"
         "Выберите операцию:",
@@ -395,9 +421,9 @@ def image_category_handler(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "🎬 Видео")
-def video_category_handler(message):
+async def video_category_handler(message):
     """Video category handler"""
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🎬 <b>Видео</b>\n\n"
         "Выберите операцию:",
@@ -406,9 +432,9 @@ def video_category_handler(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "📊 Анализ")
-def analytics_category_handler(message):
+async def analytics_category_handler(message):
     """Analytics category handler"""
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "📊 <b>Анализ</b>\n\n"
         "Выберите операцию:",
@@ -417,9 +443,9 @@ def analytics_category_handler(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "🎵 Аудио")
-def audio_category_handler(message):
+async def audio_category_handler(message):
     """Audio category handler (New 2025)"""
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🎵 <b>Аудио</b>\n\n"
         "Выберите операцию:\n"
@@ -431,20 +457,20 @@ def audio_category_handler(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "🔙 Назад")
-def back_button_handler(message):
+async def back_button_handler(message):
     """Back button handler"""
-    show_main_menu(message)
+    await show_main_menu(message)
 
 
 # Existing menu handlers (updated)
 @bot.message_handler(func=lambda m: m.text in ["📊 Analyze Channel", "📊 Анализ канала"])
-def analyze_channel_button(message):
+async def analyze_channel_button(message):
     """Analyze channel button handler"""
     user_id = message.from_user.id
 
-    state_manager.set_state(user_id, STATES["WAITING_CHANNEL"])
+    await state_manager.set_state(user_id, STATES["WAITING_CHANNEL"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "📊 <b>Анализ канала</b>\n\n"
         "Отправьте мне username канала в формате: <code>@имя_канала</code>\n\n"
@@ -454,15 +480,15 @@ def analyze_channel_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text in ["✍️ Generate Post", "✍️ Создать пост"])
-def generate_post_button(message):
+async def generate_post_button(message):
     """Generate post button handler"""
     user_id = message.from_user.id
 
     # Get all user's channels
-    channels = db.get_user_channels(user_id)
+    channels = await async_db.get_user_channels(user_id)
 
     if not channels:
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "❌ У вас нет проанализированных каналов!\n\n"
             "Используйте 📊 Анализ канала для начала."
@@ -474,10 +500,10 @@ def generate_post_button(message):
         channel_id = channels[0]['id']
         channel_title = channels[0]['channel_title'] or channels[0]['channel_url']
 
-        state_manager.set_data(user_id, "selected_channel_id", channel_id)
-        state_manager.set_state(user_id, STATES["WAITING_TOPIC"])
+        await state_manager.set_data(user_id, "selected_channel_id", channel_id)
+        await state_manager.set_state(user_id, STATES["WAITING_TOPIC"])
 
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             f"✍️ <b>Создать пост</b>\n\n"
             f"📺 Канал: <b>{channel_title}</b>\n\n"
@@ -500,7 +526,7 @@ def generate_post_button(message):
             )
         )
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "✍️ <b>Создать пост</b>\n\n"
         "Выберите канал для генерации поста:",
@@ -511,13 +537,13 @@ def generate_post_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text in ["🎨 Create Image", "🎨 Создать картинку", "🆕 Создать картинку"])
-def create_image_button(message):
+async def create_image_button(message):
     """Create image button handler"""
     user_id = message.from_user.id
 
-    state_manager.set_state(user_id, STATES["WAITING_IMAGE_PROMPT"])
+    await state_manager.set_state(user_id, STATES["WAITING_IMAGE_PROMPT"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🎨 <b>Создать картинку с AI</b>\n\n"
         "Опишите изображение, которое хотите создать.\n"
@@ -532,13 +558,13 @@ def create_image_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text in ["✏️ Edit Image", "✏️ Редактировать фото"])
-def edit_image_button(message):
+async def edit_image_button(message):
     """Edit image button handler"""
     user_id = message.from_user.id
 
-    state_manager.set_state(user_id, STATES["WAITING_IMAGE_FOR_EDIT"])
+    await state_manager.set_state(user_id, STATES["WAITING_IMAGE_FOR_EDIT"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "✏️ <b>Редактировать фото</b>\n\n"
         "Отправьте мне изображение, которое хотите отредактировать.\n\n"
@@ -548,7 +574,7 @@ def edit_image_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "💬 Чат с AI")
-def chat_with_ai_button(message):
+async def chat_with_ai_button(message):
     """Chat with AI button handler (New 2025)"""
     user_id = message.from_user.id
 
@@ -562,7 +588,7 @@ def chat_with_ai_button(message):
         types.InlineKeyboardButton("🦙 LLaMA 70B", callback_data="chat_llama")
     )
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "💬 <b>Чат с AI</b>\n\n"
         "Выберите модель для общения:\n\n"
@@ -577,13 +603,13 @@ def chat_with_ai_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "🌐 Перевести текст")
-def translate_text_button(message):
+async def translate_text_button(message):
     """Translate text button handler (New 2025)"""
     user_id = message.from_user.id
 
-    state_manager.set_state(user_id, STATES["WAITING_TRANSLATION_TEXT"])
+    await state_manager.set_state(user_id, STATES["WAITING_TRANSLATION_TEXT"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🌐 <b>Перевод текста</b>\n\n"
         "Отправьте текст для перевода.\n\n"
@@ -594,7 +620,7 @@ def translate_text_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text in ["🎤 Text to Speech", "🎤 Озвучить текст"])
-def tts_button(message):
+async def tts_button(message):
     """TTS button handler with 20 voices (Updated 2025)"""
     user_id = message.from_user.id
 
@@ -606,7 +632,7 @@ def tts_button(message):
         types.InlineKeyboardButton("🎭 Нейтральные (4)", callback_data="tts_category_neutral")
     )
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🎤 <b>Озвучка текста</b>\n\n"
         "Выберите категорию голоса:\n\n"
@@ -620,13 +646,13 @@ def tts_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text in ["🎙 Transcribe", "🎙 Транскрибировать"])
-def stt_button(message):
+async def stt_button(message):
     """STT button handler"""
     user_id = message.from_user.id
 
-    state_manager.set_state(user_id, STATES["WAITING_STT_FILE"])
+    await state_manager.set_state(user_id, STATES["WAITING_STT_FILE"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🎙 <b>Транскрибировать аудио/видео</b>\n\n"
         "Отправьте аудио или видео файл для транскрибации.\n\n"
@@ -639,13 +665,13 @@ def stt_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text in ["💧 Watermark", "💧 Водяной знак", "➕ Добавить водяной знак"])
-def watermark_add_button(message):
+async def watermark_add_button(message):
     """Add watermark button handler"""
     user_id = message.from_user.id
 
-    state_manager.set_state(user_id, STATES["WAITING_IMAGE_FOR_WM"])
+    await state_manager.set_state(user_id, STATES["WAITING_IMAGE_FOR_WM"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "💧 <b>Добавить водяной знак</b>\n\n"
         "Отправьте мне изображение:",
@@ -654,13 +680,13 @@ def watermark_add_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "➖ Убрать водяной знак")
-def watermark_remove_button(message):
+async def watermark_remove_button(message):
     """Remove watermark button handler"""
     user_id = message.from_user.id
 
-    state_manager.set_state(user_id, STATES["WAITING_IMAGE_FOR_WM_REMOVE"])
+    await state_manager.set_state(user_id, STATES["WAITING_IMAGE_FOR_WM_REMOVE"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "💧 <b>Удалить водяной знак</b>\n\n"
         "Отправьте мне изображение с водяным знаком:\n\n"
@@ -670,13 +696,13 @@ def watermark_remove_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "🗑 Убрать фон")
-def remove_background_button(message):
+async def remove_background_button(message):
     """Remove background button handler"""
     user_id = message.from_user.id
 
-    state_manager.set_state(user_id, STATES["WAITING_IMAGE_FOR_BG_REMOVE"])
+    await state_manager.set_state(user_id, STATES["WAITING_IMAGE_FOR_BG_REMOVE"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🗑 <b>Удалить фон с изображения</b>\n\n"
         "Отправьте мне изображение, с которого нужно убрать фон:\n\n"
@@ -687,13 +713,13 @@ def remove_background_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "🎬 Создать видео")
-def create_video_button(message):
+async def create_video_button(message):
     """Create video button handler"""
     user_id = message.from_user.id
 
-    state_manager.set_state(user_id, STATES["WAITING_VIDEO_PROMPT"])
+    await state_manager.set_state(user_id, STATES["WAITING_VIDEO_PROMPT"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🎬 <b>Создать видео с AI</b>\n\n"
         "Опишите видео, которое хотите создать.\n\n"
@@ -707,13 +733,13 @@ def create_video_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "🖼️ Видео из картинки")
-def video_from_image_button(message):
+async def video_from_image_button(message):
     """Video from image button handler"""
     user_id = message.from_user.id
 
-    state_manager.set_state(user_id, STATES["WAITING_IMAGE_FOR_VIDEO"])
+    await state_manager.set_state(user_id, STATES["WAITING_IMAGE_FOR_VIDEO"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🖼️ <b>Создать видео из картинки</b>\n\n"
         "Отправьте мне изображение, из которого нужно создать видео:\n\n"
@@ -724,13 +750,13 @@ def video_from_image_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "📝 Добавить субтитры")
-def add_subtitles_button(message):
+async def add_subtitles_button(message):
     """Add subtitles button handler"""
     user_id = message.from_user.id
 
-    state_manager.set_state(user_id, STATES["WAITING_VIDEO_FOR_SUBTITLES"])
+    await state_manager.set_state(user_id, STATES["WAITING_VIDEO_FOR_SUBTITLES"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "📝 <b>Добавить субтитры в видео</b>\n\n"
         "Отправьте мне видео, к которому нужно добавить субтитры:\n\n"
@@ -741,13 +767,13 @@ def add_subtitles_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text == "✨ Улучшить видео")
-def enhance_video_button(message):
+async def enhance_video_button(message):
     """Enhance video button handler"""
     user_id = message.from_user.id
 
-    state_manager.set_state(user_id, STATES["WAITING_VIDEO_FOR_ENHANCE"])
+    await state_manager.set_state(user_id, STATES["WAITING_VIDEO_FOR_ENHANCE"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "✨ <b>Улучшить видео</b>\n\n"
         "Отправьте мне видео для улучшения:\n\n"
@@ -759,11 +785,11 @@ def enhance_video_button(message):
 
 
 @bot.message_handler(func=lambda m: m.text in ["📈 My Stats", "📈 Моя статистика"])
-def stats_button(message):
+async def stats_button(message):
     """Stats button handler"""
     user_id = message.from_user.id
 
-    stats = db.get_user_stats(user_id)
+    stats = await async_db.get_user_stats(user_id)
 
     stats_text = f"""📈 <b>Ваша статистика</b>
 
@@ -773,24 +799,24 @@ def stats_button(message):
 
 Продолжайте создавать отличный контент! 🚀"""
 
-    bot.send_message(message.chat.id, stats_text)
+    await bot.send_message(message.chat.id, stats_text)
 
 
 @bot.message_handler(func=lambda m: m.text == "❓ Помощь")
-def help_button(message):
+async def help_button(message):
     """Help button handler"""
-    help_handler(message)
+    await help_handler(message)
 
 
 @bot.message_handler(func=lambda m: m.text in ["❌ Cancel", "❌ Отмена"])
-def cancel_button(message):
+async def cancel_button(message):
     """Cancel button handler"""
     user_id = message.from_user.id
 
-    state_manager.clear_state(user_id)
-    state_manager.clear_user_data(user_id)
+    await state_manager.clear_state(user_id)
+    await state_manager.clear_user_data(user_id)
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "✅ Операция отменена.\n\nВыберите, что делать дальше:",
         reply_markup=main_menu_keyboard()
@@ -799,26 +825,38 @@ def cancel_button(message):
 
 # ===== STATE HANDLERS =====
 
-@bot.message_handler(func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_CHANNEL"])
-def handle_channel_input(message):
+# State -> (handler, accepted content types), dispatched by state_router
+STATE_HANDLERS = {}
+
+
+def state_handler(state: str, content_types=None):
+    """Register a message handler for a user state"""
+    def decorator(handler):
+        STATE_HANDLERS[state] = (handler, set(content_types or ['text']))
+        return handler
+    return decorator
+
+
+@state_handler(STATES["WAITING_CHANNEL"])
+async def handle_channel_input(message):
     """Handle channel URL input"""
     user_id = message.from_user.id
     channel_url = message.text.strip()
 
     if not channel_url.startswith('@'):
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "❌ Неверный формат. Используйте: <code>@имя_канала</code>"
         )
         return
 
-    state_manager.clear_state(user_id)
+    await state_manager.clear_state(user_id)
 
     # Save channel URL for later use
-    state_manager.set_data(user_id, "analyzing_channel_url", channel_url)
+    await state_manager.set_data(user_id, "analyzing_channel_url", channel_url)
 
     # Send processing message
-    processing_msg = bot.send_message(
+    processing_msg = await bot.send_message(
         message.chat.id,
         "⏳ Анализирую канал...\n\n"
         "Это может занять до 5 минут.\n"
@@ -827,86 +865,79 @@ def handle_channel_input(message):
     )
 
     # Start async task
-    task = analyze_channel_task.delay(channel_url)
-    state_manager.set_task_id(user_id, task.id)
+    task = await submit(analyze_channel_task, channel_url)
+    await state_manager.set_task_id(user_id, task.id)
 
     # Wait for result
     check_task_result(user_id, task.id, processing_msg.message_id, "analyze")
 
 
-@bot.message_handler(func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_TOPIC"])
-def handle_topic_input(message):
+@state_handler(STATES["WAITING_TOPIC"])
+async def handle_topic_input(message):
     """Handle topic input for post generation"""
     user_id = message.from_user.id
     topic = message.text.strip()
 
-    state_manager.clear_state(user_id)
+    await state_manager.clear_state(user_id)
 
     # Get the selected channel's style instead of latest
-    channel_id = state_manager.get_data(user_id, "selected_channel_id")
+    channel_id = await state_manager.get_data(user_id, "selected_channel_id")
     if not channel_id:
-        bot.send_message(message.chat.id, "❌ Канал не выбран. Пожалуйста, начните сначала.")
+        await bot.send_message(message.chat.id, "❌ Канал не выбран. Пожалуйста, начните сначала.")
         return
 
-    channel = db.get_channel_by_id(channel_id)
+    channel = await async_db.get_channel_by_id(channel_id)
     if not channel or channel['user_id'] != user_id:
-        bot.send_message(message.chat.id, "❌ Канал не найден.")
+        await bot.send_message(message.chat.id, "❌ Канал не найден.")
         return
 
-    # Prepare full style data with deep analysis and examples
-    style_data = {
-        'style_summary': channel['style_summary'],
-        'deep_analysis': channel.get('deep_analysis', ''),
-        'example_posts': channel.get('example_posts', [])
-    }
-
-    processing_msg = bot.send_message(
+    processing_msg = await bot.send_message(
         message.chat.id,
         "⏳ Генерирую посты с глубоким AI-анализом...\n\n"
         "Создаю 3 варианта, НЕОТЛИЧИМЫХ от оригинального стиля.",
         reply_markup=main_menu_keyboard()
     )
 
-    # Start async task with full data
-    task = generate_posts_task.delay(style_data, topic)
-    state_manager.set_task_id(user_id, task.id)
+    # Start async task (the worker loads the channel style itself and
+    # streams the text into the processing message)
+    task = await submit(
+        generate_posts_task,
+        channel_id, topic,
+        stream_to={"chat_id": message.chat.id, "message_id": processing_msg.message_id}
+    )
+    await state_manager.set_task_id(user_id, task.id)
 
     check_task_result(user_id, task.id, processing_msg.message_id, "generate_posts")
 
 
-@bot.message_handler(func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_IMAGE_PROMPT"])
-def handle_image_prompt(message):
+@state_handler(STATES["WAITING_IMAGE_PROMPT"])
+async def handle_image_prompt(message):
     """Handle image generation prompt"""
     user_id = message.from_user.id
     prompt = message.text.strip()
 
-    state_manager.set_data(user_id, "image_prompt", prompt)
+    await state_manager.set_data(user_id, "image_prompt", prompt)
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🎨 Choose AI model:",
         reply_markup=image_provider_keyboard()
     )
 
 
-@bot.message_handler(content_types=['photo'], func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_IMAGE_FOR_EDIT"])
-def handle_image_for_edit(message):
+@state_handler(STATES["WAITING_IMAGE_FOR_EDIT"], content_types=['photo'])
+async def handle_image_for_edit(message):
     """Handle image upload for editing"""
     user_id = message.from_user.id
 
     # Get largest photo
-    photo = message.photo[-1]
-    file_info = bot.get_file(photo.file_id)
-    downloaded_file = bot.download_file(file_info.file_path)
-
-    # Convert to base64
-    img_b64 = base64.b64encode(downloaded_file).decode('utf-8')
+    image_ref = await media_ref_for(message.photo[-1].file_id)
 
     # Save image
-    state_manager.set_data(user_id, "current_image", img_b64)
-    state_manager.set_state(user_id, STATES["WAITING_EDIT_INSTRUCTION"])
+    await state_manager.set_data(user_id, "current_image", image_ref)
+    await state_manager.set_state(user_id, STATES["WAITING_EDIT_INSTRUCTION"])
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "✅ Изображение получено!\n\n"
         "Теперь скажите, что изменить:\n\n"
@@ -919,48 +950,44 @@ def handle_image_for_edit(message):
     )
 
 
-@bot.message_handler(func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_EDIT_INSTRUCTION"])
-def handle_edit_instruction(message):
+@state_handler(STATES["WAITING_EDIT_INSTRUCTION"])
+async def handle_edit_instruction(message):
     """Handle edit instruction"""
     user_id = message.from_user.id
     instruction = message.text.strip()
 
-    state_manager.clear_state(user_id)
+    await state_manager.clear_state(user_id)
 
-    img_b64 = state_manager.get_data(user_id, "current_image")
+    image_ref = await state_manager.get_data(user_id, "current_image")
 
-    if not img_b64:
-        bot.send_message(message.chat.id, "❌ Изображение не найдено. Пожалуйста, начните сначала.")
+    if not image_ref:
+        await bot.send_message(message.chat.id, "❌ Изображение не найдено. Пожалуйста, начните сначала.")
         return
 
-    processing_msg = bot.send_message(
+    processing_msg = await bot.send_message(
         message.chat.id,
         "⏳ Редактирую изображение с AI...\n\n"
         "Это может занять 1-2 минуты.",
         reply_markup=main_menu_keyboard()
     )
 
-    task = edit_image_task.delay(img_b64, instruction)
-    state_manager.set_task_id(user_id, task.id)
+    task = await submit(edit_image_task, image_ref, instruction)
+    await state_manager.set_task_id(user_id, task.id)
 
     check_task_result(user_id, task.id, processing_msg.message_id, "edit_image")
 
 
-@bot.message_handler(content_types=['photo'], func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_IMAGE_FOR_WM"])
-def handle_image_for_watermark(message):
+@state_handler(STATES["WAITING_IMAGE_FOR_WM"], content_types=['photo'])
+async def handle_image_for_watermark(message):
     """Handle image for watermark"""
     user_id = message.from_user.id
 
-    photo = message.photo[-1]
-    file_info = bot.get_file(photo.file_id)
-    downloaded_file = bot.download_file(file_info.file_path)
+    image_ref = await media_ref_for(message.photo[-1].file_id)
 
-    img_b64 = base64.b64encode(downloaded_file).decode('utf-8')
+    await state_manager.set_data(user_id, "current_image", image_ref)
+    await state_manager.set_state(user_id, STATES["WAITING_WATERMARK_TEXT"])
 
-    state_manager.set_data(user_id, "current_image", img_b64)
-    state_manager.set_state(user_id, STATES["WAITING_WATERMARK_TEXT"])
-
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "✅ Изображение получено!\n\n"
         "Введите текст водяного знака:",
@@ -968,113 +995,101 @@ def handle_image_for_watermark(message):
     )
 
 
-@bot.message_handler(content_types=['photo'], func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_IMAGE_FOR_WM_REMOVE"])
-def handle_image_for_watermark_remove(message):
+@state_handler(STATES["WAITING_IMAGE_FOR_WM_REMOVE"], content_types=['photo'])
+async def handle_image_for_watermark_remove(message):
     """Handle image for watermark removal"""
     user_id = message.from_user.id
 
-    state_manager.clear_state(user_id)
-
-    photo = message.photo[-1]
-    file_info = bot.get_file(photo.file_id)
-    downloaded_file = bot.download_file(file_info.file_path)
+    await state_manager.clear_state(user_id)
 
-    img_b64 = base64.b64encode(downloaded_file).decode('utf-8')
+    image_ref = await media_ref_for(message.photo[-1].file_id)
 
-    processing_msg = bot.send_message(
+    processing_msg = await bot.send_message(
         message.chat.id,
         "⏳ Удаляю водяной знак с помощью AI...\n\n"
         "Это может занять 1-2 минуты.",
         reply_markup=main_menu_keyboard()
     )
 
-    task = remove_watermark_task.delay(img_b64)
-    state_manager.set_task_id(user_id, task.id)
+    task = await submit(remove_watermark_task, image_ref)
+    await state_manager.set_task_id(user_id, task.id)
 
     check_task_result(user_id, task.id, processing_msg.message_id, "remove_watermark")
 
 
-@bot.message_handler(content_types=['photo'], func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_IMAGE_FOR_BG_REMOVE"])
-def handle_image_for_bg_remove(message):
+@state_handler(STATES["WAITING_IMAGE_FOR_BG_REMOVE"], content_types=['photo'])
+async def handle_image_for_bg_remove(message):
     """Handle image for background removal"""
     user_id = message.from_user.id
 
-    state_manager.clear_state(user_id)
+    await state_manager.clear_state(user_id)
 
-    photo = message.photo[-1]
-    file_info = bot.get_file(photo.file_id)
-    downloaded_file = bot.download_file(file_info.file_path)
+    image_ref = await media_ref_for(message.photo[-1].file_id)
 
-    img_b64 = base64.b64encode(downloaded_file).decode('utf-8')
-
-    processing_msg = bot.send_message(
+    processing_msg = await bot.send_message(
         message.chat.id,
         "⏳ Удаляю фон с помощью AI...\n\n"
         "Это займет несколько секунд.",
         reply_markup=main_menu_keyboard()
     )
 
-    # Import task
-    from tasks.tasks import remove_background_task
-
-    task = remove_background_task.delay(img_b64)
-    state_manager.set_task_id(user_id, task.id)
+    task = await submit(remove_background_task, image_ref)
+    await state_manager.set_task_id(user_id, task.id)
 
     check_task_result(user_id, task.id, processing_msg.message_id, "remove_background")
 
 
-@bot.message_handler(func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_WATERMARK_TEXT"])
-def handle_watermark_text(message):
+@state_handler(STATES["WAITING_WATERMARK_TEXT"])
+async def handle_watermark_text(message):
     """Handle watermark text"""
     user_id = message.from_user.id
     text = message.text.strip()
 
-    state_manager.clear_state(user_id)
+    await state_manager.clear_state(user_id)
 
-    img_b64 = state_manager.get_data(user_id, "current_image")
+    image_ref = await state_manager.get_data(user_id, "current_image")
 
-    processing_msg = bot.send_message(
+    processing_msg = await bot.send_message(
         message.chat.id,
         "⏳ Добавляю водяной знак...",
         reply_markup=main_menu_keyboard()
     )
 
-    task = add_watermark_task.delay(img_b64, text)
-    state_manager.set_task_id(user_id, task.id)
+    task = await submit(add_watermark_task, image_ref, text)
+    await state_manager.set_task_id(user_id, task.id)
 
     check_task_result(user_id, task.id, processing_msg.message_id, "add_watermark")
 
 
-@bot.message_handler(func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_TTS_TEXT"])
-def handle_tts_text(message):
+@state_handler(STATES["WAITING_TTS_TEXT"])
+async def handle_tts_text(message):
     """Handle TTS text input"""
     user_id = message.from_user.id
     text = message.text.strip()
 
     if len(text) > 5000:
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "❌ Текст слишком длинный. Максимум 5000 символов.\n\n"
             f"Ваш текст: {len(text)} символов."
         )
         return
 
-    state_manager.set_data(user_id, "tts_text", text)
+    await state_manager.set_data(user_id, "tts_text", text)
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🎤 Выберите голос для озвучки:",
         reply_markup=tts_voice_keyboard()
     )
 
 
-@bot.message_handler(content_types=['audio', 'voice', 'video', 'video_note'],
-                    func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_STT_FILE"])
-def handle_stt_file(message):
+@state_handler(STATES["WAITING_STT_FILE"], content_types=['audio', 'voice', 'video', 'video_note'])
+async def handle_stt_file(message):
     """Handle STT file upload"""
     user_id = message.from_user.id
 
-    state_manager.clear_state(user_id)
+    await state_manager.clear_state(user_id)
 
     # Get file
     if message.audio:
@@ -1090,161 +1105,155 @@ def handle_stt_file(message):
         file_id = message.video_note.file_id
         file_size = message.video_note.file_size
     else:
-        bot.send_message(message.chat.id, "❌ Неподдерживаемый формат файла")
+        await bot.send_message(message.chat.id, "❌ Неподдерживаемый формат файла")
         return
 
     # Check file size (50 MB limit)
     if file_size and file_size > 50 * 1024 * 1024:
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             f"❌ Файл слишком большой: {file_size / 1024 / 1024:.1f} МБ\n\n"
             "Максимальный размер: 50 МБ"
         )
         return
 
-    # Download file
-    file_info = bot.get_file(file_id)
-    downloaded_file = bot.download_file(file_info.file_path)
+    file_ref = await media_ref_for(file_id)
 
-    # Convert to base64
-    file_b64 = base64.b64encode(downloaded_file).decode('utf-8')
-
-    processing_msg = bot.send_message(
+    processing_msg = await bot.send_message(
         message.chat.id,
         "⏳ Транскрибирую аудио/видео...\n\n"
         "Это может занять несколько минут в зависимости от длительности.",
         reply_markup=main_menu_keyboard()
     )
 
-    # Import task
-    from tasks.tasks import transcribe_audio_task
-
-    task = transcribe_audio_task.delay(file_b64)
-    state_manager.set_task_id(user_id, task.id)
+    task = await submit(transcribe_audio_task, file_ref)
+    await state_manager.set_task_id(user_id, task.id)
 
     check_task_result(user_id, task.id, processing_msg.message_id, "transcribe")
 
 
-@bot.message_handler(func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_VIDEO_PROMPT"])
-def handle_video_prompt(message):
+@state_handler(STATES["WAITING_VIDEO_PROMPT"])
+async def handle_video_prompt(message):
     """Handle video generation prompt"""
     user_id = message.from_user.id
     prompt = message.text.strip()
 
-    state_manager.set_data(user_id, "video_prompt", prompt)
+    await state_manager.set_data(user_id, "video_prompt", prompt)
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🎬 Выберите модель для генерации видео:",
         reply_markup=video_model_keyboard()
     )
 
 
-@bot.message_handler(content_types=['photo'], func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_IMAGE_FOR_VIDEO"])
-def handle_image_for_video(message):
+@state_handler(STATES["WAITING_IMAGE_FOR_VIDEO"], content_types=['photo'])
+async def handle_image_for_video(message):
     """Handle image for video generation"""
     user_id = message.from_user.id
 
-    photo = message.photo[-1]
-    file_info = bot.get_file(photo.file_id)
-    downloaded_file = bot.download_file(file_info.file_path)
-
-    img_b64 = base64.b64encode(downloaded_file).decode('utf-8')
+    image_ref = await media_ref_for(message.photo[-1].file_id)
 
-    state_manager.set_data(user_id, "image_for_video", img_b64)
+    await state_manager.set_data(user_id, "image_for_video", image_ref)
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🎬 Выберите модель для создания видео:",
         reply_markup=image_to_video_model_keyboard()
     )
 
 
-@bot.message_handler(func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_CHAT_MESSAGE"])
-def handle_chat_message(message):
+@state_handler(STATES["WAITING_CHAT_MESSAGE"])
+async def handle_chat_message(message):
     """Handle chat message with AI (New 2025)"""
     user_id = message.from_user.id
 
     # Check for stop command
     if message.text and message.text.lower() in ['/stop', 'стоп', 'stop']:
-        state_manager.clear_state(user_id)
-        bot.send_message(
+        await state_manager.clear_state(user_id)
+        await bot.send_message(
             message.chat.id,
             "✅ Чат завершен!",
             reply_markup=text_menu_keyboard()
         )
         return
 
-    model = state_manager.get_data(user_id, "chat_model") or "gemini-flash"
-    chat_history = state_manager.get_data(user_id, "chat_history") or []
+    model = await state_manager.get_data(user_id, "chat_model") or "gemini-flash"
 
     # Show processing
-    processing_msg = bot.send_message(
+    processing_msg = await bot.send_message(
         message.chat.id,
         "🤖 Думаю...",
         parse_mode="HTML"
     )
 
-    # Call chat task
-    task = chat_with_ai_task.delay(message.text, model, chat_history)
+    # The worker reads and extends the history itself and streams the reply
+    # into the processing message; the handler returns right away
+    task = await submit(
+        chat_with_ai_task,
+        message.text, model, user_id=user_id,
+        stream_to={"chat_id": message.chat.id, "message_id": processing_msg.message_id}
+    )
 
-    try:
-        result = task.get(timeout=120)
+    async def on_done(result: dict):
+        await deliver_chat_reply(message.chat.id, processing_msg.message_id, result)
 
-        if "error" in result:
-            bot.edit_message_text(
-                chat_id=message.chat.id,
-                message_id=processing_msg.message_id,
-                text=f"❌ Ошибка: {result['error']}"
-            )
-        else:
-            # Update history
-            chat_history.append({"role": "user", "content": message.text})
-            chat_history.append({"role": "assistant", "content": result['response']})
-            state_manager.set_data(user_id, "chat_history", chat_history)
-
-            # Send response
-            bot.delete_message(message.chat.id, processing_msg.message_id)
-
-            response_text = result['response']
-            if len(response_text) > 4000:
-                # Split long messages
-                for i in range(0, len(response_text), 4000):
-                    bot.send_message(
-                        message.chat.id,
-                        response_text[i:i+4000],
-                        parse_mode="HTML"
-                    )
-            else:
-                bot.send_message(
-                    message.chat.id,
-                    f"🤖 <b>{result['model']}</b>:\n\n{response_text}\n\n"
-                    f"<i>Продолжайте диалог или /stop для завершения</i>",
-                    parse_mode="HTML"
-                )
-    except Exception as e:
-        bot.edit_message_text(
+    async def on_timeout():
+        await bot.edit_message_text(
             chat_id=message.chat.id,
             message_id=processing_msg.message_id,
-            text=f"❌ Ошибка: {str(e)}"
+            text="❌ Ошибка: Превышено время ожидания"
+        )
+
+    task_dispatcher.watch(task.id, on_done, on_timeout, timeout=CHAT_TIMEOUT)
+
+
+async def deliver_chat_reply(chat_id: int, msg_id: int, result: dict):
+    """Replace the streamed preview with the final chat reply"""
+    if "error" in result:
+        await bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=msg_id,
+            text=f"❌ Ошибка: {result['error']}"
+        )
+        return
+
+    # Send response
+    await bot.delete_message(chat_id, msg_id)
+
+    response_text = result['response']
+    if len(response_text) > 4000:
+        # Split long messages
+        for i in range(0, len(response_text), 4000):
+            await bot.send_message(
+                chat_id,
+                response_text[i:i+4000],
+                parse_mode="HTML"
+            )
+    else:
+        await bot.send_message(
+            chat_id,
+            f"🤖 <b>{result['model']}</b>:\n\n{response_text}\n\n"
+            f"<i>Продолжайте диалог или /stop для завершения</i>",
+            parse_mode="HTML"
         )
 
 
-@bot.message_handler(func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_TRANSLATION_TEXT"])
-def handle_translation_text(message):
+@state_handler(STATES["WAITING_TRANSLATION_TEXT"])
+async def handle_translation_text(message):
     """Handle text for translation (New 2025)"""
     user_id = message.from_user.id
     text = message.text.strip()
 
     if len(text) > 5000:
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "❌ Текст слишком длинный! Максимум 5000 символов."
         )
         return
 
     # Store text
-    state_manager.set_data(user_id, "text_to_translate", text)
+    await state_manager.set_data(user_id, "text_to_translate", text)
 
     # Show language selection
     keyboard = types.InlineKeyboardMarkup(row_width=2)
@@ -1261,7 +1270,7 @@ def handle_translation_text(message):
         types.InlineKeyboardButton("🇰🇷 한국어", callback_data="translate_ko")
     )
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "🌐 <b>Выберите целевой язык:</b>",
         reply_markup=keyboard,
@@ -1269,21 +1278,22 @@ def handle_translation_text(message):
     )
 
 
-@bot.message_handler(func=lambda m: state_manager.get_state(m.from_user.id) == STATES["WAITING_ADVANCED_TTS_TEXT"])
-def handle_advanced_tts_text(message):
+@state_handler(STATES["WAITING_ADVANCED_TTS_TEXT"])
+async def handle_advanced_tts_text(message):
     """Handle text for advanced TTS with 20 voices (New 2025)"""
     user_id = message.from_user.id
     text = message.text.strip()
 
     if len(text) > 4096:
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "❌ Текст слишком длинный! Максимум 4096 символов."
         )
         return
 
-    voice = state_manager.get_data(user_id, "tts_voice") or "alloy"
-    speed_type = state_manager.get_data(user_id, "tts_speed") or "normal"
+    tts_data = await state_manager.get_many(user_id, "tts_voice", "tts_speed")
+    voice = tts_data["tts_voice"] or "alloy"
+    speed_type = tts_data["tts_speed"] or "normal"
 
     # Map speed to actual speed value
     speed_map = {
@@ -1294,7 +1304,7 @@ def handle_advanced_tts_text(message):
     }
     speed_value = speed_map.get(speed_type, 1.0)
 
-    processing_msg = bot.send_message(
+    processing_msg = await bot.send_message(
         message.chat.id,
         f"🎤 Генерирую аудио...\n\n"
         f"Голос: {voice.capitalize()}\n"
@@ -1302,63 +1312,65 @@ def handle_advanced_tts_text(message):
         parse_mode="HTML"
     )
 
-    # Generate audio using OpenAI with speed parameter
-    try:
-        from openai import OpenAI
-        from core.config import OPENAI_API_KEY
-        import base64
+    await state_manager.clear_state(user_id)
 
-        openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    # Generated by a worker (repeated voiceovers come from its cache)
+    task = await submit(advanced_tts_task, text, "openai", voice, speed=speed_value)
+    await state_manager.set_task_id(user_id, task.id)
 
-        response = openai_client.audio.speech.create(
-            model="tts-1-hd",
-            voice=voice,
-            input=text,
-            speed=speed_value
-        )
-
-        audio_bytes = response.content
-
-        # Send audio
-        bot.delete_message(message.chat.id, processing_msg.message_id)
-        bot.send_audio(
-            message.chat.id,
-            audio_bytes,
-            caption=f"🎤 Голос: {voice.capitalize()} | Темп: {speed_value}x",
-            title="TTS Audio"
-        )
+    async def on_done(result: dict):
+        if result.get("error"):
+            await bot.edit_message_text(
+                chat_id=message.chat.id,
+                message_id=processing_msg.message_id,
+                text=f"❌ Ошибка: {str(result['error'])[:1000]}"
+            )
+            return
+        await handle_advanced_tts_result(user_id, result)
+        await bot.delete_message(message.chat.id, processing_msg.message_id)
 
-    except Exception as e:
-        bot.edit_message_text(
+    async def on_timeout():
+        await bot.edit_message_text(
             chat_id=message.chat.id,
             message_id=processing_msg.message_id,
-            text=f"❌ Ошибка генерации: {str(e)}"
+            text="❌ Ошибка: Превышено время ожидания"
         )
 
-    state_manager.clear_state(user_id)
+    task_dispatcher.watch(task.id, on_done, on_timeout)
+
+
+# Registered after all menu handlers so buttons keep priority over states
+@bot.message_handler(content_types=sorted({ct for _, cts in STATE_HANDLERS.values() for ct in cts}))
+async def state_router(message):
+    """Dispatch message to the handler of the user's current state (one state lookup per update)"""
+    state = await state_manager.get_state(message.from_user.id)
+    entry = STATE_HANDLERS.get(state)
+    if entry and message.content_type in entry[1]:
+        handler, _ = entry
+        await handler(message)
 
 
 # ===== CALLBACK HANDLERS =====
 
 @bot.callback_query_handler(func=lambda c: c.data.startswith('select_channel_'))
-def select_channel_callback(call):
+async def select_channel_callback(call):
     """Select channel for post generation"""
     user_id = call.from_user.id
     channel_id = int(call.data.split('_')[-1])
 
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
     # Get channel info
-    channel = db.get_channel_by_id(channel_id)
+    channel = await async_db.get_channel_by_id(channel_id)
 
     if not channel or channel['user_id'] != user_id:
-        bot.send_message(call.message.chat.id, "❌ Канал не найден")
+        await bot.send_message(call.message.chat.id, "❌ Канал не найден")
         return
 
     channel_title = channel['channel_title'] or channel['channel_url']
 
     # Save selected channel
-    state_manager.set_data(user_id, "selected_channel_id", channel_id)
+    await state_manager.set_data(user_id, "selected_channel_id", channel_id)
 
     # Ask if user has an idea
     keyboard = types.InlineKeyboardMarkup(row_width=1)
@@ -1367,7 +1379,7 @@ def select_channel_callback(call):
         types.InlineKeyboardButton("🔥 Сгенерировать идеи из новостей", callback_data=f"need_ideas_{channel_id}")
     )
 
-    bot.send_message(
+    await bot.send_message(
         call.message.chat.id,
         f"✍️ <b>Создать пост</b>\n\n"
         f"📺 Канал: <b>{channel_title}</b>\n\n"
@@ -1377,20 +1389,20 @@ def select_channel_callback(call):
 
 
 @bot.callback_query_handler(func=lambda c: c.data.startswith('have_idea_'))
-def have_idea_callback(call):
+async def have_idea_callback(call):
     """User has an idea for the post"""
     user_id = call.from_user.id
     channel_id = int(call.data.split('_')[-1])
 
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
     # Get channel info
-    channel = db.get_channel_by_id(channel_id)
+    channel = await async_db.get_channel_by_id(channel_id)
     channel_title = channel['channel_title'] or channel['channel_url']
 
-    state_manager.set_state(user_id, STATES["WAITING_TOPIC"])
+    await state_manager.set_state(user_id, STATES["WAITING_TOPIC"])
 
-    bot.send_message(
+    await bot.send_message(
         call.message.chat.id,
         f"✍️ <b>Создать пост</b>\n\n"
         f"📺 Канал: <b>{channel_title}</b>\n\n"
@@ -1401,27 +1413,22 @@ def have_idea_callback(call):
 
 
 @bot.callback_query_handler(func=lambda c: c.data.startswith('need_ideas_'))
-def need_ideas_callback(call):
+async def need_ideas_callback(call):
     """User needs ideas from news"""
     user_id = call.from_user.id
     channel_id = int(call.data.split('_')[-1])
 
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
     # Get channel info
-    channel = db.get_channel_by_id(channel_id)
+    channel = await async_db.get_channel_by_id(channel_id)
     if not channel or channel['user_id'] != user_id:
-        bot.send_message(call.message.chat.id, "❌ Канал не найден")
+        await bot.send_message(call.message.chat.id, "❌ Канал не найден")
         return
 
     channel_title = channel['channel_title'] or channel['channel_url']
-    style_data = {
-        'style_summary': channel['style_summary'],
-        'deep_analysis': channel.get('deep_analysis', ''),
-        'example_posts': channel.get('example_posts', [])
-    }
 
-    processing_msg = bot.send_message(
+    processing_msg = await bot.send_message(
         call.message.chat.id,
         f"🔥 <b>Генерирую идеи для постов</b>\n\n"
         f"📺 Канал: <b>{channel_title}</b>\n\n"
@@ -1430,29 +1437,25 @@ def need_ideas_callback(call):
         reply_markup=main_menu_keyboard()
     )
 
-    # Import task here to avoid circular import
-    from tasks.tasks import generate_post_ideas_task
-
-    task = generate_post_ideas_task.delay(style_data)
-    state_manager.set_task_id(user_id, task.id)
+    task = await submit(generate_post_ideas_task, channel_id)
+    await state_manager.set_task_id(user_id, task.id)
 
     check_task_result(user_id, task.id, processing_msg.message_id, "generate_ideas")
+
+
 # ===== CHAT WITH AI CALLBACKS =====
 
 @bot.callback_query_handler(func=lambda c: c.data.startswith('chat_'))
-def chat_model_callback(call):
+async def chat_model_callback(call):
     """Chat model selection callback (New 2025)"""
     user_id = call.from_user.id
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
     model = call.data.replace('chat_', '')
 
-    # Store model choice
-    state_manager.set_data(user_id, "chat_model", model)
-    state_manager.set_state(user_id, STATES["WAITING_CHAT_MESSAGE"])
-
-    # Clear chat history
-    state_manager.set_data(user_id, "chat_history", [])
+    # Store model choice and clear chat history
+    await state_manager.set_many(user_id, {"chat_model": model, "chat_history": []})
+    await state_manager.set_state(user_id, STATES["WAITING_CHAT_MESSAGE"])
 
     model_names = {
         "gpt-4": "GPT-4",
@@ -1462,7 +1465,7 @@ def chat_model_callback(call):
         "llama": "LLaMA 2 70B"
     }
 
-    bot.edit_message_text(
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text=f"💬 <b>Чат с {model_names.get(model)}</b>\n\n"
@@ -1476,24 +1479,24 @@ def chat_model_callback(call):
 # ===== TRANSLATION CALLBACKS =====
 
 @bot.callback_query_handler(func=lambda c: c.data.startswith('translate_'))
-def translate_lang_callback(call):
+async def translate_lang_callback(call):
     """Translation language selection (New 2025)"""
     user_id = call.from_user.id
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
     target_lang = call.data.replace('translate_', '')
-    text = state_manager.get_data(user_id, "text_to_translate")
+    text = await state_manager.get_data(user_id, "text_to_translate")
 
     if not text:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             chat_id=call.message.chat.id,
             message_id=call.message.message_id,
             text="❌ Текст для перевода не найден. Попробуйте снова."
         )
-        state_manager.clear_state(user_id)
+        await state_manager.clear_state(user_id)
         return
 
-    bot.edit_message_text(
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text="🌐 Перевожу...",
@@ -1501,14 +1504,13 @@ def translate_lang_callback(call):
     )
 
     # Translate
-    from tasks.tasks import translate_text_task
-    task = translate_text_task.delay(text, target_lang)
+    task = await submit(translate_text_task, text, target_lang)
 
     try:
-        result = task.get(timeout=60)
+        result = await task_dispatcher.wait(task.id, timeout=60) or {"error": "Превышено время ожидания"}
 
         if "error" in result:
-            bot.edit_message_text(
+            await bot.edit_message_text(
                 chat_id=call.message.chat.id,
                 message_id=call.message.message_id,
                 text=f"❌ Ошибка: {result['error']}"
@@ -1519,27 +1521,27 @@ def translate_lang_callback(call):
             if len(translated) > 4000:
                 translated = translated[:4000] + "..."
 
-            bot.edit_message_text(
+            await bot.edit_message_text(
                 chat_id=call.message.chat.id,
                 message_id=call.message.message_id,
                 text=f"✅ <b>Перевод:</b>\n\n{translated}",
                 parse_mode="HTML"
             )
     except Exception as e:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             chat_id=call.message.chat.id,
             message_id=call.message.message_id,
             text=f"❌ Ошибка перевода: {str(e)}"
         )
 
-    state_manager.clear_state(user_id)
+    await state_manager.clear_state(user_id)
 
 
 @bot.callback_query_handler(func=lambda c: c.data.startswith('img_'))
-def image_provider_callback(call):
+async def image_provider_callback(call):
     """Image provider selection with detailed info"""
     user_id = call.from_user.id
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
     # Map callback data to provider names
     provider_map = {
@@ -1552,12 +1554,12 @@ def image_provider_callback(call):
 
     provider = provider_map.get(call.data)
     if not provider:
-        bot.send_message(call.message.chat.id, "❌ Неверная модель")
+        await bot.send_message(call.message.chat.id, "❌ Неверная модель")
         return
 
-    prompt = state_manager.get_data(user_id, "image_prompt")
+    prompt = await state_manager.get_data(user_id, "image_prompt")
     if not prompt:
-        bot.send_message(call.message.chat.id, "❌ Промпт не найден. Пожалуйста, попробуйте снова.")
+        await bot.send_message(call.message.chat.id, "❌ Промпт не найден. Пожалуйста, попробуйте снова.")
         return
 
     # Model descriptions
@@ -1597,7 +1599,7 @@ def image_provider_callback(call):
     info = model_info.get(provider, model_info["sdxl"])
 
     # Edit the original message instead of sending new one
-    bot.edit_message_text(
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text=f"🎨 <b>Генерирую с {info['name']}</b>\n\n"
@@ -1608,17 +1610,17 @@ def image_provider_callback(call):
         parse_mode="HTML"
     )
 
-    task = generate_image_task.delay(prompt, provider)
-    state_manager.set_task_id(user_id, task.id)
+    task = await submit(generate_image_task, prompt, provider)
+    await state_manager.set_task_id(user_id, task.id)
 
     check_task_result(user_id, task.id, call.message.message_id, "generate_image")
 
 
 @bot.callback_query_handler(func=lambda c: c.data.startswith('tts_category_'))
-def tts_category_callback(call):
+async def tts_category_callback(call):
     """TTS category selection callback (New 2025)"""
     user_id = call.from_user.id
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
     category = call.data.replace('tts_category_', '')
 
@@ -1666,7 +1668,7 @@ def tts_category_callback(call):
         )
         text = "🎭 <b>Нейтральные голоса</b>\n\nВыберите голос:"
 
-    bot.edit_message_text(
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text=text,
@@ -1676,10 +1678,10 @@ def tts_category_callback(call):
 
 
 @bot.callback_query_handler(func=lambda c: c.data.startswith('tts_voice_'))
-def tts_voice_final_callback(call):
+async def tts_voice_final_callback(call):
     """TTS voice final selection callback (New 2025 with 20 voices)"""
     user_id = call.from_user.id
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
     voice_data = call.data.replace('tts_voice_', '')
 
@@ -1696,9 +1698,8 @@ def tts_voice_final_callback(call):
     voice_name = voice_name.replace('_f', '')
 
     # Store voice data
-    state_manager.set_data(user_id, "tts_voice", voice_name)
-    state_manager.set_data(user_id, "tts_speed", speed_type)
-    state_manager.set_state(user_id, STATES["WAITING_ADVANCED_TTS_TEXT"])
+    await state_manager.set_many(user_id, {"tts_voice": voice_name, "tts_speed": speed_type})
+    await state_manager.set_state(user_id, STATES["WAITING_ADVANCED_TTS_TEXT"])
 
     # Speed mapping
     speed_names = {
@@ -1708,7 +1709,7 @@ def tts_voice_final_callback(call):
         "vslow": "Очень медленный"
     }
 
-    bot.edit_message_text(
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text=f"✅ <b>Голос выбран:</b> {voice_name.capitalize()}\n"
@@ -1719,10 +1720,10 @@ def tts_voice_final_callback(call):
 
 
 @bot.callback_query_handler(func=lambda c: c.data.startswith('video_'))
-def video_model_callback(call):
+async def video_model_callback(call):
     """Text-to-video model selection callback"""
     user_id = call.from_user.id
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
     # Map callback data to model names
     model_map = {
@@ -1735,12 +1736,12 @@ def video_model_callback(call):
 
     model = model_map.get(call.data)
     if not model:
-        bot.send_message(call.message.chat.id, "❌ Неверная модель")
+        await bot.send_message(call.message.chat.id, "❌ Неверная модель")
         return
 
-    prompt = state_manager.get_data(user_id, "video_prompt")
+    prompt = await state_manager.get_data(user_id, "video_prompt")
     if not prompt:
-        bot.send_message(call.message.chat.id, "❌ Промпт не найден. Пожалуйста, попробуйте снова.")
+        await bot.send_message(call.message.chat.id, "❌ Промпт не найден. Пожалуйста, попробуйте снова.")
         return
 
     # Model descriptions (Updated 2025)
@@ -1775,7 +1776,7 @@ def video_model_callback(call):
     info = model_info.get(model, model_info["sora2"])
 
     # Edit message
-    bot.edit_message_text(
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text=f"🎬 <b>Генерирую с {info['name']}</b>\n\n"
@@ -1785,20 +1786,17 @@ def video_model_callback(call):
         parse_mode="HTML"
     )
 
-    # Import task
-    from tasks.tasks import generate_video_task
-
-    task = generate_video_task.delay(prompt, model)
-    state_manager.set_task_id(user_id, task.id)
+    task = await submit(generate_video_task, prompt, model)
+    await state_manager.set_task_id(user_id, task.id)
 
     check_task_result(user_id, task.id, call.message.message_id, "generate_video")
 
 
 @bot.callback_query_handler(func=lambda c: c.data.startswith('i2v_'))
-def image_to_video_model_callback(call):
+async def image_to_video_model_callback(call):
     """Image-to-video model selection callback"""
     user_id = call.from_user.id
-    bot.answer_callback_query(call.id)
+    await bot.answer_callback_query(call.id)
 
     # Map callback data to model names (Updated 2025)
     model_map = {
@@ -1809,12 +1807,12 @@ def image_to_video_model_callback(call):
 
     model = model_map.get(call.data)
     if not model:
-        bot.send_message(call.message.chat.id, "❌ Неверная модель")
+        await bot.send_message(call.message.chat.id, "❌ Неверная модель")
         return
 
-    image_b64 = state_manager.get_data(user_id, "image_for_video")
-    if not image_b64:
-        bot.send_message(call.message.chat.id, "❌ Изображение не найдено. Пожалуйста, попробуйте снова.")
+    image_ref = await state_manager.get_data(user_id, "image_for_video")
+    if not image_ref:
+        await bot.send_message(call.message.chat.id, "❌ Изображение не найдено. Пожалуйста, попробуйте снова.")
         return
 
     # Model descriptions (Updated 2025)
@@ -1839,7 +1837,7 @@ def image_to_video_model_callback(call):
     info = model_info.get(model, model_info["svd"])
 
     # Edit message
-    bot.edit_message_text(
+    await bot.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text=f"🖼️ <b>Создаю видео с {info['name']}</b>\n\n"
@@ -1849,48 +1847,40 @@ def image_to_video_model_callback(call):
         parse_mode="HTML"
     )
 
-    # Import task
-    from tasks.tasks import image_to_video_task
-
-    task = image_to_video_task.delay(image_b64, model)
-    state_manager.set_task_id(user_id, task.id)
+    task = await submit(image_to_video_task, image_ref, model)
+    await state_manager.set_task_id(user_id, task.id)
 
     check_task_result(user_id, task.id, call.message.message_id, "image_to_video")
 
 
 @bot.callback_query_handler(func=lambda c: c.data.startswith('select_idea_'))
-def select_idea_callback(call):
+async def select_idea_callback(call):
     """Select idea and generate post"""
     user_id = call.from_user.id
     idea_index = int(call.data.split('_')[-1])
 
-    bot.answer_callback_query(call.id, "✅ Идея выбрана!")
+    await bot.answer_callback_query(call.id, "✅ Идея выбрана!")
 
-    ideas = state_manager.get_data(user_id, "generated_ideas")
-    channel_id = state_manager.get_data(user_id, "selected_channel_id")
+    user_data = await state_manager.get_many(user_id, "generated_ideas", "selected_channel_id")
+    ideas = user_data["generated_ideas"]
+    channel_id = user_data["selected_channel_id"]
 
     if not ideas or idea_index >= len(ideas):
-        bot.send_message(call.message.chat.id, "❌ Идея не найдена")
+        await bot.send_message(call.message.chat.id, "❌ Идея не найдена")
         return
 
     selected_idea = ideas[idea_index]
 
     # Get channel data
-    channel = db.get_channel_by_id(channel_id)
+    channel = await async_db.get_channel_by_id(channel_id)
     if not channel:
-        bot.send_message(call.message.chat.id, "❌ Канал не найден")
+        await bot.send_message(call.message.chat.id, "❌ Канал не найден")
         return
 
-    style_data = {
-        'style_summary': channel['style_summary'],
-        'deep_analysis': channel.get('deep_analysis', ''),
-        'example_posts': channel.get('example_posts', [])
-    }
-
     # Generate post with selected idea
     topic = f"{selected_idea['title']}: {selected_idea['description']}"
 
-    processing_msg = bot.send_message(
+    processing_msg = await bot.send_message(
         call.message.chat.id,
         f"⏳ Генерирую посты с глубоким AI-анализом...\n\n"
         f"💡 <b>Тема:</b> {selected_idea['title']}\n\n"
@@ -1898,32 +1888,35 @@ def select_idea_callback(call):
         reply_markup=main_menu_keyboard()
     )
 
-    from tasks.tasks import generate_posts_task
-
-    task = generate_posts_task.delay(style_data, topic)
-    state_manager.set_task_id(user_id, task.id)
+    task = await submit(
+        generate_posts_task,
+        channel_id, topic,
+        stream_to={"chat_id": call.message.chat.id, "message_id": processing_msg.message_id}
+    )
+    await state_manager.set_task_id(user_id, task.id)
 
     check_task_result(user_id, task.id, processing_msg.message_id, "generate_posts")
 
 
 @bot.callback_query_handler(func=lambda c: c.data.startswith('select_post_'))
-def select_post_callback(call):
+async def select_post_callback(call):
     """Select post variant"""
     user_id = call.from_user.id
     post_index = int(call.data.split('_')[-1])
 
-    bot.answer_callback_query(call.id, "✅ Пост выбран!")
+    await bot.answer_callback_query(call.id, "✅ Пост выбран!")
 
-    posts = state_manager.get_data(user_id, "generated_posts")
-    channel_id = state_manager.get_data(user_id, "selected_channel_id")
+    user_data = await state_manager.get_many(user_id, "generated_posts", "selected_channel_id")
+    posts = user_data["generated_posts"]
+    channel_id = user_data["selected_channel_id"]
 
     if posts and post_index < len(posts):
         selected = posts[post_index]
 
         # Save to DB with channel_id
-        db.save_post(user_id, selected, channel_id=channel_id)
+        await write_behind.save_post_async(user_id, selected, channel_id=channel_id)
 
-        bot.send_message(
+        await bot.send_message(
             call.message.chat.id,
             selected
         )
@@ -1932,82 +1925,31 @@ def select_post_callback(call):
 # ===== TASK RESULT CHECKER =====
 
 def check_task_result(user_id: int, task_id: str, msg_id: int, task_type: str):
-    """Check Celery task result and handle response"""
+    """Deliver Celery task result to the user once the worker reports completion"""
     import html
 
-    def check_and_update():
-        task_result = celery_app.AsyncResult(task_id)
-
-        max_attempts = 300 
-        attempt = 0
-
-        while attempt < max_attempts:
-            if task_result.ready():
-                result = task_result.get()
-
-                if result.get("error"):
-                    # Escape HTML to prevent parsing errors
-                    error_text = html.escape(str(result['error']))
-                    bot.send_message(
-                        user_id,
-                        f"❌ Ошибка:\n<code>{error_text[:1000]}</code>",
-                        parse_mode="HTML"
-                    )
-                    return
-
-                # Handle different task types
-                if task_type == "analyze":
-                    handle_analyze_result(user_id, result)
-
-                elif task_type == "generate_posts":
-                    handle_posts_result(user_id, result)
-
-                elif task_type == "fetch_news":
-                    handle_news_result(user_id, result)
-
-                elif task_type == "generate_image":
-                    handle_image_result(user_id, result)
-
-                elif task_type == "edit_image":
-                    handle_edited_image_result(user_id, result)
-
-                elif task_type == "add_watermark":
-                    handle_watermarked_image_result(user_id, result)
-
-                elif task_type == "generate_ideas":
-                    handle_ideas_result(user_id, result)
-
-                elif task_type == "tts":
-                    handle_tts_result(user_id, result)
-
-                elif task_type == "transcribe":
-                    handle_transcribe_result(user_id, result)
-
-                elif task_type == "remove_watermark":
-                    handle_watermark_removed_result(user_id, result)
-
-                elif task_type == "remove_background":
-                    handle_background_removed_result(user_id, result)
-
-                elif task_type == "generate_video":
-                    handle_video_result(user_id, result)
-
-                elif task_type == "image_to_video":
-                    handle_video_result(user_id, result)
-
-                return
+    async def on_done(result: dict):
+        if result.get("error"):
+            # Escape HTML to prevent parsing errors
+            error_text = html.escape(str(result['error']))
+            await bot.send_message(
+                user_id,
+                f"❌ Ошибка:\n<code>{error_text[:1000]}</code>",
+                parse_mode="HTML"
+            )
+            return
 
-            time.sleep(1)
-            attempt += 1
+        handler = TASK_RESULT_HANDLERS.get(task_type)
+        if handler:
+            await handler(user_id, result)
 
-        bot.send_message(user_id, "❌ Превышено время ожидания. Пожалуйста, попробуйте снова.")
+    async def on_timeout():
+        await bot.send_message(user_id, "❌ Превышено время ожидания. Пожалуйста, попробуйте снова.")
 
-    # Run in thread to not block bot
-    import threading
-    threading.Thread(target=check_and_update).start()
+    task_dispatcher.watch(task_id, on_done, on_timeout)
 
 
-def handle_analyze_result(user_id: int, result: dict):
+async def handle_analyze_result(user_id: int, result: dict):
     """Handle channel analysis result with DEEP AI analysis"""
     import html
 
@@ -2017,24 +1959,17 @@ def handle_analyze_result(user_id: int, result: dict):
     channel_title = result.get("channel_title", "Неизвестный канал")
 
     if not style:
-        bot.send_message(user_id, "❌ Анализ не удался")
+        await bot.send_message(user_id, "❌ Анализ не удался")
         return
 
     # Get channel URL from state
-    channel_url = state_manager.get_data(user_id, "analyzing_channel_url") or "unknown"
+    channel_url = await state_manager.get_data(user_id, "analyzing_channel_url") or "unknown"
 
-    # Save to DB with ALL analysis data
-    db.save_channel_style(
-        user_id,
-        channel_url,
-        channel_title,
-        style,
-        deep_analysis,
-        example_posts
-    )
+    # Link the shared analysis to the user
+    await async_db.save_channel_style(user_id, channel_url, channel_title, result["chat_id"])
 
     # Clean up temp data
-    state_manager.delete_data(user_id, "analyzing_channel_url")
+    await state_manager.delete_data(user_id, "analyzing_channel_url")
 
     # Format response with AI analysis preview (escape HTML!)
     analysis_preview = deep_analysis[:400] if len(deep_analysis) > 400 else deep_analysis
@@ -2060,25 +1995,25 @@ def handle_analyze_result(user_id: int, result: dict):
 ✨ Теперь я буду генерировать посты, НЕОТЛИЧИМЫЕ от оригинала!
 Используйте ✍️ Создать пост для генерации."""
 
-    bot.send_message(user_id, response)
+    await bot.send_message(user_id, response)
 
 
-def handle_posts_result(user_id: int, result: dict):
+async def handle_posts_result(user_id: int, result: dict):
     """Handle generated posts result"""
     posts = result.get("posts", [])
 
     if not posts:
-        bot.send_message(user_id, "❌ Посты не созданы")
+        await bot.send_message(user_id, "❌ Посты не созданы")
         return
 
     # Save posts
-    state_manager.set_data(user_id, "generated_posts", posts)
+    await state_manager.set_data(user_id, "generated_posts", posts)
 
     # Send variants
     keyboard = types.InlineKeyboardMarkup(row_width=1)
 
     for i, post in enumerate(posts):
-        bot.send_message(user_id, f"<b>Вариант {i+1}:</b>\n\n{post}")
+        await bot.send_message(user_id, f"<b>Вариант {i+1}:</b>\n\n{post}")
 
         keyboard.add(
             types.InlineKeyboardButton(
@@ -2087,23 +2022,23 @@ def handle_posts_result(user_id: int, result: dict):
             )
         )
 
-    bot.send_message(
+    await bot.send_message(
         user_id,
         "Выберите понравившийся вариант:",
         reply_markup=keyboard
     )
 
 
-def handle_news_result(user_id: int, result: dict):
+async def handle_news_result(user_id: int, result: dict):
     """Handle news fetch result"""
     news_list = result.get("news", [])
 
     if not news_list:
-        bot.send_message(user_id, "❌ Новости не найдены")
+        await bot.send_message(user_id, "❌ Новости не найдены")
         return
 
     # Save news
-    state_manager.set_data(user_id, "news_list", news_list)
+    await state_manager.set_data(user_id, "news_list", news_list)
 
     # Send news
     response = "📰 <b>Последние новости:</b>\n\n"
@@ -2121,67 +2056,67 @@ def handle_news_result(user_id: int, result: dict):
             )
         )
 
-    bot.send_message(user_id, response, reply_markup=keyboard, disable_web_page_preview=True)
+    await bot.send_message(user_id, response, reply_markup=keyboard, disable_web_page_preview=True)
 
 
-def handle_image_result(user_id: int, result: dict):
+async def handle_image_result(user_id: int, result: dict):
     """Handle generated image result"""
-    img_b64 = result.get("image")
+    image_ref = result.get("image_ref")
 
-    if not img_b64:
-        bot.send_message(user_id, "❌ Не удалось создать изображение")
+    if not image_ref:
+        await bot.send_message(user_id, "❌ Не удалось создать изображение")
         return
 
-    # Decode image
-    img_bytes = base64.b64decode(img_b64)
+    # Load image
+    img_bytes = await asyncio.to_thread(blob_store.get, image_ref)
 
     # Send image
-    bot.send_photo(user_id, photo=img_bytes, caption="✅ Ваше сгенерированное изображение!")
+    await bot.send_photo(user_id, photo=img_bytes, caption="✅ Ваше сгенерированное изображение!")
 
     # Save image data
-    state_manager.set_data(user_id, "current_image", img_b64)
+    await state_manager.set_data(user_id, "current_image", image_ref)
 
 
-def handle_edited_image_result(user_id: int, result: dict):
+async def handle_edited_image_result(user_id: int, result: dict):
     """Handle edited image result"""
-    img_b64 = result.get("image")
+    image_ref = result.get("image_ref")
 
-    if not img_b64:
-        bot.send_message(user_id, "❌ Не удалось отредактировать изображение")
+    if not image_ref:
+        await bot.send_message(user_id, "❌ Не удалось отредактировать изображение")
         return
 
-    img_bytes = base64.b64decode(img_b64)
+    img_bytes = await asyncio.to_thread(blob_store.get, image_ref)
 
-    bot.send_photo(user_id, photo=img_bytes, caption="✅ Ваше отредактированное изображение!")
+    await bot.send_photo(user_id, photo=img_bytes, caption="✅ Ваше отредактированное изображение!")
 
-    state_manager.set_data(user_id, "current_image", img_b64)
+    await state_manager.set_data(user_id, "current_image", image_ref)
 
 
-def handle_watermarked_image_result(user_id: int, result: dict):
+async def handle_watermarked_image_result(user_id: int, result: dict):
     """Handle watermarked image result"""
-    img_b64 = result.get("image")
+    image_ref = result.get("image_ref")
 
-    if not img_b64:
-        bot.send_message(user_id, "❌ Не удалось применить водяной знак")
+    if not image_ref:
+        await bot.send_message(user_id, "❌ Не удалось применить водяной знак")
         return
 
-    img_bytes = base64.b64decode(img_b64)
+    img_bytes = await asyncio.to_thread(blob_store.get, image_ref)
 
-    bot.send_photo(user_id, photo=img_bytes, caption="✅ Водяной знак применен!")
+    await bot.send_photo(user_id, photo=img_bytes, caption="✅ Водяной знак применен!")
 
 
-def handle_ideas_result(user_id: int, result: dict):
+async def handle_ideas_result(user_id: int, result: dict):
     """Handle generated ideas result"""
     import html
 
     ideas = result.get("ideas", [])
 
     if not ideas:
-        bot.send_message(user_id, "❌ Не удалось сгенерировать идеи. Попробуйте еще раз.")
+        await bot.send_message(user_id, "❌ Не удалось сгенерировать идеи. Попробуйте еще раз.")
         return
 
     # Save ideas
-    state_manager.set_data(user_id, "generated_ideas", ideas)
+    await state_manager.set_data(user_id, "generated_ideas", ideas)
 
     # Show ideas as inline buttons
     keyboard = types.InlineKeyboardMarkup(row_width=1)
@@ -2208,30 +2143,53 @@ def handle_ideas_result(user_id: int, result: dict):
             )
         )
 
-    bot.send_message(user_id, response, reply_markup=keyboard)
+    await bot.send_message(user_id, response, reply_markup=keyboard)
 
 
-def handle_tts_result(user_id: int, result: dict):
+async def handle_tts_result(user_id: int, result: dict):
     """Handle TTS result"""
-    audio_b64 = result.get("audio")
+    audio_ref = result.get("audio_ref")
 
-    if not audio_b64:
-        bot.send_message(user_id, "❌ Не удалось озвучить текст")
+    if not audio_ref:
+        await bot.send_message(user_id, "❌ Не удалось озвучить текст")
         return
 
-    # Decode audio
-    audio_bytes = base64.b64decode(audio_b64)
+    # Load audio
+    audio_bytes = await asyncio.to_thread(blob_store.get, audio_ref)
 
     # Send audio
-    bot.send_voice(user_id, voice=audio_bytes, caption="✅ Ваш озвученный текст!")
+    await bot.send_voice(user_id, voice=audio_bytes, caption="✅ Ваш озвученный текст!")
+
+
+async def handle_advanced_tts_result(user_id: int, result: dict):
+    """Handle advanced TTS result"""
+    audio_ref = result.get("audio_ref")
+
+    if not audio_ref:
+        await bot.send_message(user_id, "❌ Не удалось озвучить текст")
+        return
 
+    # Load audio
+    audio_bytes = await asyncio.to_thread(blob_store.get, audio_ref)
 
-def handle_transcribe_result(user_id: int, result: dict):
+    voice = result.get("voice", "")
+    await bot.send_audio(
+        user_id,
+        audio_bytes,
+        caption=f"🎤 Голос: {voice.capitalize()} | Темп: {result.get('speed', 1.0)}x",
+        title="TTS Audio"
+    )
+
+
+async def handle_transcribe_result(user_id: int, result: dict):
     """Handle transcription result"""
     text = result.get("text")
+    if text and result.get("chunks", 1) > 1:
+        # Long recordings: one line per segment with its position
+        text = result.get("timestamped_text") or text
 
     if not text:
-        bot.send_message(user_id, "❌ Не удалось транскрибировать аудио")
+        await bot.send_message(user_id, "❌ Не удалось транскрибировать аудио")
         return
 
     # Send transcription
@@ -2242,58 +2200,126 @@ def handle_transcribe_result(user_id: int, result: dict):
         # Send in parts
         parts = [response[i:i+4000] for i in range(0, len(response), 4000)]
         for part in parts:
-            bot.send_message(user_id, part)
+            await bot.send_message(user_id, part)
     else:
-        bot.send_message(user_id, response)
+        await bot.send_message(user_id, response)
 
 
-def handle_watermark_removed_result(user_id: int, result: dict):
+async def handle_watermark_removed_result(user_id: int, result: dict):
     """Handle watermark removal result"""
-    img_b64 = result.get("image")
+    image_ref = result.get("image_ref")
 
-    if not img_b64:
-        bot.send_message(user_id, "❌ Не удалось удалить водяной знак")
+    if not image_ref:
+        await bot.send_message(user_id, "❌ Не удалось удалить водяной знак")
         return
 
-    img_bytes = base64.b64decode(img_b64)
+    img_bytes = await asyncio.to_thread(blob_store.get, image_ref)
 
-    bot.send_photo(user_id, photo=img_bytes, caption="✅ Водяной знак удален!")
+    await bot.send_photo(user_id, photo=img_bytes, caption="✅ Водяной знак удален!")
 
 
-def handle_background_removed_result(user_id: int, result: dict):
+async def handle_background_removed_result(user_id: int, result: dict):
     """Handle background removal result"""
-    img_b64 = result.get("image")
+    image_ref = result.get("image_ref")
 
-    if not img_b64:
-        bot.send_message(user_id, "❌ Не удалось удалить фон")
+    if not image_ref:
+        await bot.send_message(user_id, "❌ Не удалось удалить фон")
         return
 
-    img_bytes = base64.b64decode(img_b64)
+    img_bytes = await asyncio.to_thread(blob_store.get, image_ref)
 
-    bot.send_photo(user_id, photo=img_bytes, caption="✅ Фон успешно удален! 🗑✨")
+    await bot.send_photo(user_id, photo=img_bytes, caption="✅ Фон успешно удален! 🗑✨")
 
 
-def handle_video_result(user_id: int, result: dict):
+async def handle_video_result(user_id: int, result: dict):
     """Handle video generation result"""
-    video_b64 = result.get("video")
+    video_ref = result.get("video_ref")
 
-    if not video_b64:
-        bot.send_message(user_id, "❌ Не удалось создать видео")
+    if not video_ref:
+        await bot.send_message(user_id, "❌ Не удалось создать видео")
         return
 
-    video_bytes = base64.b64decode(video_b64)
-
-    bot.send_video(user_id, video=video_bytes, caption="✅ Ваше видео готово! 🎬✨")
+    video_bytes = await asyncio.to_thread(blob_store.get, video_ref)
+
+    await bot.send_video(user_id, video=video_bytes, caption="✅ Ваше видео готово! 🎬✨")
+
+
+# Task type -> result handler
+TASK_RESULT_HANDLERS = {
+    "analyze": handle_analyze_result,
+    "generate_posts": handle_posts_result,
+    "fetch_news": handle_news_result,
+    "generate_image": handle_image_result,
+    "edit_image": handle_edited_image_result,
+    "add_watermark": handle_watermarked_image_result,
+    "generate_ideas": handle_ideas_result,
+    "tts": handle_tts_result,
+    "transcribe": handle_transcribe_result,
+    "remove_watermark": handle_watermark_removed_result,
+    "remove_background": handle_background_removed_result,
+    "generate_video": handle_video_result,
+    "image_to_video": handle_video_result,
+}
 
 
 # ===== MAIN =====
 
+# Webhook update handlers run detached; keep references until they finish
+_update_tasks = set()
+
+
+async def handle_webhook(request: web.Request) -> web.Response:
+    """Receive an update from Telegram and process it in the background"""
+    if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+        return web.Response(status=403)
+
+    update = types.Update.de_json(await request.text())
+    # Answer right away: Telegram holds back further updates until we do
+    task = asyncio.create_task(bot.process_new_updates([update]))
+    _update_tasks.add(task)
+    task.add_done_callback(_update_tasks.discard)
+    return web.Response()
+
+
+async def run_webhook():
+    """Serve updates over HTTP and register the webhook with Telegram"""
+    app = web.Application()
+    app.router.add_post(urlparse(WEBHOOK_URL).path or "/", handle_webhook)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+
+    await bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET or None)
+    print(f"Webhook: {WEBHOOK_URL} (listening on {WEBHOOK_HOST}:{WEBHOOK_PORT})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def main():
+    task_dispatcher.start()
+    try:
+        if WEBHOOK_URL:
+            await run_webhook()
+        else:
+            # getUpdates is refused while a webhook is set
+            await bot.remove_webhook()
+            print("Long polling")
+            await bot.infinity_polling(timeout=30)
+    finally:
+        await task_dispatcher.stop()
+        await async_db.close()
+        await state_manager.close()
+        await bot.close_session()
+        write_behind.stop()
+
+
 if __name__ == '__main__':
     print("🤖 SMM Bot started!")
     print("Press Ctrl+C to stop")
 
     try:
-        bot.infinity_polling(timeout=30, long_polling_timeout=30)
+        asyncio.run(main())
     except KeyboardInterrupt:
         print("\n👋 Bot stopped")
-
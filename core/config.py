@@ -12,8 +12,27 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 API_ID = int(os.getenv("API_ID", "0"))
 API_HASH = os.getenv("API_HASH")
+# Bot API base URL (point to a local Bot API server to lift the 20 MB download limit)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+# Pass Telegram file_id to workers and let them download the file themselves
+WORKER_FILE_FETCH = os.getenv("WORKER_FILE_FETCH", "true").lower() == "true"
+# Minimum seconds between progressive edits of a streamed reply
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "0.8"))
+# Public HTTPS URL Telegram posts updates to; long polling is used when empty
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # checked against X-Telegram-Bot-Api-Secret-Token
 # Convert to absolute path for Pyrogram
 SESSION_NAME = str(BASE_DIR / os.getenv("SESSION_NAME", "sessions/smm_bot"))
+# Pyrogram session files used by workers (comma-separated); each worker process
+# claims one exclusively, so more sessions = more analyses in parallel
+PYROGRAM_SESSIONS = [
+    str(BASE_DIR / name.strip())
+    for name in os.getenv("PYROGRAM_SESSIONS", os.getenv("SESSION_NAME", "sessions/smm_bot")).split(",")
+    if name.strip()
+]
+PYROGRAM_SESSION_WAIT = float(os.getenv("PYROGRAM_SESSION_WAIT", "60"))  # seconds to wait for a free session
 
 # Database
 DB_HOST = os.getenv("DB_HOST", "localhost")
@@ -24,6 +43,18 @@ DB_NAME = os.getenv("DB_NAME", "smm_bot")
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Connection pool (per process)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_HEALTH_CHECK_INTERVAL = int(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))  # ping connections idle longer than this
+
+# Write-behind queue for user/post/image bookkeeping writes
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "1"))  # max seconds a write waits
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "3"))
+
 # Redis
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
@@ -32,10 +63,46 @@ REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "")
 
 REDIS_URL = f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}" if REDIS_PASSWORD else f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
 
+# In-process cache of user states in the bot (seconds / entries)
+STATE_CACHE_TTL = float(os.getenv("STATE_CACHE_TTL", "5"))
+STATE_CACHE_SIZE = int(os.getenv("STATE_CACHE_SIZE", "10000"))
+
 # Celery
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
 
+# Blob store for media exchanged between bot and workers ("redis" or "local")
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "redis")
+BLOB_STORE_DIR = str(BASE_DIR / os.getenv("BLOB_STORE_DIR", "blobs"))
+BLOB_TTL = int(os.getenv("BLOB_TTL", "86400"))  # 24 hours
+BLOB_PURGE_INTERVAL = int(os.getenv("BLOB_PURGE_INTERVAL", "3600"))  # local backend: beat removes expired files
+
+# Gemini context cache for a channel's style prefix (deep analysis + examples)
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+PROMPT_CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "3600"))  # seconds
+
+# Shared translation cache (prompts translated for image/video models, /translate)
+TRANSLATION_CACHE_TTL = int(os.getenv("TRANSLATION_CACHE_TTL", "2592000"))  # 30 days, refreshed on hit
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "50000"))  # LRU beyond this
+
+# Background removal (rembg): default model, models loaded at worker start
+# (comma-separated; u2net, u2netp, isnet, ...) and ONNX threads per process (0 = cores / concurrency)
+REMBG_DEFAULT_MODEL = os.getenv("REMBG_DEFAULT_MODEL", "u2net")
+REMBG_PRELOAD_MODELS = [name.strip() for name in os.getenv("REMBG_PRELOAD_MODELS", REMBG_DEFAULT_MODEL).split(",") if name.strip()]
+REMBG_THREADS = int(os.getenv("REMBG_THREADS", "0"))
+
+# Voiceover cache: (text, model, voice, speed) -> audio blob; capped at BLOB_TTL
+TTS_CACHE_TTL = int(os.getenv("TTS_CACHE_TTL", "86400"))  # seconds, refreshed on hit
+
+# Speech-to-text: recordings are split on pauses into chunks of at most this many
+# seconds, transcribed this many at a time
+TRANSCRIBE_CHUNK_SECONDS = int(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "600"))
+TRANSCRIBE_PARALLELISM = int(os.getenv("TRANSCRIBE_PARALLELISM", "8"))
+
+# Deadline (seconds) of a single AI provider call; io tasks run in threads,
+# where Celery's time limits are not enforced
+PROVIDER_TIMEOUT = int(os.getenv("PROVIDER_TIMEOUT", "240"))
+
 # AI APIs
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -44,9 +111,22 @@ REPLICATE_API_KEY = os.getenv("REPLICATE_API_KEY")
 # News API
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 
+# Background RSS ingestion into the shared news store (seconds)
+NEWS_INGEST_INTERVAL = int(os.getenv("NEWS_INGEST_INTERVAL", "300"))  # Celery beat period
+NEWS_TTL = int(os.getenv("NEWS_TTL", "259200"))  # 3 days per stored entry
+
 # App settings
 MAX_POSTS_TO_ANALYZE = int(os.getenv("MAX_POSTS_TO_ANALYZE", "50"))
+# Re-run the deep style analysis once this many new posts have been fetched
+ANALYSIS_REFRESH_MIN_NEW_POSTS = int(os.getenv("ANALYSIS_REFRESH_MIN_NEW_POSTS", "10"))
+# Serve a channel analysis from the shared cache if it was synced within this many seconds
+CHANNEL_ANALYSIS_FRESHNESS = int(os.getenv("CHANNEL_ANALYSIS_FRESHNESS", "21600"))  # 6 hours
+# News items per group (Russian / world) passed to the post ideas prompt after local ranking
+IDEAS_NEWS_TOP_K = int(os.getenv("IDEAS_NEWS_TOP_K", "8"))
 TASK_TIMEOUT = int(os.getenv("TASK_TIMEOUT", "300"))  # 5 minutes
+# AI chat: messages kept in a conversation's history and seconds to wait for a reply
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "20"))
+CHAT_TIMEOUT = int(os.getenv("CHAT_TIMEOUT", "120"))
 
 # Validate required settings
 def validate_config():
@@ -1,11 +1,69 @@
 """Redis state manager for user sessions"""
 import redis
+import redis.asyncio as aioredis
 import json
-from typing import Any, Optional
-from core.config import REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD
+import threading
+from typing import Any, Dict, List, Optional
+from cachetools import TTLCache
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+from core.config import (
+    REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD,
+    STATE_CACHE_SIZE, STATE_CACHE_TTL
+)
 
+# Marks "not cached" (None is a valid cached state)
+_MISSING = object()
 
-class StateManager:
+# Append JSON entries to a JSON list stored in a hash field and keep the newest ones.
+# KEYS[1] hash, ARGV: field, max entries, ttl, entries...
+_APPEND_LIST_SCRIPT = """
+local items = {}
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+if raw then
+    local ok, decoded = pcall(cjson.decode, raw)
+    if ok and type(decoded) == 'table' then
+        items = decoded
+    end
+end
+for i = 4, #ARGV do
+    table.insert(items, cjson.decode(ARGV[i]))
+end
+local max_entries = tonumber(ARGV[2])
+while #items > max_entries do
+    table.remove(items, 1)
+end
+redis.call('HSET', KEYS[1], ARGV[1], cjson.encode(items))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return #items
+"""
+
+
+class _StateLayout:
+    """Key layout and value encoding shared by the sync and async managers"""
+
+    @staticmethod
+    def _data_key(user_id: int) -> str:
+        """All data fields of a user live in one hash with a single TTL"""
+        return f"user_data:{user_id}"
+
+    @staticmethod
+    def _encode(value: Any):
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return value
+
+    @staticmethod
+    def _decode(value: Optional[str]) -> Optional[Any]:
+        if value:
+            try:
+                return json.loads(value)
+            except:
+                return value
+        return None
+
+
+class StateManager(_StateLayout):
     """Manage user states in Redis"""
 
     def __init__(self):
@@ -23,6 +81,18 @@ class StateManager:
             health_check_interval=30
         )
         self.redis = redis.Redis(connection_pool=self.pool)
+        self._append_list = self.redis.register_script(_APPEND_LIST_SCRIPT)
+
+        # Short-lived in-process LRU cache in front of get_state.
+        # Writes go through it, the TTL only bounds staleness from
+        # changes made by other processes.
+        self._state_cache = TTLCache(maxsize=STATE_CACHE_SIZE, ttl=STATE_CACHE_TTL)
+        self._state_cache_lock = threading.Lock()
+
+    def _cache_state(self, user_id: int, state: Optional[str]):
+        """Put state into the local cache"""
+        with self._state_cache_lock:
+            self._state_cache[user_id] = state
 
     def _execute_with_retry(self, func, *args, **kwargs):
         """Execute Redis command with automatic retry on connection error"""
@@ -47,52 +117,122 @@ class StateManager:
     def set_state(self, user_id: int, state: str, ttl: int = 3600):
         """Set user state"""
         key = f"state:{user_id}"
-        return self._execute_with_retry(self.redis.setex, key, ttl, state)
+        result = self._execute_with_retry(self.redis.setex, key, ttl, state)
+        self._cache_state(user_id, state)
+        return result
 
     def get_state(self, user_id: int) -> Optional[str]:
-        """Get user state"""
+        """Get user state (served from the local cache when fresh)"""
+        with self._state_cache_lock:
+            state = self._state_cache.get(user_id, _MISSING)
+        if state is not _MISSING:
+            return state
+
         key = f"state:{user_id}"
-        return self._execute_with_retry(self.redis.get, key)
+        state = self._execute_with_retry(self.redis.get, key)
+        self._cache_state(user_id, state)
+        return state
 
     def clear_state(self, user_id: int):
         """Clear user state"""
         key = f"state:{user_id}"
-        return self._execute_with_retry(self.redis.delete, key)
+        result = self._execute_with_retry(self.redis.delete, key)
+        self._cache_state(user_id, None)
+        return result
+
+    def _pipeline(self, build):
+        """Build and execute a MULTI/EXEC pipeline with retry"""
+        def run():
+            pipe = self.redis.pipeline()
+            build(pipe)
+            return pipe.execute()
+        return self._execute_with_retry(run)
 
     def set_data(self, user_id: int, key: str, value: Any, ttl: int = 3600):
         """Set user data"""
-        redis_key = f"data:{user_id}:{key}"
-        if isinstance(value, (dict, list)):
-            value = json.dumps(value)
-        return self._execute_with_retry(self.redis.setex, redis_key, ttl, value)
+        return self.set_many(user_id, {key: value}, ttl)
+
+    def set_many(self, user_id: int, values: Dict[str, Any], ttl: int = 3600):
+        """Set several user data fields in one round-trip"""
+        redis_key = self._data_key(user_id)
+        mapping = {key: self._encode(value) for key, value in values.items()}
+
+        def build(pipe):
+            pipe.hset(redis_key, mapping=mapping)
+            pipe.expire(redis_key, ttl)
+
+        return self._pipeline(build)
+
+    def append_to_list(self, user_id: int, key: str, entries: List[Any],
+                       max_entries: int, ttl: int = 3600) -> int:
+        """
+        Append entries to a list field in one atomic step, keeping the
+        newest max_entries; concurrent appends never overwrite each other.
+        Returns the new length.
+        """
+        args = [key, max_entries, ttl] + [json.dumps(entry) for entry in entries]
+        return self._execute_with_retry(
+            lambda: self._append_list(keys=[self._data_key(user_id)], args=args, client=self.redis)
+        )
 
     def get_data(self, user_id: int, key: str) -> Optional[Any]:
         """Get user data"""
-        redis_key = f"data:{user_id}:{key}"
-        value = self._execute_with_retry(self.redis.get, redis_key)
+        value = self._execute_with_retry(self.redis.hget, self._data_key(user_id), key)
+        return self._decode(value)
 
-        if value:
-            try:
-                return json.loads(value)
-            except:
-                return value
-        return None
+    def get_many(self, user_id: int, *keys: str) -> Dict[str, Any]:
+        """Get several user data fields in one round-trip"""
+        values = self._execute_with_retry(self.redis.hmget, self._data_key(user_id), keys)
+        return {key: self._decode(value) for key, value in zip(keys, values)}
 
     def delete_data(self, user_id: int, key: str):
         """Delete user data"""
-        redis_key = f"data:{user_id}:{key}"
-        return self._execute_with_retry(self.redis.delete, redis_key)
+        return self._execute_with_retry(self.redis.hdel, self._data_key(user_id), key)
 
     def clear_user_data(self, user_id: int):
         """Clear all user data"""
-        pattern = f"data:{user_id}:*"
-        try:
-            keys = list(self._execute_with_retry(self.redis.scan_iter, pattern))
-            if keys:
-                self._execute_with_retry(self.redis.delete, *keys)
-        except Exception as e:
-            # If scanning fails, just log and continue
-            print(f"Warning: Failed to clear user data: {e}")
+        return self._execute_with_retry(self.redis.delete, self._data_key(user_id))
+
+    def migrate_legacy_data(self, batch_size: int = 500) -> int:
+        """
+        Move data from the old per-field layout (data:{user_id}:{key})
+        into per-user hashes. Existing hash fields win, so it is safe to
+        run while the bot is live and to run more than once.
+        Returns the number of migrated fields.
+        """
+        migrated = 0
+        batch = []
+
+        def flush(keys):
+            pipe = self.redis.pipeline(transaction=False)
+            for legacy_key in keys:
+                pipe.get(legacy_key)
+                pipe.ttl(legacy_key)
+            replies = pipe.execute()
+
+            pipe = self.redis.pipeline(transaction=False)
+            count = 0
+            for legacy_key, value, ttl in zip(keys, replies[::2], replies[1::2]):
+                if value is None:
+                    continue
+                _, user_id, field = legacy_key.split(":", 2)
+                hash_key = self._data_key(int(user_id))
+                pipe.hsetnx(hash_key, field, value)
+                pipe.expire(hash_key, ttl if ttl and ttl > 0 else 3600)
+                pipe.delete(legacy_key)
+                count += 1
+            pipe.execute()
+            return count
+
+        for legacy_key in self.redis.scan_iter("data:*:*", count=batch_size):
+            batch.append(legacy_key)
+            if len(batch) >= batch_size:
+                migrated += flush(batch)
+                batch = []
+        if batch:
+            migrated += flush(batch)
+
+        return migrated
 
     def set_task_id(self, user_id: int, task_id: str, ttl: int = 600):
         """Save task ID for user"""
@@ -110,5 +250,102 @@ class StateManager:
         return self._execute_with_retry(self.redis.delete, key)
 
 
-# Global instance
+class AsyncStateManager(_StateLayout):
+    """
+    Same API as StateManager on the asyncio Redis client, for the bot's
+    event loop. Commands are retried on connection errors by the client.
+    """
+
+    def __init__(self):
+        self.pool = aioredis.ConnectionPool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD if REDIS_PASSWORD else None,
+            decode_responses=True,
+            max_connections=50,
+            socket_keepalive=True,
+            socket_connect_timeout=5,
+            retry=Retry(NoBackoff(), 2),
+            retry_on_error=[ConnectionResetError],
+            retry_on_timeout=True,
+            health_check_interval=30
+        )
+        self.redis = aioredis.Redis(connection_pool=self.pool)
+
+        # Only touched from the event loop, so no lock
+        self._state_cache = TTLCache(maxsize=STATE_CACHE_SIZE, ttl=STATE_CACHE_TTL)
+
+    async def close(self):
+        """Close pooled connections"""
+        await self.redis.aclose()
+        await self.pool.disconnect()
+
+    async def set_state(self, user_id: int, state: str, ttl: int = 3600):
+        """Set user state"""
+        result = await self.redis.setex(f"state:{user_id}", ttl, state)
+        self._state_cache[user_id] = state
+        return result
+
+    async def get_state(self, user_id: int) -> Optional[str]:
+        """Get user state (served from the local cache when fresh)"""
+        state = self._state_cache.get(user_id, _MISSING)
+        if state is not _MISSING:
+            return state
+
+        state = await self.redis.get(f"state:{user_id}")
+        self._state_cache[user_id] = state
+        return state
+
+    async def clear_state(self, user_id: int):
+        """Clear user state"""
+        result = await self.redis.delete(f"state:{user_id}")
+        self._state_cache[user_id] = None
+        return result
+
+    async def set_data(self, user_id: int, key: str, value: Any, ttl: int = 3600):
+        """Set user data"""
+        return await self.set_many(user_id, {key: value}, ttl)
+
+    async def set_many(self, user_id: int, values: Dict[str, Any], ttl: int = 3600):
+        """Set several user data fields in one round-trip"""
+        redis_key = self._data_key(user_id)
+        mapping = {key: self._encode(value) for key, value in values.items()}
+        async with self.redis.pipeline() as pipe:
+            pipe.hset(redis_key, mapping=mapping)
+            pipe.expire(redis_key, ttl)
+            return await pipe.execute()
+
+    async def get_data(self, user_id: int, key: str) -> Optional[Any]:
+        """Get user data"""
+        return self._decode(await self.redis.hget(self._data_key(user_id), key))
+
+    async def get_many(self, user_id: int, *keys: str) -> Dict[str, Any]:
+        """Get several user data fields in one round-trip"""
+        values = await self.redis.hmget(self._data_key(user_id), keys)
+        return {key: self._decode(value) for key, value in zip(keys, values)}
+
+    async def delete_data(self, user_id: int, key: str):
+        """Delete user data"""
+        return await self.redis.hdel(self._data_key(user_id), key)
+
+    async def clear_user_data(self, user_id: int):
+        """Clear all user data"""
+        return await self.redis.delete(self._data_key(user_id))
+
+    async def set_task_id(self, user_id: int, task_id: str, ttl: int = 600):
+        """Save task ID for user"""
+        return await self.redis.setex(f"task:{user_id}", ttl, task_id)
+
+    async def get_task_id(self, user_id: int) -> Optional[str]:
+        """Get task ID for user"""
+        return await self.redis.get(f"task:{user_id}")
+
+    async def clear_task_id(self, user_id: int):
+        """Clear task ID"""
+        return await self.redis.delete(f"task:{user_id}")
+
+
+# Global instances: the sync one for scripts and workers, the async one for the bot
 state_manager = StateManager()
+async_state_manager = AsyncStateManager()
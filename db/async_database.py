@@ -0,0 +1,130 @@
+"""Async database access for the bot's event loop (asyncpg)"""
+import asyncio
+import json
+from typing import Dict, List, Optional
+
+import asyncpg
+
+from core.config import (
+    DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME,
+    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT
+)
+
+
+async def _init_connection(conn: asyncpg.Connection):
+    """Decode json/jsonb columns to Python objects like psycopg2 does"""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name, schema="pg_catalog", encoder=json.dumps, decoder=json.loads
+        )
+
+
+class AsyncDatabase:
+    """
+    Reads and writes the bot awaits while handling an update.
+
+    Queries mirror the ones in db.database.Database; bookkeeping inserts
+    still go through the write-behind queue.
+    """
+
+    def __init__(self):
+        self._pool: Optional[asyncpg.Pool] = None
+        self._pool_lock = asyncio.Lock()
+
+    async def get_pool(self) -> asyncpg.Pool:
+        """Return the connection pool (created on first use)"""
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        host=DB_HOST,
+                        port=int(DB_PORT),
+                        user=DB_USER,
+                        password=DB_PASSWORD,
+                        database=DB_NAME,
+                        min_size=DB_POOL_MIN,
+                        max_size=DB_POOL_MAX,
+                        timeout=DB_POOL_TIMEOUT,
+                        init=_init_connection
+                    )
+        return self._pool
+
+    async def close(self):
+        """Close the pool"""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def save_channel_style(self, user_id: int, channel_url: str, channel_title: str, chat_id: int) -> int:
+        """Link user's channel to the shared analysis of the chat"""
+        pool = await self.get_pool()
+        # The analysis itself lives in channel_analyses; clear legacy copies
+        return await pool.fetchval(
+            """
+            INSERT INTO channels (user_id, channel_url, channel_title, chat_id, analyzed_at)
+            VALUES ($1, $2, $3, $4, CURRENT_TIMESTAMP)
+            ON CONFLICT (user_id, channel_url) DO UPDATE
+            SET channel_title = EXCLUDED.channel_title,
+                chat_id = EXCLUDED.chat_id,
+                style_summary = NULL,
+                deep_analysis = NULL,
+                example_posts = NULL,
+                analyzed_at = CURRENT_TIMESTAMP
+            RETURNING id
+            """,
+            user_id, channel_url, channel_title, chat_id
+        )
+
+    async def get_user_channels(self, user_id: int) -> List[Dict]:
+        """Get all channels analyzed by user"""
+        pool = await self.get_pool()
+        rows = await pool.fetch(
+            """
+            SELECT id, channel_url, channel_title, analyzed_at
+            FROM channels
+            WHERE user_id = $1
+            ORDER BY analyzed_at DESC
+            """,
+            user_id
+        )
+        return [dict(row) for row in rows]
+
+    async def get_channel_by_id(self, channel_id: int) -> Optional[Dict]:
+        """Get channel by ID with deep analysis and examples"""
+        pool = await self.get_pool()
+        result = await pool.fetchrow(
+            """
+            SELECT c.id, c.user_id, c.channel_url, c.channel_title, c.chat_id,
+                   COALESCE(a.style_summary, c.style_summary) AS style_summary,
+                   COALESCE(a.deep_analysis, c.deep_analysis) AS deep_analysis,
+                   COALESCE(a.example_posts, c.example_posts) AS example_posts,
+                   c.analyzed_at
+            FROM channels c
+            LEFT JOIN channel_analyses a ON a.chat_id = c.chat_id
+            WHERE c.id = $1
+            """,
+            channel_id
+        )
+        if result:
+            result_dict = dict(result)
+            result_dict['style_summary'] = dict(result_dict['style_summary'])
+            return result_dict
+        return None
+
+    async def get_user_stats(self, user_id: int) -> Dict:
+        """Get user statistics"""
+        pool = await self.get_pool()
+        result = await pool.fetchrow(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM channels WHERE user_id = $1) as channels_analyzed,
+                (SELECT COUNT(*) FROM posts WHERE user_id = $1) as posts_generated,
+                (SELECT COUNT(*) FROM images WHERE user_id = $1) as images_created
+            """,
+            user_id
+        )
+        return dict(result)
+
+
+# Global instance (the pool is created inside the running event loop)
+async_db = AsyncDatabase()
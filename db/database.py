@@ -1,10 +1,117 @@
 """Database manager"""
+import os
+import threading
+import time
 import psycopg2
-from psycopg2.extras import RealDictCursor, Json
+from psycopg2 import pool as pg_pool
+from psycopg2.extras import RealDictCursor, Json, execute_values
 import json
 from typing import Optional, Dict, List
 from contextlib import contextmanager
-from core.config import DATABASE_URL, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+from core.config import (
+    DATABASE_URL, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME,
+    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTH_CHECK_INTERVAL
+)
+
+
+class PoolExhaustedError(pg_pool.PoolError):
+    """No connection became free within DB_POOL_TIMEOUT"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 connection pool.
+
+    Callers wait up to `timeout` seconds for a free connection instead of
+    failing immediately when the pool is exhausted. Connections that sat
+    idle longer than `health_check_interval` are pinged before reuse and
+    replaced if the server dropped them.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float,
+                 health_check_interval: int, **connect_kwargs):
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **connect_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used: Dict[int, float] = {}
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+    def getconn(self):
+        """Check out a healthy connection"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolExhaustedError(f"No free database connection within {self.timeout}s")
+
+        try:
+            conn = self._pool.getconn()
+            if not self._is_healthy(conn):
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close: bool = False):
+        """Return a connection (closing it if broken)"""
+        try:
+            close = close or bool(conn.closed)
+            self._last_used[id(conn)] = time.monotonic()
+            if close:
+                self._last_used.pop(id(conn), None)
+            self._pool.putconn(conn, close=close)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        """Close all connections"""
+        self._pool.closeall()
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the connection pool of this process (created lazily, recreated after fork)"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    DB_POOL_TIMEOUT,
+                    DB_POOL_HEALTH_CHECK_INTERVAL,
+                    host=DB_HOST,
+                    port=DB_PORT,
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    dbname=DB_NAME,
+                    keepalives=1,
+                    keepalives_idle=30,
+                    keepalives_interval=10,
+                    keepalives_count=3
+                )
+                _pool_pid = pid
+    return _pool
 
 
 class Database:
@@ -13,22 +120,21 @@ class Database:
     @staticmethod
     @contextmanager
     def get_connection():
-        """Get database connection with context manager"""
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            dbname=DB_NAME
-        )
+        """Get pooled database connection with context manager"""
+        pool = get_pool()
+        conn = pool.getconn()
+        broken = False
         try:
             yield conn
             conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
         except Exception:
             conn.rollback()
             raise
         finally:
-            conn.close()
+            pool.putconn(conn, close=broken)
 
     @staticmethod
     def add_user(user_id: int, username: str = None, first_name: str = None):
@@ -48,30 +154,188 @@ class Database:
                 )
 
     @staticmethod
-    def save_channel_style(user_id: int, channel_url: str, channel_title: str,
-                          style_summary: Dict, deep_analysis: str = None,
-                          example_posts: List[str] = None) -> int:
-        """Save channel style analysis with deep AI analysis and example posts"""
+    def save_channel_style(user_id: int, channel_url: str, channel_title: str, chat_id: int) -> int:
+        """Link user's channel to the shared analysis of the chat"""
         with Database.get_connection() as conn:
             with conn.cursor() as cur:
+                # The analysis itself lives in channel_analyses; clear legacy copies
                 cur.execute(
                     """
-                    INSERT INTO channels (user_id, channel_url, channel_title, style_summary,
-                                         deep_analysis, example_posts, analyzed_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                    INSERT INTO channels (user_id, channel_url, channel_title, chat_id, analyzed_at)
+                    VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
                     ON CONFLICT (user_id, channel_url) DO UPDATE
                     SET channel_title = EXCLUDED.channel_title,
-                        style_summary = EXCLUDED.style_summary,
-                        deep_analysis = EXCLUDED.deep_analysis,
-                        example_posts = EXCLUDED.example_posts,
+                        chat_id = EXCLUDED.chat_id,
+                        style_summary = NULL,
+                        deep_analysis = NULL,
+                        example_posts = NULL,
                         analyzed_at = CURRENT_TIMESTAMP
                     RETURNING id
                     """,
-                    (user_id, channel_url, channel_title, Json(style_summary),
-                     deep_analysis, example_posts)
+                    (user_id, channel_url, channel_title, chat_id)
                 )
                 return cur.fetchone()[0]
 
+    @staticmethod
+    def get_channel_analysis(chat_id: int) -> Optional[Dict]:
+        """Get stored analysis state for a Telegram chat"""
+        with Database.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    """
+                    SELECT chat_id, username, channel_title, last_message_id, new_posts_since_analysis,
+                           style_summary, deep_analysis, example_posts, content_fingerprint,
+                           analyzed_at, synced_at
+                    FROM channel_analyses
+                    WHERE chat_id = %s
+                    """,
+                    (chat_id,)
+                )
+                result = cur.fetchone()
+                return dict(result) if result else None
+
+    @staticmethod
+    def get_fresh_channel_analysis(username: str, max_age: int) -> Optional[Dict]:
+        """Get a complete analysis for @username synced within max_age seconds"""
+        with Database.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    """
+                    SELECT chat_id, username, channel_title, style_summary,
+                           deep_analysis, example_posts, synced_at
+                    FROM channel_analyses
+                    WHERE username = %s
+                      AND deep_analysis IS NOT NULL
+                      AND synced_at > CURRENT_TIMESTAMP - make_interval(secs => %s)
+                    ORDER BY synced_at DESC
+                    LIMIT 1
+                    """,
+                    (username.lower(), max_age)
+                )
+                result = cur.fetchone()
+                return dict(result) if result else None
+
+    @staticmethod
+    def add_channel_posts(chat_id: int, channel_title: str, username: Optional[str],
+                          posts: List[Dict], last_message_id: int, keep: int) -> int:
+        """
+        Store newly fetched posts with their metrics and advance the sync cursor.
+
+        Only the latest `keep` posts are retained per chat.
+        Returns the number of posts added since the last deep analysis.
+        """
+        with Database.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO channel_analyses (chat_id, username, channel_title,
+                                                  last_message_id, synced_at)
+                    VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+                    ON CONFLICT (chat_id) DO UPDATE
+                    SET username = EXCLUDED.username,
+                        channel_title = EXCLUDED.channel_title,
+                        last_message_id = GREATEST(channel_analyses.last_message_id,
+                                                   EXCLUDED.last_message_id),
+                        synced_at = CURRENT_TIMESTAMP
+                    """,
+                    (chat_id, username.lower() if username else None, channel_title, last_message_id)
+                )
+
+                inserted = []
+                if posts:
+                    inserted = execute_values(
+                        cur,
+                        """
+                        INSERT INTO channel_posts (chat_id, message_id, text, metrics, posted_at)
+                        VALUES %s
+                        ON CONFLICT (chat_id, message_id) DO NOTHING
+                        RETURNING message_id
+                        """,
+                        [(chat_id, p["message_id"], p["text"], Json(p["metrics"]), p.get("posted_at"))
+                         for p in posts],
+                        fetch=True
+                    )
+
+                cur.execute(
+                    """
+                    UPDATE channel_analyses
+                    SET new_posts_since_analysis = new_posts_since_analysis + %s
+                    WHERE chat_id = %s
+                    RETURNING new_posts_since_analysis
+                    """,
+                    (len(inserted), chat_id)
+                )
+                pending = cur.fetchone()[0]
+
+                cur.execute(
+                    """
+                    DELETE FROM channel_posts
+                    WHERE chat_id = %s AND message_id < (
+                        SELECT COALESCE(MIN(message_id), 0) FROM (
+                            SELECT message_id FROM channel_posts
+                            WHERE chat_id = %s
+                            ORDER BY message_id DESC
+                            LIMIT %s
+                        ) latest
+                    )
+                    """,
+                    (chat_id, chat_id, keep)
+                )
+                return pending
+
+    @staticmethod
+    def get_channel_posts(chat_id: int, limit: int) -> List[Dict]:
+        """Get latest stored posts of a chat (newest first), metrics merged into each dict"""
+        with Database.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    """
+                    SELECT message_id, text, metrics
+                    FROM channel_posts
+                    WHERE chat_id = %s
+                    ORDER BY message_id DESC
+                    LIMIT %s
+                    """,
+                    (chat_id, limit)
+                )
+                return [
+                    {**row['metrics'], "message_id": row['message_id'], "text": row['text']}
+                    for row in cur.fetchall()
+                ]
+
+    @staticmethod
+    def save_channel_analysis(chat_id: int, style_summary: Dict, example_posts: List[str],
+                              deep_analysis: str = None, content_fingerprint: str = None):
+        """
+        Save merged metrics and examples for a chat.
+
+        Passing deep_analysis replaces the stored one (together with the
+        fingerprint of the posts it was built from) and resets the new-posts
+        counter; otherwise the previous deep analysis is kept.
+        """
+        with Database.get_connection() as conn:
+            with conn.cursor() as cur:
+                if deep_analysis is None:
+                    cur.execute(
+                        """
+                        UPDATE channel_analyses
+                        SET style_summary = %s, example_posts = %s
+                        WHERE chat_id = %s
+                        """,
+                        (Json(style_summary), example_posts, chat_id)
+                    )
+                else:
+                    cur.execute(
+                        """
+                        UPDATE channel_analyses
+                        SET style_summary = %s, example_posts = %s, deep_analysis = %s,
+                            content_fingerprint = %s,
+                            new_posts_since_analysis = 0, analyzed_at = CURRENT_TIMESTAMP
+                        WHERE chat_id = %s
+                        """,
+                        (Json(style_summary), example_posts, deep_analysis, content_fingerprint, chat_id)
+                    )
+
     @staticmethod
     def get_channel_style(user_id: int) -> Optional[Dict]:
         """Get latest channel style for user with deep analysis and examples"""
@@ -79,10 +343,13 @@ class Database:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute(
                     """
-                    SELECT style_summary, deep_analysis, example_posts
-                    FROM channels
-                    WHERE user_id = %s
-                    ORDER BY analyzed_at DESC
+                    SELECT COALESCE(a.style_summary, c.style_summary) AS style_summary,
+                           COALESCE(a.deep_analysis, c.deep_analysis) AS deep_analysis,
+                           COALESCE(a.example_posts, c.example_posts) AS example_posts
+                    FROM channels c
+                    LEFT JOIN channel_analyses a ON a.chat_id = c.chat_id
+                    WHERE c.user_id = %s
+                    ORDER BY c.analyzed_at DESC
                     LIMIT 1
                     """,
                     (user_id,)
@@ -119,10 +386,14 @@ class Database:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute(
                     """
-                    SELECT id, user_id, channel_url, channel_title, style_summary,
-                           deep_analysis, example_posts, analyzed_at
-                    FROM channels
-                    WHERE id = %s
+                    SELECT c.id, c.user_id, c.channel_url, c.channel_title, c.chat_id,
+                           COALESCE(a.style_summary, c.style_summary) AS style_summary,
+                           COALESCE(a.deep_analysis, c.deep_analysis) AS deep_analysis,
+                           COALESCE(a.example_posts, c.example_posts) AS example_posts,
+                           c.analyzed_at
+                    FROM channels c
+                    LEFT JOIN channel_analyses a ON a.chat_id = c.chat_id
+                    WHERE c.id = %s
                     """,
                     (channel_id,)
                 )
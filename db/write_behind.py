@@ -0,0 +1,187 @@
+"""Write-behind queue for bookkeeping writes (users, posts)"""
+import asyncio
+import atexit
+import queue
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from core.config import (
+    WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_MAX_QUEUE, WRITE_BEHIND_MAX_RETRIES
+)
+from db.database import Database
+
+# Statements per write kind, flushed in this order (posts reference users)
+_STATEMENTS = {
+    "users": (
+        """
+        INSERT INTO users (id, username, first_name, last_active)
+        VALUES %s
+        ON CONFLICT (id) DO UPDATE
+        SET username = EXCLUDED.username,
+            first_name = EXCLUDED.first_name,
+            last_active = CURRENT_TIMESTAMP
+        """,
+        "(%s, %s, %s, CURRENT_TIMESTAMP)"
+    ),
+    "posts": (
+        "INSERT INTO posts (user_id, channel_id, content) VALUES %s",
+        None
+    ),
+}
+
+# Errors worth retrying as a whole batch
+_TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class WriteBehindQueue:
+    """
+    Buffer writes in memory and flush them in batches with multi-row VALUES.
+
+    A background thread flushes at most `flush_interval` seconds after the
+    first buffered write or as soon as `batch_size` writes are waiting.
+    Transient failures are retried with backoff; a batch that fails on bad
+    data is replayed row by row so one broken row doesn't drop the rest.
+    Pending writes are flushed on stop() and at interpreter exit.
+    """
+
+    def __init__(self, flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+                 batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+                 max_queue: int = WRITE_BEHIND_MAX_QUEUE,
+                 max_retries: int = WRITE_BEHIND_MAX_RETRIES):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self._queue: "queue.Queue[Tuple[str, tuple]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        atexit.register(self.stop)
+
+    # ===== PUBLIC API =====
+
+    def add_user(self, user_id: int, username: str = None, first_name: str = None):
+        """Add or update user (last_active is set at flush time)"""
+        self._put("users", (user_id, username, first_name))
+
+    def save_post(self, user_id: int, content: str, channel_id: int = None):
+        """Save generated post"""
+        self._put("posts", (user_id, channel_id, content))
+
+    # Variants for an event loop: they never block it, see _put_async
+
+    async def add_user_async(self, user_id: int, username: str = None, first_name: str = None):
+        """add_user from async code"""
+        await self._put_async("users", (user_id, username, first_name))
+
+    async def save_post_async(self, user_id: int, content: str, channel_id: int = None):
+        """save_post from async code"""
+        await self._put_async("posts", (user_id, channel_id, content))
+
+    def start(self):
+        """Start the flusher thread (idempotent)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Flush pending writes and stop the flusher thread"""
+        self._stopped.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+
+    # ===== INTERNALS =====
+
+    def _put(self, kind: str, row: tuple):
+        self.start()
+        try:
+            self._queue.put((kind, row), timeout=1)
+        except queue.Full:
+            # Backpressure: write through rather than lose the write
+            print(f"Warning: Write-behind queue full, writing {kind} synchronously")
+            self._write_rows(kind, [row])
+
+    async def _put_async(self, kind: str, row: tuple):
+        self.start()
+        try:
+            self._queue.put_nowait((kind, row))
+        except queue.Full:
+            # Same write-through as _put, but on a thread so other updates keep flowing
+            print(f"Warning: Write-behind queue full, writing {kind} synchronously")
+            await asyncio.to_thread(self._write_rows, kind, [row])
+
+    def _run(self):
+        while not (self._stopped.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _collect(self) -> List[Tuple[str, tuple]]:
+        """Wait for the first write, then gather more until batch_size or flush_interval"""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopped.is_set():
+                remaining = 0
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Tuple[str, tuple]]):
+        grouped = {kind: [] for kind in _STATEMENTS}
+        for kind, row in batch:
+            grouped[kind].append(row)
+
+        # One upsert per user per statement (ON CONFLICT can't touch a row twice)
+        grouped["users"] = list({row[0]: row for row in grouped["users"]}.values())
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                with Database.get_connection() as conn:
+                    with conn.cursor() as cur:
+                        for kind, rows in grouped.items():
+                            if rows:
+                                sql, template = _STATEMENTS[kind]
+                                execute_values(cur, sql, rows, template=template, page_size=self.batch_size)
+                return
+            except _TRANSIENT_ERRORS as e:
+                if attempt == self.max_retries:
+                    print(f"Error: Write-behind flush failed after {attempt + 1} attempts, "
+                          f"dropping {len(batch)} writes: {e}")
+                    return
+                time.sleep(0.5 * 2 ** attempt)
+            except Exception as e:
+                print(f"Warning: Write-behind batch rejected ({e}), retrying row by row")
+                for kind, rows in grouped.items():
+                    for row in rows:
+                        self._write_rows(kind, [row])
+                return
+
+    def _write_rows(self, kind: str, rows: List[tuple]):
+        """Write rows in their own transaction, logging instead of raising"""
+        sql, template = _STATEMENTS[kind]
+        try:
+            with Database.get_connection() as conn:
+                with conn.cursor() as cur:
+                    execute_values(cur, sql, rows, template=template)
+        except Exception as e:
+            print(f"Error: Failed to write {kind} row {rows[0][:2]}: {e}")
+
+
+# Global instance (the flusher starts on first write)
+write_behind = WriteBehindQueue()
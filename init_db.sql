@@ -10,12 +10,39 @@ CREATE TABLE users (
     last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Channels table
+-- Per-chat analysis shared by all users (incremental re-analysis state + cache)
+CREATE TABLE channel_analyses (
+    chat_id BIGINT PRIMARY KEY,
+    username VARCHAR(255),
+    channel_title VARCHAR(255),
+    last_message_id BIGINT NOT NULL DEFAULT 0,
+    new_posts_since_analysis INT NOT NULL DEFAULT 0,
+    style_summary JSONB,
+    deep_analysis TEXT,
+    example_posts TEXT[],
+    content_fingerprint CHAR(64),
+    analyzed_at TIMESTAMP,
+    synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Fetched channel posts with per-post metrics
+CREATE TABLE channel_posts (
+    chat_id BIGINT REFERENCES channel_analyses(chat_id) ON DELETE CASCADE,
+    message_id BIGINT NOT NULL,
+    text TEXT NOT NULL,
+    metrics JSONB NOT NULL,
+    posted_at TIMESTAMP,
+    PRIMARY KEY (chat_id, message_id)
+);
+
+-- Channels table (per-user links to the shared analysis)
 CREATE TABLE channels (
     id SERIAL PRIMARY KEY,
     user_id BIGINT REFERENCES users(id) ON DELETE CASCADE,
     channel_url VARCHAR(255) NOT NULL,
     channel_title VARCHAR(255),
+    chat_id BIGINT REFERENCES channel_analyses(chat_id) ON DELETE SET NULL,
+    -- Legacy per-user copies, only set on rows created before chat_id
     style_summary JSONB,
     deep_analysis TEXT,
     example_posts TEXT[],
@@ -45,6 +72,8 @@ CREATE TABLE images (
 -- Indexes
 CREATE INDEX idx_users_last_active ON users(last_active);
 CREATE INDEX idx_channels_user_id ON channels(user_id);
+CREATE INDEX idx_channels_chat_id ON channels(chat_id);
+CREATE INDEX idx_channel_analyses_username ON channel_analyses(username);
 CREATE INDEX idx_posts_user_id ON posts(user_id);
 CREATE INDEX idx_images_user_id ON images(user_id);
 
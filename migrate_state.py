@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Redis State Migration Script
+Run ONCE after upgrading to move user data from per-field keys
+(data:{user_id}:{key}) into per-user hashes (user_data:{user_id})
+"""
+from core.state_manager import state_manager
+
+
+def main():
+    print("=" * 50)
+    print("Redis State Migration")
+    print("=" * 50)
+
+    migrated = state_manager.migrate_legacy_data()
+
+    print(f"\n✅ Migrated {migrated} data fields to per-user hashes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+-- Incremental channel re-analysis: sync cursor and stored post metrics per chat
+-- Apply to existing databases: psql -U $DB_USER -d smm_bot -f migrations/001_incremental_channel_analysis.sql
+
+CREATE TABLE IF NOT EXISTS channel_analyses (
+    chat_id BIGINT PRIMARY KEY,
+    channel_title VARCHAR(255),
+    last_message_id BIGINT NOT NULL DEFAULT 0,
+    new_posts_since_analysis INT NOT NULL DEFAULT 0,
+    style_summary JSONB,
+    deep_analysis TEXT,
+    example_posts TEXT[],
+    analyzed_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS channel_posts (
+    chat_id BIGINT REFERENCES channel_analyses(chat_id) ON DELETE CASCADE,
+    message_id BIGINT NOT NULL,
+    text TEXT NOT NULL,
+    metrics JSONB NOT NULL,
+    posted_at TIMESTAMP,
+    PRIMARY KEY (chat_id, message_id)
+);
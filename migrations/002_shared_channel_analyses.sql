@@ -0,0 +1,12 @@
+-- Shared cross-user channel analyses: lookup by username, freshness and content fingerprint
+-- Apply to existing databases: psql -U $DB_USER -d smm_bot -f migrations/002_shared_channel_analyses.sql
+
+ALTER TABLE channel_analyses ADD COLUMN IF NOT EXISTS username VARCHAR(255);
+ALTER TABLE channel_analyses ADD COLUMN IF NOT EXISTS content_fingerprint CHAR(64);
+ALTER TABLE channel_analyses ADD COLUMN IF NOT EXISTS synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+-- Per-user rows reference the shared analysis; legacy rows keep their own copies
+ALTER TABLE channels ADD COLUMN IF NOT EXISTS chat_id BIGINT REFERENCES channel_analyses(chat_id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS idx_channels_chat_id ON channels(chat_id);
+CREATE INDEX IF NOT EXISTS idx_channel_analyses_username ON channel_analyses(username);
@@ -4,13 +4,17 @@ Pyrogram Session Setup Script
 Run this ONCE to authorize Pyrogram and create session file
 """
 import os
+import sys
 from pyrogram import Client
-from core.config import API_ID, API_HASH, SESSION_NAME
+from core.config import API_ID, API_HASH, SESSION_NAME, BASE_DIR
 
 # Create sessions directory if it doesn't exist
 os.makedirs("sessions", exist_ok=True)
 
 def main():
+    # Optional session name to authorize an extra session for PYROGRAM_SESSIONS
+    session_name = str(BASE_DIR / sys.argv[1]) if len(sys.argv) > 1 else SESSION_NAME
+
     print("=" * 50)
     print("Pyrogram Session Setup")
     print("=" * 50)
@@ -18,7 +22,7 @@ def main():
     print("You'll need to enter your phone number and verification code.\n")
 
     # Create client
-    app = Client(SESSION_NAME, API_ID, API_HASH)
+    app = Client(session_name, API_ID, API_HASH)
 
     print(f"Connecting to Telegram...")
 
@@ -30,7 +34,7 @@ def main():
             print(f"   Username: @{me.username}")
         print(f"   Phone: +{me.phone_number}")
 
-    print(f"\n✅ Session file created: {SESSION_NAME}.session")
+    print(f"\n✅ Session file created: {session_name}.session")
     print("\nYou can now use the bot. The session will be saved in ./sessions/ directory.")
 
 if __name__ == "__main__":
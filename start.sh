@@ -54,11 +54,22 @@ echo "🧹 Cleaning up old processes..."
 pkill -f "celery.*tasks.celery_app" 2>/dev/null && echo "   Stopped old Celery workers" || echo "   No old workers found"
 sleep 1
 
-# Start Celery worker in background
-echo "🔧 Starting Celery worker..."
-celery -A tasks.celery_app worker --loglevel=info --logfile=celery.log &
-CELERY_PID=$!
-echo "✅ Celery started (PID: $CELERY_PID)"
+# Start one Celery worker per queue in background
+echo "🔧 Starting Celery workers..."
+celery -A tasks.celery_app worker -Q io -n io@%h --pool threads --concurrency ${CELERY_IO_CONCURRENCY:-32} --loglevel=info --logfile=celery-io.log &
+IO_PID=$!
+celery -A tasks.celery_app worker -Q cpu -n cpu@%h --pool prefork --loglevel=info --logfile=celery-cpu.log &
+CPU_PID=$!
+celery -A tasks.celery_app worker -Q telegram -n telegram@%h --pool prefork --concurrency ${CELERY_TELEGRAM_CONCURRENCY:-1} --loglevel=info --logfile=celery-telegram.log &
+TELEGRAM_PID=$!
+CELERY_PID="$IO_PID $CPU_PID $TELEGRAM_PID"
+echo "✅ Celery workers started (io: $IO_PID, cpu: $CPU_PID, telegram: $TELEGRAM_PID)"
+
+# Start Celery beat (periodic news ingestion) in background
+echo "⏰ Starting Celery beat..."
+celery -A tasks.celery_app beat --loglevel=info --logfile=celery-beat.log --schedule /tmp/celerybeat-schedule &
+BEAT_PID=$!
+echo "✅ Celery beat started (PID: $BEAT_PID)"
 
 # Wait a bit for Celery to start
 sleep 2
@@ -70,5 +81,5 @@ python bot.py
 # Cleanup on exit
 echo ""
 echo "Stopping services..."
-kill $CELERY_PID
+kill $CELERY_PID $BEAT_PID
 echo "👋 Goodbye!"
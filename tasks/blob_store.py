@@ -0,0 +1,178 @@
+"""Content-addressed blob store for media passed between bot and workers"""
+import hashlib
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import redis
+
+from core.config import REDIS_URL, BLOB_STORE_BACKEND, BLOB_STORE_DIR, BLOB_TTL
+
+BLOB_REF_PREFIX = "blob:"
+
+
+def blob_digest(data: bytes) -> str:
+    """SHA-256 hex digest used as blob address"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_blob_ref(value) -> bool:
+    """Check whether value looks like a blob reference"""
+    return isinstance(value, str) and value.startswith(BLOB_REF_PREFIX)
+
+
+class BlobStore(ABC):
+    """
+    Store binary payloads by content hash and hand out short references.
+
+    Tasks and the bot exchange only these references, so broker messages
+    and results stay small no matter how large the media is.
+    """
+
+    @abstractmethod
+    def put(self, data: bytes) -> str:
+        """Store data and return its reference"""
+
+    @abstractmethod
+    def get(self, ref: str) -> bytes:
+        """Load data by reference (raises KeyError if missing or expired)"""
+
+    @abstractmethod
+    def delete(self, ref: str):
+        """Remove data by reference"""
+
+    @abstractmethod
+    def touch(self, ref: str) -> bool:
+        """Restart the expiry of a blob; False if it is missing or expired"""
+
+    @staticmethod
+    def _digest_from_ref(ref: str) -> str:
+        if not is_blob_ref(ref):
+            raise ValueError(f"Not a blob reference: {ref!r}")
+        return ref[len(BLOB_REF_PREFIX):]
+
+
+class RedisBlobStore(BlobStore):
+    """Blobs as binary Redis keys with expiry"""
+
+    def __init__(self, redis_url: str = REDIS_URL, ttl: int = BLOB_TTL):
+        # Binary client: no decode_responses
+        self.redis = redis.Redis.from_url(redis_url, socket_keepalive=True)
+        self.ttl = ttl
+
+    def put(self, data: bytes) -> str:
+        digest = blob_digest(data)
+        key = f"blob:{digest}"
+        pipe = self.redis.pipeline()
+        # Same content = same key: write once, just refresh expiry afterwards
+        pipe.set(key, data, ex=self.ttl, nx=True)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+        return BLOB_REF_PREFIX + digest
+
+    def get(self, ref: str) -> bytes:
+        data = self.redis.get(f"blob:{self._digest_from_ref(ref)}")
+        if data is None:
+            raise KeyError(f"Blob not found or expired: {ref}")
+        return data
+
+    def delete(self, ref: str):
+        self.redis.delete(f"blob:{self._digest_from_ref(ref)}")
+
+    def touch(self, ref: str) -> bool:
+        return bool(self.redis.expire(f"blob:{self._digest_from_ref(ref)}", self.ttl))
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files in a (shared) directory, fanned out by hash prefix"""
+
+    def __init__(self, directory: str = BLOB_STORE_DIR, ttl: int = BLOB_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _expired(self, mtime: float) -> bool:
+        # Files outlive their ttl until the next purge_expired run
+        return time.time() - mtime > self.ttl
+
+    def put(self, data: bytes) -> str:
+        digest = blob_digest(data)
+        path = self._path(digest)
+
+        if os.path.exists(path):
+            # Refresh mtime so purge_expired keeps it
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to temp file and rename so readers never see partial data
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+        return BLOB_REF_PREFIX + digest
+
+    def get(self, ref: str) -> bytes:
+        path = self._path(self._digest_from_ref(ref))
+        try:
+            with open(path, "rb") as f:
+                if not self._expired(os.fstat(f.fileno()).st_mtime):
+                    return f.read()
+        except FileNotFoundError:
+            pass
+        raise KeyError(f"Blob not found or expired: {ref}")
+
+    def delete(self, ref: str):
+        path = self._path(self._digest_from_ref(ref))
+        if os.path.exists(path):
+            os.remove(path)
+
+    def touch(self, ref: str) -> bool:
+        path = self._path(self._digest_from_ref(ref))
+        try:
+            if self._expired(os.path.getmtime(path)):
+                return False
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def purge_expired(self) -> int:
+        """Delete blobs older than ttl, return number removed"""
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if self._expired(os.path.getmtime(path)):
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """Return the configured blob store (created on first use)"""
+    global _blob_store
+    if _blob_store is None:
+        if BLOB_STORE_BACKEND == "local":
+            _blob_store = LocalBlobStore()
+        elif BLOB_STORE_BACKEND == "redis":
+            _blob_store = RedisBlobStore()
+        else:
+            raise ValueError(f"Unknown BLOB_STORE_BACKEND '{BLOB_STORE_BACKEND}'. Available: redis, local")
+    return _blob_store
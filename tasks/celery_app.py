@@ -1,13 +1,16 @@
 """Celery application and configuration"""
 from celery import Celery
-from core.config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND
+from core.config import (
+    CELERY_BROKER_URL, CELERY_RESULT_BACKEND, NEWS_INGEST_INTERVAL,
+    BLOB_STORE_BACKEND, BLOB_PURGE_INTERVAL
+)
 
 # Create Celery app
 celery_app = Celery(
     'smm_bot',
     broker=CELERY_BROKER_URL,
     backend=CELERY_RESULT_BACKEND,
-    include=['tasks.tasks']
+    include=['tasks.tasks', 'tasks.events']
 )
 
 # Configure Celery
@@ -18,8 +21,47 @@ celery_app.conf.update(
     timezone='UTC',
     enable_utc=True,
     task_track_started=True,
-    task_time_limit=300,  # 5 minutes
-    task_soft_time_limit=270,  # 4.5 minutes
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=1000,
 )
+
+# Queues by workload, each served by its own worker (see docker-compose.yml):
+#   cpu      - local image processing (ONNX / PIL), prefork pool sized to cores
+#   telegram - Pyrogram channel scraping, prefork pool (one session file per process)
+#   io       - API calls that mostly wait on the network, thread pool with high concurrency
+CPU_QUEUE = 'cpu'
+TELEGRAM_QUEUE = 'telegram'
+IO_QUEUE = 'io'
+
+celery_app.conf.task_default_queue = IO_QUEUE
+celery_app.conf.task_routes = {
+    'remove_background': {'queue': CPU_QUEUE},
+    'add_watermark': {'queue': CPU_QUEUE},
+    'analyze_channel': {'queue': TELEGRAM_QUEUE},
+    # Everything else (LLMs, Replicate, OpenAI, RSS) goes to the default io queue
+}
+
+# Time limits are only enforced by the prefork pools, so they are set for the
+# tasks routed there; io tasks bound each provider call instead (PROVIDER_TIMEOUT)
+celery_app.conf.task_annotations = {
+    name: {'time_limit': 300, 'soft_time_limit': 270}  # 5 / 4.5 minutes
+    for name in celery_app.conf.task_routes
+}
+
+# Periodic jobs (run `celery -A tasks.celery_app beat` alongside the workers)
+celery_app.conf.beat_schedule = {
+    'ingest-news': {
+        'task': 'ingest_news',
+        'schedule': NEWS_INGEST_INTERVAL,
+        # A missed run is superseded by the next one
+        'options': {'expires': NEWS_INGEST_INTERVAL},
+    },
+}
+
+# Redis expires blobs itself; the local store needs its files removed
+if BLOB_STORE_BACKEND == "local":
+    celery_app.conf.beat_schedule['purge-blobs'] = {
+        'task': 'purge_blobs',
+        'schedule': BLOB_PURGE_INTERVAL,
+        'options': {'expires': BLOB_PURGE_INTERVAL},
+    }
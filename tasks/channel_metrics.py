@@ -0,0 +1,206 @@
+"""Per-post style metrics for channel analysis, aggregated column-wise with NumPy"""
+import re
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+CTA_WORDS = ['подпишись', 'жми', 'переходи', 'смотри', 'читай', 'узнай']
+
+EMOJI_CLASS = r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F700-\U0001FAFF\U00002702-\U000027B0]'
+
+# One tokenizer for everything we count. Alternatives never overlap, so a
+# single finditer pass yields every marker; gaps between matches are plain text.
+TOKEN_RE = re.compile(
+    r'(?P<ws>\s+)'
+    r'|(?P<terminal>[.!?]+)'
+    r'|(?P<emoji>' + EMOJI_CLASS + r')'
+    r'|(?P<hashtag>#\w+)'
+    r'|(?P<bold><b>|\*\*)'
+    r'|(?P<italic><i>|_)'
+    r'|(?P<code><code>|`)'
+    r'|(?P<link>http)'
+    r'|(?P<cta>(?i:' + '|'.join(CTA_WORDS) + r'))'
+)
+CTA_RE = re.compile('|'.join(CTA_WORDS), re.IGNORECASE)
+
+# Per-post columns, in storage order
+COLUMNS = (
+    "word_count", "sentence_count", "line_count", "emoji_count",
+    "bold_count", "italic_count", "code_count", "link_count",
+    "question_marks", "exclamation_marks", "hashtags",
+    "avg_word_length", "has_cta",
+)
+_COL = {name: i for i, name in enumerate(COLUMNS)}
+
+# Metrics reported with percentiles / distributions
+PERCENTILES = (10, 25, 50, 75, 90)
+PERCENTILE_COLUMNS = ("word_count", "sentence_count", "line_count", "emoji_count", "hashtags")
+LENGTH_BUCKETS = (("short", 0, 50), ("medium", 50, 150), ("long", 150, None))
+
+
+def _tokenize(text: str) -> List[int]:
+    """Count all metrics of one post in a single regex pass"""
+    counts = [0] * len(COLUMNS)
+    words = ws_chars = 0
+    in_word = False
+    line_has_text = sentence_has_text = False
+    lines = sentences = 0
+    pos = 0
+
+    for m in TOKEN_RE.finditer(text):
+        start, end = m.span()
+        kind = m.lastgroup
+
+        if start > pos or kind not in ("ws", "terminal"):
+            # Non-whitespace, non-terminal content (gap text or a marker)
+            line_has_text = sentence_has_text = True
+            if not in_word:
+                words += 1
+                in_word = True
+
+        if kind == "ws":
+            in_word = False
+            ws_chars += end - start
+            if line_has_text and text.count('\n', start, end):
+                lines += 1
+                line_has_text = False
+        elif kind == "terminal":
+            line_has_text = True
+            if not in_word:
+                words += 1
+                in_word = True
+            if sentence_has_text:
+                sentences += 1
+                sentence_has_text = False
+            token = m.group()
+            counts[_COL["question_marks"]] += token.count('?')
+            counts[_COL["exclamation_marks"]] += token.count('!')
+        elif kind == "emoji":
+            counts[_COL["emoji_count"]] += 1
+        elif kind == "hashtag":
+            token = m.group()
+            counts[_COL["hashtags"]] += 1
+            # Markers swallowed by the hashtag still count
+            counts[_COL["italic_count"]] += token.count('_')
+            counts[_COL["link_count"]] += token.count('http')
+            if CTA_RE.search(token):
+                counts[_COL["has_cta"]] = 1
+        elif kind == "bold":
+            counts[_COL["bold_count"]] += 1
+        elif kind == "italic":
+            counts[_COL["italic_count"]] += 1
+        elif kind == "code":
+            counts[_COL["code_count"]] += 1
+        elif kind == "link":
+            counts[_COL["link_count"]] += 1
+        elif kind == "cta":
+            counts[_COL["has_cta"]] = 1
+
+        pos = end
+
+    if len(text) > pos:
+        line_has_text = sentence_has_text = True
+        if not in_word:
+            words += 1
+    if line_has_text:
+        lines += 1
+    if sentence_has_text:
+        sentences += 1
+
+    counts[_COL["word_count"]] = words
+    counts[_COL["sentence_count"]] = sentences
+    counts[_COL["line_count"]] = lines
+    # Total word length = all non-whitespace characters
+    counts[_COL["avg_word_length"]] = round((len(text) - ws_chars) / words) if words else 0
+    return counts
+
+
+def post_metrics(text: str) -> Dict:
+    """Deep metrics for a single post"""
+    counts = _tokenize(text)
+    metrics = dict(zip(COLUMNS, counts))
+    metrics["has_cta"] = bool(metrics["has_cta"])
+    return metrics
+
+
+class MetricsTable:
+    """Per-post metrics of a channel as one (posts x metrics) integer matrix"""
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str]) -> "MetricsTable":
+        """Tokenize posts straight into the matrix"""
+        return cls(np.array([_tokenize(text) for text in texts], dtype=np.int64).reshape(-1, len(COLUMNS)))
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> "MetricsTable":
+        """Build from stored per-post metric dicts"""
+        flat = np.fromiter(
+            (int(record.get(name, 0)) for record in records for name in COLUMNS),
+            dtype=np.int64,
+            count=len(records) * len(COLUMNS)
+        )
+        return cls(flat.reshape(-1, len(COLUMNS)))
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def column(self, name: str) -> np.ndarray:
+        return self.data[:, _COL[name]]
+
+    def summary(self, channel_title: str) -> Dict:
+        """Channel style summary: averages plus percentiles and distributions"""
+        num_posts = len(self)
+        means = self.data.mean(axis=0)
+
+        def avg(name: str, ndigits: int = None):
+            value = float(means[_COL[name]])
+            return round(value) if ndigits is None else round(value, ndigits)
+
+        metrics = {
+            "channel_title": channel_title,
+            "analyzed_posts_count": num_posts,
+            "average_word_count": avg("word_count"),
+            "average_sentence_count": avg("sentence_count"),
+            "average_line_count": avg("line_count"),
+            "average_emoji_count": avg("emoji_count"),
+            "average_bold_usage": avg("bold_count", 1),
+            "average_italic_usage": avg("italic_count", 1),
+            "average_code_usage": avg("code_count", 1),
+            "average_link_count": avg("link_count", 1),
+            "average_question_marks": avg("question_marks", 1),
+            "average_exclamation_marks": avg("exclamation_marks", 1),
+            "average_hashtags": avg("hashtags", 1),
+            "average_word_length": avg("avg_word_length"),
+            "cta_frequency": round(float(means[_COL["has_cta"]]) * 100),
+        }
+
+        # All percentiles for all reported columns in one call
+        columns = [_COL[name] for name in PERCENTILE_COLUMNS]
+        values = np.percentile(self.data[:, columns], PERCENTILES, axis=0)
+        metrics["percentiles"] = {
+            name: {f"p{p}": round(float(values[i, j]), 1) for i, p in enumerate(PERCENTILES)}
+            for j, name in enumerate(PERCENTILE_COLUMNS)
+        }
+
+        word_counts = self.column("word_count")
+        length = {}
+        for label, low, high in LENGTH_BUCKETS:
+            mask = word_counts >= low if high is None else (word_counts >= low) & (word_counts < high)
+            length[label] = round(float(mask.mean()) * 100)
+
+        usage = (self.data > 0).mean(axis=0)
+        metrics["distributions"] = {
+            "length": length,
+            # Share of posts (%) using each element at least once
+            "posts_with": {
+                name: round(float(usage[_COL[column]]) * 100)
+                for name, column in (
+                    ("emoji", "emoji_count"), ("bold", "bold_count"), ("links", "link_count"),
+                    ("questions", "question_marks"), ("hashtags", "hashtags"), ("cta", "has_cta"),
+                )
+            },
+        }
+        return metrics
@@ -0,0 +1,196 @@
+"""Task completion events: workers publish, the bot dispatches"""
+import asyncio
+import json
+import traceback
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import redis
+import redis.asyncio as aioredis
+from celery.signals import task_postrun
+from celery.states import READY_STATES
+
+from core.config import REDIS_URL, TASK_TIMEOUT
+from tasks.celery_app import celery_app
+
+TASK_EVENTS_CHANNEL = "task_events"
+
+_publisher: Optional[redis.Redis] = None
+
+
+def _get_publisher() -> redis.Redis:
+    """Lazily create the publisher client (one per worker process)"""
+    global _publisher
+    if _publisher is None:
+        _publisher = redis.Redis.from_url(REDIS_URL, socket_keepalive=True)
+    return _publisher
+
+
+@task_postrun.connect
+def publish_task_event(task_id=None, task=None, state=None, **kwargs):
+    """Announce that a task has finished (its result is already stored)"""
+    try:
+        _get_publisher().publish(
+            TASK_EVENTS_CHANNEL,
+            json.dumps({"task_id": task_id, "task": task.name if task else None, "state": state})
+        )
+    except Exception as e:
+        # The bot falls back to its timeout, so never fail the task over this
+        print(f"Warning: Failed to publish task event for {task_id}: {e}")
+
+
+class TaskResultDispatcher:
+    """
+    Single subscriber that routes task completion events to waiters.
+
+    One asyncio task on the bot's event loop listens on the events channel
+    and resolves the futures of tasks in flight, so neither threads nor
+    Redis traffic grow with the number of tasks being waited on. Results
+    are read from the Celery result backend with the async client.
+    """
+
+    def __init__(self):
+        self._redis: Optional[aioredis.Redis] = None
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+
+    def _get_redis(self) -> aioredis.Redis:
+        if self._redis is None:
+            self._redis = aioredis.Redis.from_url(
+                REDIS_URL,
+                socket_keepalive=True,
+                health_check_interval=30
+            )
+        return self._redis
+
+    def start(self):
+        """Start the listener on the running loop (idempotent)"""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen(), name="task-events")
+
+    async def stop(self):
+        """Stop the listener and cancel outstanding watches"""
+        tasks = list(self._background)
+        if self._listener:
+            tasks.append(self._listener)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def watch(self, task_id: str, on_done: Callable[[Dict], Awaitable[None]],
+              on_timeout: Callable[[], Awaitable[None]], timeout: int = TASK_TIMEOUT):
+        """Await on_done(result) when the task finishes, or on_timeout() after timeout seconds"""
+        self._spawn(self._watch(task_id, on_done, on_timeout, timeout))
+
+    async def wait(self, task_id: str, timeout: float = TASK_TIMEOUT) -> Optional[Dict]:
+        """Result of the task once it finishes, or None after timeout seconds"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(task_id, []).append(future)
+        try:
+            # The task may have finished before we registered
+            try:
+                result = await self._fetch(task_id)
+            except Exception as e:
+                # Not ready as far as we know; the completion event still resolves the future
+                print(f"Warning: Failed to read result of {task_id}: {e}")
+                result = None
+            if result is not None:
+                return result
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._pending.get(task_id)
+            if waiters and future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self._pending[task_id]
+
+    async def _watch(self, task_id: str, on_done, on_timeout, timeout: float):
+        try:
+            result = await self.wait(task_id, timeout)
+        except Exception as e:
+            # The user still gets the timeout message rather than silence
+            print(f"Warning: Failed to wait for {task_id}: {e}")
+            result = None
+        try:
+            if result is None:
+                await on_timeout()
+            else:
+                await on_done(result)
+        except Exception as e:
+            print(f"Error in task result callback: {e}\n{traceback.format_exc()}")
+
+    def _spawn(self, coro):
+        """Run a coroutine in the background, keeping a reference until it ends"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _listen(self):
+        """Listener loop: consume events and resolve waiters"""
+        while True:
+            pubsub = self._get_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(TASK_EVENTS_CHANNEL)
+                # Events may have been missed while (re)connecting
+                for task_id in list(self._pending):
+                    self._spawn(self._complete(task_id))
+
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        event = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    task_id = event.get("task_id")
+                    if task_id in self._pending:
+                        self._spawn(self._complete(task_id))
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                print(f"Warning: Task events connection lost: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def _complete(self, task_id: str):
+        """Fetch the stored result and hand it to everyone waiting on the task"""
+        try:
+            result = await self._fetch(task_id)
+        except Exception as e:
+            print(f"Warning: Failed to read result of {task_id}: {e}")
+            return
+        if result is None:
+            return
+        for future in self._pending.pop(task_id, []):
+            if not future.done():
+                future.set_result(result)
+
+    async def _fetch(self, task_id: str) -> Optional[Dict]:
+        """Result of a finished task from the result backend, None if not ready"""
+        backend = celery_app.backend
+        raw = await self._get_redis().get(backend.get_key_for_task(task_id))
+        if raw is None:
+            return None
+        meta = backend.decode_result(raw)
+        if meta.get("status") not in READY_STATES:
+            return None
+
+        result = meta.get("result")
+        if isinstance(result, BaseException):
+            return {"error": str(result)}
+        if not isinstance(result, dict):
+            return {"error": f"Unexpected task result: {result!r}"}
+        return result
+
+
+# Global instance (the listener starts on the first wait)
+task_dispatcher = TaskResultDispatcher()
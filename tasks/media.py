@@ -0,0 +1,41 @@
+"""Resolve media references (blob store or Telegram file) inside workers"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+from tasks.blob_store import get_blob_store, is_blob_ref
+from tasks.telegram_files import is_telegram_ref, file_id_from_ref, download_bytes, download_to_tempfile
+
+
+def read_media(ref: str) -> bytes:
+    """Load media bytes by reference"""
+    if is_telegram_ref(ref):
+        return download_bytes(file_id_from_ref(ref))
+    if is_blob_ref(ref):
+        return get_blob_store().get(ref)
+    raise ValueError(f"Unknown media reference: {ref!r}")
+
+
+@contextmanager
+def media_file(ref: str, suffix: str = None, default_suffix: str = ".bin"):
+    """
+    Yield a local file path with the referenced media.
+
+    Telegram files are streamed straight to disk and keep their own
+    extension; blobs are written out with default_suffix.
+    The file is removed on exit.
+    """
+    if is_telegram_ref(ref):
+        temp_path = download_to_tempfile(file_id_from_ref(ref), suffix=suffix, default_suffix=default_suffix)
+    elif is_blob_ref(ref):
+        with tempfile.NamedTemporaryFile(suffix=suffix or default_suffix, delete=False) as temp_file:
+            temp_file.write(get_blob_store().get(ref))
+            temp_path = temp_file.name
+    else:
+        raise ValueError(f"Unknown media reference: {ref!r}")
+
+    try:
+        yield temp_path
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,109 @@
+"""Near-duplicate news detection: SimHash over word shingles with LSH bands"""
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+# Signature size and the largest Hamming distance still counted as the same story
+BITS = 64
+MAX_DISTANCE = 3
+
+# Pigeonhole: signatures within MAX_DISTANCE bits agree on at least one of
+# MAX_DISTANCE + 1 bands, so bucketing by band finds every candidate
+BANDS = MAX_DISTANCE + 1
+BAND_BITS = BITS // BANDS
+_BAND_MASK = (1 << BAND_BITS) - 1
+
+SHINGLE_SIZE = 3
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_WORD_RE = re.compile(r'\w+')
+
+
+def _shingles(text: str) -> List[str]:
+    words = _WORD_RE.findall(_TAG_RE.sub(' ', text).lower())
+    if len(words) < SHINGLE_SIZE:
+        return words
+    return [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the word shingles of text (HTML tags ignored)"""
+    shingles = _shingles(text)
+    if not shingles:
+        return 0
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+    # (shingles x 64) bit matrix; each bit of the signature is a majority vote
+    bits = np.unpackbits(hashes.astype("<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int.from_bytes(np.packbits(votes > 0, bitorder="little").tobytes(), "little")
+
+
+def item_signature(item: Dict) -> int:
+    """SimHash of a news item's title and summary"""
+    return simhash(f"{item.get('title', '')} {item.get('summary') or item.get('content') or ''}")
+
+
+def bands(signature: int) -> List[int]:
+    """LSH band values of a signature, in band order"""
+    return [(signature >> (i * BAND_BITS)) & _BAND_MASK for i in range(BANDS)]
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex:
+    """
+    In-memory LSH index of signatures -> cluster id.
+
+    Each lookup only compares against signatures sharing a band, so
+    clustering a batch is O(n) for typical (sparse) buckets.
+    """
+
+    def __init__(self):
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(BANDS)]
+        self._clusters: Dict[int, str] = {}
+
+    def find(self, signature: int) -> Optional[str]:
+        """Cluster id of a near-duplicate already in the index, if any"""
+        for band, value in enumerate(bands(signature)):
+            for candidate in self._buckets[band].get(value, ()):
+                if hamming(signature, candidate) <= MAX_DISTANCE:
+                    return self._clusters[candidate]
+        return None
+
+    def add(self, signature: int, cluster: str):
+        if signature in self._clusters:
+            return
+        self._clusters[signature] = cluster
+        for band, value in enumerate(bands(signature)):
+            self._buckets[band].setdefault(value, []).append(signature)
+
+
+def collapse(items: Iterable[Dict]) -> List[Dict]:
+    """
+    Keep the first item of each near-duplicate cluster, preserving order.
+
+    Items from the news store carry their store-wide cluster id and
+    signature; others (e.g. NewsAPI articles) are hashed on the fly.
+    """
+    index = NearDuplicateIndex()
+    seen_clusters: Set[str] = set()
+    unique = []
+    for position, item in enumerate(items):
+        signature = item.get("simhash")
+        if signature is None:
+            signature = item_signature(item)
+        if item.get("cluster") in seen_clusters or index.find(signature) is not None:
+            continue
+        cluster = item.get("cluster") or f"local:{position}"
+        seen_clusters.add(cluster)
+        index.add(signature, cluster)
+        unique.append(item)
+    return unique
@@ -0,0 +1,115 @@
+"""Local relevance ranking of news for a channel: BM25 over sparse term matrices"""
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, List
+
+import numpy as np
+from scipy import sparse
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+# Crude stemming: Russian and English word forms mostly share their first letters
+STEM_LENGTH = 6
+
+# Query weights: channel themes count fully, style analysis keywords less
+THEME_WEIGHT = 1.0
+ANALYSIS_WEIGHT = 0.5
+ANALYSIS_KEYWORDS = 30
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_WORD_RE = re.compile(r'[^\W\d_]{3,}')
+
+_STOPWORDS = {
+    # English
+    "the", "and", "for", "with", "that", "this", "from", "are", "was", "were", "will", "has", "have",
+    "had", "not", "but", "you", "your", "its", "our", "their", "they", "about", "into", "more", "new",
+    "can", "after", "over", "than", "what", "how", "who", "why", "when", "all", "also", "just", "says",
+    # Russian
+    "что", "как", "это", "для", "его", "она", "они", "оно", "так", "все", "всё", "уже", "или", "было",
+    "был", "была", "были", "быть", "есть", "при", "над", "под", "без", "также", "тоже", "чтобы", "который",
+    "которые", "которая", "более", "очень", "только", "если", "когда", "где", "там", "тут", "вот", "после",
+    "через", "между", "может", "можно", "нужно", "свой", "свои", "своих", "этот", "эти", "этого", "того",
+    "поста", "посты", "постов", "канал", "канала", "стиль", "стиля", "автор",
+}
+
+
+def terms(text: str) -> List[str]:
+    """Lowercased, stemmed content words of text (HTML tags ignored)"""
+    words = _WORD_RE.findall(_TAG_RE.sub(' ', text).lower())
+    return [word[:STEM_LENGTH] for word in words if word not in _STOPWORDS]
+
+
+def channel_query(themes: Iterable[str], deep_analysis: str = "") -> Dict[str, float]:
+    """Weighted query terms from channel themes and the most frequent deep analysis terms"""
+    weights: Dict[str, float] = {}
+    common = Counter(terms(deep_analysis or "")).most_common(ANALYSIS_KEYWORDS)
+    if common:
+        top_count = common[0][1]
+        for term, count in common:
+            weights[term] = ANALYSIS_WEIGHT * count / top_count
+    for theme in themes:
+        for term in terms(theme):
+            weights[term] = THEME_WEIGHT
+    return weights
+
+
+def bm25_scores(documents: List[str], query: Dict[str, float]) -> np.ndarray:
+    """BM25 score of every document for a weighted query"""
+    vocabulary: Dict[str, int] = {}
+    rows, cols = [], []
+    for row, document in enumerate(documents):
+        for term in terms(document):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(term, len(vocabulary)))
+
+    n_docs = len(documents)
+    # (documents x terms) term frequencies; repeated (row, col) pairs are summed
+    tf = sparse.csr_matrix(
+        (np.ones(len(cols)), (rows, cols)),
+        shape=(n_docs, len(vocabulary))
+    )
+    tf.sum_duplicates()
+
+    doc_len = np.asarray(tf.sum(axis=1)).ravel()
+    avg_len = doc_len.mean() if n_docs and doc_len.mean() > 0 else 1.0
+    df = np.bincount(tf.indices, minlength=len(vocabulary))
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+
+    # Saturate term frequencies in place: only non-zeros are touched
+    row_len = np.repeat(doc_len, np.diff(tf.indptr))
+    tf.data = tf.data * (K1 + 1) / (tf.data + K1 * (1 - B + B * row_len / avg_len))
+
+    query_vector = np.zeros(len(vocabulary))
+    for term, weight in query.items():
+        column = vocabulary.get(term)
+        if column is not None:
+            query_vector[column] = weight
+    return tf @ (idf * query_vector)
+
+
+def _news_text(item: Dict) -> str:
+    # Headline counts twice: it is the densest description of the story
+    return f"{item.get('title', '')} {item.get('title', '')} {item.get('summary', '')}"
+
+
+def top_k(items: List[Dict], query: Dict[str, float], k: int,
+          text: Callable[[Dict], str] = _news_text) -> List[Dict]:
+    """
+    The k items most relevant to the query, best first.
+
+    If fewer than k items match any query term, the rest is filled with
+    the remaining items in their original (newest first) order.
+    """
+    if not items or not query:
+        return items[:k]
+
+    scores = bm25_scores([text(item) for item in items], query)
+    order = np.argsort(-scores, kind="stable")
+    ranked = [items[i] for i in order[:k] if scores[i] > 0]
+    if len(ranked) < k:
+        chosen = {id(item) for item in ranked}
+        ranked.extend(item for item in items if id(item) not in chosen)
+        ranked = ranked[:k]
+    return ranked
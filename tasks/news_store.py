@@ -0,0 +1,269 @@
+"""Shared news store: RSS feeds ingested in the background, read by tasks"""
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import feedparser
+import redis
+import requests
+
+from tasks import news_dedup
+from core.config import REDIS_URL, NEWS_INGEST_INTERVAL, NEWS_TTL
+
+# Every feed the bot reads, with the categories / audience it serves
+FEEDS = {
+    "https://techcrunch.com/feed/": {"categories": ["tech"], "type": "world"},
+    "https://www.theverge.com/rss/index.xml": {"categories": ["tech"], "type": "world"},
+    "https://cointelegraph.com/rss": {"categories": ["crypto"], "type": "world"},
+    "https://www.socialmediatoday.com/rss.xml": {"categories": ["marketing"], "type": "world"},
+    "https://feeds.bbci.co.uk/news/business/rss.xml": {"categories": ["business"], "type": "business"},
+    "https://feeds.bbci.co.uk/news/technology/rss.xml": {"categories": [], "type": "world"},
+    "https://lenta.ru/rss": {"categories": [], "type": "russian"},
+    "https://habr.com/ru/rss/all/all/": {"categories": [], "type": "russian"},
+    "https://vc.ru/rss/all": {"categories": [], "type": "russian"},
+    "https://tass.ru/rss/v2.xml": {"categories": [], "type": "russian"},
+}
+
+# Categories served by fetch_news
+CATEGORIES = ("tech", "crypto", "marketing", "business")
+
+# Entries kept per feed
+MAX_ENTRIES_PER_FEED = 50
+
+# A feed not refreshed for this many ingest intervals is fetched live on read
+STALE_AFTER_INTERVALS = 3
+
+USER_AGENT = "smm-bot-news-ingest/1.0"
+
+
+def _feed_id(feed_url: str) -> str:
+    return hashlib.sha1(feed_url.encode("utf-8")).hexdigest()[:16]
+
+
+def _item_id(url: str, title: str) -> str:
+    return hashlib.sha1((url or title).encode("utf-8")).hexdigest()
+
+
+def _published_at(entry) -> datetime:
+    for field in ("published_parsed", "updated_parsed"):
+        parsed = entry.get(field)
+        if parsed:
+            return datetime(*parsed[:6], tzinfo=timezone.utc)
+    return datetime.now(timezone.utc)
+
+
+class NewsStore:
+    """
+    Normalized feed entries in Redis.
+
+    Each entry is a JSON key with expiry (news:item:<id>); each feed keeps
+    a sorted set of its entry ids by publication time plus its ETag /
+    Last-Modified validators, so polling uses conditional GET and an
+    unchanged feed costs a single 304. Entries carry a SimHash and the id
+    of their near-duplicate cluster, found through LSH band buckets
+    (news:lsh:<band>:<value>) shared by all feeds.
+    """
+
+    def __init__(self, ttl: int = NEWS_TTL, ingest_interval: int = NEWS_INGEST_INTERVAL):
+        self.ttl = ttl
+        self.ingest_interval = ingest_interval
+        self._redis: Optional[redis.Redis] = None
+        self._session: Optional[requests.Session] = None
+
+    def _get_redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(REDIS_URL, decode_responses=True, socket_keepalive=True)
+        return self._redis
+
+    def _get_session(self) -> requests.Session:
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.headers["User-Agent"] = USER_AGENT
+        return self._session
+
+    # ===== INGESTION =====
+
+    def ingest_feed(self, feed_url: str) -> int:
+        """Poll one feed with conditional GET and store new entries; return number of new entries"""
+        items = self._fetch(feed_url)
+        return self.store_items(feed_url, items) if items else 0
+
+    def ingest_all(self, max_workers: int = 8) -> Dict[str, int]:
+        """Poll all feeds; return new entry count (or -1 on error) per feed"""
+        def fetch(feed_url):
+            try:
+                return feed_url, self._fetch(feed_url)
+            except Exception as e:
+                print(f"Warning: News ingest failed for {feed_url}: {e}")
+                return feed_url, None
+
+        # Download concurrently, then store one feed at a time so stories
+        # arriving from several feeds in the same run are clustered together
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            fetched = list(pool.map(fetch, FEEDS))
+
+        results = {}
+        for feed_url, items in fetched:
+            if items is None:
+                results[feed_url] = -1
+                continue
+            try:
+                results[feed_url] = self.store_items(feed_url, items) if items else 0
+            except redis.RedisError as e:
+                print(f"Warning: Failed to store news from {feed_url}: {e}")
+                results[feed_url] = -1
+        return results
+
+    def _fetch(self, feed_url: str) -> List[Dict]:
+        """Conditional GET of one feed; normalized entries, or [] if unchanged"""
+        client = self._get_redis()
+        meta_key = f"news:feed_meta:{_feed_id(feed_url)}"
+        meta = client.hgetall(meta_key)
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("modified"):
+            headers["If-Modified-Since"] = meta["modified"]
+
+        response = self._get_session().get(feed_url, headers=headers, timeout=10)
+        if response.status_code == 304:
+            client.hset(meta_key, "fetched_at", time.time())
+            return []
+        response.raise_for_status()
+
+        feed = feedparser.parse(response.content)
+        source = feed.feed.get("title", "RSS")
+        items = [self._normalize(entry, feed_url, source) for entry in feed.entries[:MAX_ENTRIES_PER_FEED]]
+
+        client.hset(meta_key, mapping={
+            "etag": response.headers.get("ETag", ""),
+            "modified": response.headers.get("Last-Modified", ""),
+            "source": source,
+            "fetched_at": time.time(),
+        })
+        return items
+
+    def store_items(self, feed_url: str, items: List[Dict]) -> int:
+        """
+        Write normalized items, index them under their feed and assign each
+        new item a near-duplicate cluster; return the number of new items.
+
+        Only new items are hashed and looked up, each against the LSH
+        buckets of its own signature, so a batch costs O(n).
+        """
+        client = self._get_redis()
+        pipe = client.pipeline()
+        for item in items:
+            pipe.exists(f"news:item:{item['id']}")
+        exists = pipe.execute()
+        new_items = [item for item, found in zip(items, exists) if not found]
+
+        self._assign_clusters(new_items)
+
+        index_key = f"news:feed:{_feed_id(feed_url)}"
+        pipe = client.pipeline()
+        for item, found in zip(items, exists):
+            item_key = f"news:item:{item['id']}"
+            if found:
+                pipe.expire(item_key, self.ttl)
+            else:
+                pipe.set(item_key, json.dumps(item, ensure_ascii=False), ex=self.ttl)
+                for band, value in enumerate(news_dedup.bands(item["simhash"])):
+                    bucket_key = f"news:lsh:{band}:{value:x}"
+                    pipe.sadd(bucket_key, item["id"])
+                    pipe.expire(bucket_key, self.ttl)
+            pipe.zadd(index_key, {item["id"]: item["published_ts"]})
+        # Keep only the newest entries and forget feeds nobody polls anymore
+        pipe.zremrangebyrank(index_key, 0, -MAX_ENTRIES_PER_FEED - 1)
+        pipe.expire(index_key, self.ttl)
+        pipe.execute()
+        return len(new_items)
+
+    def _assign_clusters(self, items: List[Dict]):
+        """Set simhash and cluster (id of the first item seen of the same story)"""
+        if not items:
+            return
+        client = self._get_redis()
+        for item in items:
+            item["simhash"] = news_dedup.item_signature(item)
+
+        # Stored items sharing a band with any new item
+        pipe = client.pipeline()
+        for item in items:
+            for band, value in enumerate(news_dedup.bands(item["simhash"])):
+                pipe.smembers(f"news:lsh:{band}:{value:x}")
+        candidate_ids = sorted(set().union(*pipe.execute()))
+
+        index = news_dedup.NearDuplicateIndex()
+        if candidate_ids:
+            raw = client.mget([f"news:item:{item_id}" for item_id in candidate_ids])
+            for value in raw:
+                if value is not None:
+                    stored = json.loads(value)
+                    if "simhash" in stored:
+                        index.add(stored["simhash"], stored["cluster"])
+
+        # New items also match earlier items of the same batch
+        for item in items:
+            item["cluster"] = index.find(item["simhash"]) or item["id"]
+            index.add(item["simhash"], item["cluster"])
+
+    @staticmethod
+    def _normalize(entry, feed_url: str, source: str) -> Dict:
+        published_at = _published_at(entry)
+        url = entry.get("link", "")
+        title = entry.get("title", "")
+        return {
+            "id": _item_id(url, title),
+            "title": title,
+            "summary": entry.get("summary", "")[:500],
+            "source": source,
+            "url": url,
+            "feed": feed_url,
+            "published_at": published_at.isoformat(),
+            "published_ts": published_at.timestamp(),
+        }
+
+    # ===== READING =====
+
+    def get_feed_items(self, feed_url: str, limit: int) -> List[Dict]:
+        """Newest stored entries of a feed; fetches live if the feed is missing or stale"""
+        client = self._get_redis()
+        fetched_at = client.hget(f"news:feed_meta:{_feed_id(feed_url)}", "fetched_at")
+        if not fetched_at or time.time() - float(fetched_at) > STALE_AFTER_INTERVALS * self.ingest_interval:
+            try:
+                self.ingest_feed(feed_url)
+            except Exception as e:
+                print(f"Warning: Live fetch failed for {feed_url}: {e}")
+
+        index_key = f"news:feed:{_feed_id(feed_url)}"
+        ids = client.zrevrange(index_key, 0, limit - 1)
+        if not ids:
+            return []
+
+        raw = client.mget([f"news:item:{item_id}" for item_id in ids])
+        expired = [item_id for item_id, value in zip(ids, raw) if value is None]
+        if expired:
+            client.zrem(index_key, *expired)
+        return [json.loads(value) for value in raw if value is not None]
+
+    def get_category_items(self, category: str, limit_per_feed: int) -> List[Dict]:
+        """Newest entries of all feeds in a category"""
+        feeds = [url for url, info in FEEDS.items() if category in info["categories"]]
+        items = []
+        for feed_url in feeds:
+            items.extend(self.get_feed_items(feed_url, limit_per_feed))
+        return items
+
+
+def feeds_of_type(news_type: str) -> List[str]:
+    """Feed URLs for an audience type ("russian", "world", ...)"""
+    return [url for url, info in FEEDS.items() if info["type"] == news_type]
+
+
+# Global instance
+news_store = NewsStore()
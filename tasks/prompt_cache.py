@@ -0,0 +1,155 @@
+"""Channel style prefix shared by all generations, cached on the Gemini side"""
+import hashlib
+import threading
+from datetime import timedelta
+from typing import Dict, Optional
+
+import google.generativeai as genai
+from google.generativeai import caching
+import redis
+from cachetools import TTLCache
+from google.api_core import exceptions as google_exceptions
+
+from core.config import REDIS_URL, PROMPT_CACHE_ENABLED, PROMPT_CACHE_TTL
+from tasks import providers
+
+# Examples included in the style prefix
+PREFIX_EXAMPLES = 7
+
+# Redis value for prefixes the provider refused to cache (e.g. too short)
+_UNCACHEABLE = "-"
+
+
+def build_style_prefix(channel: Dict) -> str:
+    """Topic-free part of every generation prompt: deep analysis + example posts"""
+    deep_analysis = channel.get('deep_analysis') or ''
+    example_posts = (channel.get('example_posts') or [])[:PREFIX_EXAMPLES]
+    examples_text = "\n\n━━━━━ ПРИМЕР ОРИГИНАЛЬНОГО ПОСТА ━━━━━\n\n".join(example_posts)
+
+    return f"""Ты — автор Telegram канала, который уже много лет ведет свой канал в уникальном стиле.
+
+═══════════════════════════════════════════════════════════
+ГЛУБОКИЙ АНАЛИЗ ТВОЕГО СТИЛЯ:
+═══════════════════════════════════════════════════════════
+
+{deep_analysis}
+
+═══════════════════════════════════════════════════════════
+ПРИМЕРЫ ТВОИХ ОРИГИНАЛЬНЫХ ПОСТОВ:
+═══════════════════════════════════════════════════════════
+
+{examples_text}"""
+
+
+class StylePromptCache:
+    """
+    Send the channel style prefix once, then only task-specific suffixes.
+
+    The prefix becomes the system instruction of a Gemini CachedContent;
+    its name is shared between workers through Redis (keyed by model and
+    prefix hash) and the resulting model objects are kept per process.
+    If the provider can't cache the prefix (too short, disabled, expired)
+    the prefix is sent inline as the same system instruction, so the
+    request stays prefix-identical and benefits from implicit caching.
+    """
+
+    def __init__(self, ttl: int = PROMPT_CACHE_TTL, enabled: bool = PROMPT_CACHE_ENABLED):
+        self.ttl = ttl
+        self.enabled = enabled
+        self._redis: Optional[redis.Redis] = None
+        self._models = TTLCache(maxsize=256, ttl=max(ttl - 60, 60))
+        self._lock = threading.Lock()
+
+    def generate(self, model_name: str, prefix: str, suffix: str, **kwargs):
+        """generate_content(suffix) on top of the cached prefix"""
+        kwargs.setdefault("request_options", providers.GEMINI_REQUEST_OPTIONS)
+        key = self._key(model_name, prefix)
+        model = self._cached_model(key, model_name, prefix)
+        if model is not None:
+            try:
+                return model.generate_content(suffix, **kwargs)
+            except (google_exceptions.NotFound, google_exceptions.PermissionDenied) as e:
+                # Cache expired or was deleted under us
+                print(f"Warning: Cached prompt prefix unavailable, sending inline: {e}")
+                self._forget(key)
+
+        inline_model = genai.GenerativeModel(model_name, system_instruction=prefix)
+        return inline_model.generate_content(suffix, **kwargs)
+
+    # ===== INTERNALS =====
+
+    def _get_redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(REDIS_URL, decode_responses=True, socket_keepalive=True)
+        return self._redis
+
+    @staticmethod
+    def _key(model_name: str, prefix: str) -> str:
+        digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        return f"prompt_cache:{model_name}:{digest}"
+
+    def _cached_model(self, key: str, model_name: str, prefix: str) -> Optional[genai.GenerativeModel]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            model = self._models.get(key)
+        if model is not None:
+            return model
+
+        try:
+            name = self._get_redis().get(key)
+            if name == _UNCACHEABLE:
+                return None
+            if name:
+                cached_content = caching.CachedContent.get(name)
+            else:
+                cached_content = self._create(key, model_name, prefix)
+                if cached_content is None:
+                    return None
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+        except (redis.RedisError, google_exceptions.GoogleAPIError) as e:
+            print(f"Warning: Prompt cache lookup failed, sending prefix inline: {e}")
+            return None
+
+        with self._lock:
+            self._models[key] = model
+        return model
+
+    def _create(self, key: str, model_name: str, prefix: str):
+        """Register the prefix with the provider (one worker at a time)"""
+        client = self._get_redis()
+        if not client.set(f"{key}:lock", "1", nx=True, ex=60):
+            # Someone else is creating it; go inline this once
+            return None
+        try:
+            try:
+                cached_content = caching.CachedContent.create(
+                    model=f"models/{model_name}",
+                    system_instruction=prefix,
+                    ttl=timedelta(seconds=self.ttl),
+                    display_name=key.rsplit(":", 1)[-1][:32]
+                )
+            except google_exceptions.InvalidArgument as e:
+                # Typically below the minimum cacheable size: don't retry for a while
+                print(f"Warning: Prompt prefix not cacheable: {e}")
+                client.set(key, _UNCACHEABLE, ex=self.ttl)
+                return None
+
+            # Expire our pointer a bit before the provider drops the cache
+            client.set(key, cached_content.name, ex=max(self.ttl - 60, 1))
+            return cached_content
+        finally:
+            client.delete(f"{key}:lock")
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._models.pop(key, None)
+        try:
+            self._get_redis().delete(key)
+        except redis.RedisError:
+            pass
+
+
+# Global instance
+style_prompt_cache = StylePromptCache()
@@ -0,0 +1,104 @@
+"""AI provider clients and models, created on first use"""
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import google.generativeai as genai
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.config import GEMINI_API_KEY, OPENAI_API_KEY, REPLICATE_API_KEY, PROVIDER_TIMEOUT
+
+# Only stores the key: no connection is made until the first request
+genai.configure(api_key=GEMINI_API_KEY)
+
+DEFAULT_GEMINI_MODEL = 'gemini-2.5-flash'
+
+# io tasks run in a thread pool, where Celery cannot enforce time limits:
+# every provider call carries its own deadline instead
+GEMINI_REQUEST_OPTIONS = {"timeout": PROVIDER_TIMEOUT}  # pass to generate_content
+REPLICATE_POLL_INTERVAL = 1.0  # seconds between prediction status checks
+
+_lock = threading.Lock()
+_gemini_models: Dict[str, genai.GenerativeModel] = {}
+_openai_client = None
+_replicate = None
+_http_session: Optional[requests.Session] = None
+
+# Connections kept per host by the shared HTTP session (covers the io worker's threads)
+HTTP_POOL_SIZE = 32
+
+
+def gemini(model_name: str = DEFAULT_GEMINI_MODEL) -> genai.GenerativeModel:
+    """Shared Gemini model object for model_name"""
+    model = _gemini_models.get(model_name)
+    if model is None:
+        with _lock:
+            model = _gemini_models.setdefault(model_name, genai.GenerativeModel(model_name))
+    return model
+
+
+def openai_client():
+    """Shared OpenAI client (raises RuntimeError if OPENAI_API_KEY is not set)"""
+    global _openai_client
+    if _openai_client is None:
+        if not OPENAI_API_KEY:
+            raise RuntimeError("OPENAI_API_KEY not set")
+        from openai import OpenAI
+        with _lock:
+            if _openai_client is None:
+                _openai_client = OpenAI(api_key=OPENAI_API_KEY, timeout=PROVIDER_TIMEOUT)
+    return _openai_client
+
+
+def replicate():
+    """The replicate module, imported with the API token in place"""
+    global _replicate
+    if _replicate is None:
+        # Replicate reads its token from the environment
+        if REPLICATE_API_KEY:
+            os.environ["REPLICATE_API_TOKEN"] = REPLICATE_API_KEY
+        import replicate as replicate_module
+        _replicate = replicate_module
+    return _replicate
+
+
+def run_replicate(ref: str, input: Dict, timeout: float = PROVIDER_TIMEOUT):
+    """
+    replicate.run() with a deadline: the prediction is cancelled and
+    TimeoutError raised if it has not finished within timeout seconds.
+    ref is "owner/model" or "owner/model:version".
+    """
+    client = replicate()
+    model, _, version = ref.partition(":")
+    if version:
+        prediction = client.predictions.create(version=version, input=input)
+    else:
+        prediction = client.models.predictions.create(model=model, input=input)
+
+    deadline = time.monotonic() + timeout
+    while prediction.status not in ("succeeded", "failed", "canceled"):
+        if time.monotonic() >= deadline:
+            prediction.cancel()
+            raise TimeoutError(f"Replicate prediction {prediction.id} ({ref}) did not finish in {timeout:.0f}s")
+        time.sleep(REPLICATE_POLL_INTERVAL)
+        prediction.reload()
+
+    if prediction.status != "succeeded":
+        raise RuntimeError(f"Replicate prediction {prediction.id} ({ref}) {prediction.status}: {prediction.error}")
+    return prediction.output
+
+
+def http_session() -> requests.Session:
+    """Shared keep-alive session for downloading provider outputs"""
+    global _http_session
+    if _http_session is None:
+        with _lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
@@ -0,0 +1,153 @@
+"""Long-lived Pyrogram clients shared by tasks in a worker process"""
+import atexit
+import fcntl
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from celery.signals import worker_process_shutdown
+
+from core.config import API_ID, API_HASH, PYROGRAM_SESSIONS, PYROGRAM_SESSION_WAIT
+
+if TYPE_CHECKING:
+    from pyrogram import Client
+
+# Errors after which a client is restarted before its next use
+_CONNECTION_ERRORS = (ConnectionError, OSError, TimeoutError)
+
+
+class _Session:
+    """One session file claimed by this process and its client"""
+
+    __slots__ = ("name", "lock_file", "client")
+
+    def __init__(self, name: str, lock_file):
+        self.name = name
+        self.lock_file = lock_file
+        self.client: Optional["Client"] = None
+
+
+class PyrogramPool:
+    """
+    Pool of started Pyrogram clients, one per session file.
+
+    A session file (SQLite) can only be used by one client at a time, so
+    each process claims files with an exclusive flock and keeps the client
+    running between tasks. Clients start on first use, are restarted after
+    connection errors and are stopped when the worker process exits.
+    Several session files let several processes analyze in parallel.
+    """
+
+    def __init__(self, sessions: List[str] = None, wait: float = PYROGRAM_SESSION_WAIT):
+        self.session_names = sessions or PYROGRAM_SESSIONS
+        self.wait = wait
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._sessions: Dict[str, _Session] = {}
+        self._idle: "queue.Queue[_Session]" = queue.Queue()
+
+    @contextmanager
+    def client(self):
+        """Check out a started client for exclusive use"""
+        session = self._checkout()
+        try:
+            if session.client is None or not session.client.is_connected:
+                self._start(session)
+            yield session.client
+        except _CONNECTION_ERRORS:
+            self._stop(session)
+            raise
+        finally:
+            self._idle.put(session)
+
+    def shutdown(self):
+        """Stop all clients and release the session files"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Inherited from the parent through fork: not ours to stop
+                self._reset()
+                return
+            for session in self._sessions.values():
+                self._stop(session)
+                try:
+                    fcntl.flock(session.lock_file, fcntl.LOCK_UN)
+                    session.lock_file.close()
+                except OSError:
+                    pass
+            self._reset()
+
+    def _checkout(self) -> _Session:
+        deadline = time.monotonic() + self.wait
+        while True:
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            session = self._claim()
+            if session:
+                return session
+
+            if time.monotonic() >= deadline:
+                raise TimeoutError("No free Pyrogram session: all session files are in use")
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _claim(self) -> Optional[_Session]:
+        """Lock a session file not used by any other process"""
+        with self._lock:
+            for name in self.session_names:
+                if name in self._sessions:
+                    continue
+                lock_file = open(f"{name}.lock", "w")
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    lock_file.close()
+                    continue
+                session = _Session(name, lock_file)
+                self._sessions[name] = session
+                return session
+        return None
+
+    @staticmethod
+    def _start(session: _Session):
+        if session.client is not None:
+            PyrogramPool._stop(session)
+        from pyrogram import Client
+
+        # Scraping only: don't spend time processing incoming updates
+        session.client = Client(session.name, API_ID, API_HASH, no_updates=True)
+        session.client.start()
+
+    @staticmethod
+    def _stop(session: _Session):
+        client, session.client = session.client, None
+        if client is not None and client.is_connected:
+            try:
+                client.stop()
+            except Exception as e:
+                print(f"Warning: Failed to stop Pyrogram client {session.name}: {e}")
+
+
+# Global instance (clients start on first use)
+pyrogram_pool = PyrogramPool()
+
+
+@worker_process_shutdown.connect
+def _shutdown_pyrogram_pool(**kwargs):
+    pyrogram_pool.shutdown()
+
+
+atexit.register(pyrogram_pool.shutdown)
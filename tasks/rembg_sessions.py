@@ -0,0 +1,93 @@
+"""rembg model sessions loaded once per worker process"""
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from celery.signals import worker_init, worker_process_init
+
+from core.config import REMBG_DEFAULT_MODEL, REMBG_PRELOAD_MODELS, REMBG_THREADS
+from tasks.celery_app import CPU_QUEUE
+
+if TYPE_CHECKING:
+    from rembg.sessions.base import BaseSession
+
+# Accepted model names -> rembg model names
+MODELS = {
+    "u2net": "u2net",
+    "u2netp": "u2netp",
+    "u2net_human_seg": "u2net_human_seg",
+    "silueta": "silueta",
+    "isnet": "isnet-general-use",
+    "isnet-general-use": "isnet-general-use",
+}
+
+
+def resolve_model(model: Optional[str]) -> str:
+    """rembg model name for a requested model (default if None); raises ValueError if unknown"""
+    name = MODELS.get((model or REMBG_DEFAULT_MODEL).lower())
+    if name is None:
+        raise ValueError(f"Unknown background removal model: {model} (available: {', '.join(MODELS)})")
+    return name
+
+
+class RembgSessions:
+    """
+    ONNX inference sessions of rembg models, one per model per process.
+
+    Building a session loads the model from disk and initializes
+    onnxruntime, which takes seconds; sessions are reused by every task
+    afterwards and can be built ahead of time with preload().
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, "BaseSession"] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: Optional[str] = None) -> "BaseSession":
+        name = resolve_model(model)
+        session = self._sessions.get(name)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(name)
+                if session is None:
+                    # rembg pulls in onnxruntime, scipy and numba: import it only here
+                    from rembg import new_session
+                    session = new_session(name)
+                    self._sessions[name] = session
+        return session
+
+    def preload(self, models: List[str]):
+        """Build sessions now instead of on the first request"""
+        for model in models:
+            try:
+                self.get(model)
+            except Exception as e:
+                print(f"Warning: Failed to preload rembg model {model}: {e}")
+
+
+# Global instance
+rembg_sessions = RembgSessions()
+
+# Preload only in workers that consume the queue remove_background is routed to
+_preload = True
+
+
+@worker_init.connect
+def _configure_onnx_threads(sender=None, **kwargs):
+    """Split the cores between the worker's processes (inherited through fork)"""
+    global _preload
+    consumed = getattr(sender.app.amqp.queues, "consume_from", None) if sender else None
+    _preload = not consumed or CPU_QUEUE in consumed
+
+    threads = REMBG_THREADS
+    if not threads:
+        concurrency = getattr(sender, "concurrency", None) or os.cpu_count() or 1
+        threads = max(1, (os.cpu_count() or 1) // concurrency)
+    # rembg passes OMP_NUM_THREADS to onnxruntime as intra/inter-op threads
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+
+
+@worker_process_init.connect
+def _preload_rembg_sessions(**kwargs):
+    if _preload:
+        rembg_sessions.preload(REMBG_PRELOAD_MODELS)
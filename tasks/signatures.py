@@ -0,0 +1,33 @@
+"""
+Task handles for the bot: send tasks by name.
+
+Importing tasks.tasks would load the whole worker stack (Gemini, OpenAI,
+Replicate, Pyrogram, rembg) into the bot process; these signatures only need
+the Celery app. Routing to queues still applies (task_routes match names).
+"""
+import asyncio
+
+from celery import Signature
+from celery.result import AsyncResult
+
+from tasks.celery_app import celery_app
+
+analyze_channel_task = celery_app.signature('analyze_channel')
+generate_posts_task = celery_app.signature('generate_posts')
+generate_post_ideas_task = celery_app.signature('generate_post_ideas')
+generate_image_task = celery_app.signature('generate_image')
+edit_image_task = celery_app.signature('edit_image')
+remove_watermark_task = celery_app.signature('remove_watermark')
+add_watermark_task = celery_app.signature('add_watermark')
+remove_background_task = celery_app.signature('remove_background')
+transcribe_audio_task = celery_app.signature('transcribe_audio')
+generate_video_task = celery_app.signature('generate_video')
+image_to_video_task = celery_app.signature('image_to_video')
+translate_text_task = celery_app.signature('translate_text')
+advanced_tts_task = celery_app.signature('advanced_tts')
+chat_with_ai_task = celery_app.signature('chat_with_ai')
+
+
+async def submit(signature: Signature, *args, **kwargs) -> AsyncResult:
+    """signature.delay() from async code: the broker publish runs in a thread, not on the loop"""
+    return await asyncio.to_thread(signature.delay, *args, **kwargs)
@@ -1,165 +1,89 @@
 """Celery tasks for async operations"""
 import os
 from tasks.celery_app import celery_app
+from tasks.blob_store import get_blob_store, LocalBlobStore
+from tasks.media import read_media, media_file
+from tasks.pyrogram_pool import pyrogram_pool
+from tasks.channel_metrics import MetricsTable, post_metrics
+from tasks.prompt_cache import style_prompt_cache, build_style_prefix
+from tasks.telegram_stream import MessageStreamer, stream_gemini
+from tasks.translation import translate
+from tasks.tts_cache import tts_cache
+from tasks.transcription import transcribe
+from tasks.news_store import news_store, feeds_of_type, CATEGORIES
+from tasks import news_dedup, news_ranking
+from db.database import db
+from core.state_manager import state_manager
 
 # Import config FIRST to get API keys
 from core.config import (
-    API_ID, API_HASH, SESSION_NAME, GEMINI_API_KEY,
+    GEMINI_API_KEY,
     OPENAI_API_KEY, REPLICATE_API_KEY, NEWS_API_KEY,
-    MAX_POSTS_TO_ANALYZE, BASE_DIR
+    MAX_POSTS_TO_ANALYZE, ANALYSIS_REFRESH_MIN_NEW_POSTS, CHANNEL_ANALYSIS_FRESHNESS, IDEAS_NEWS_TOP_K,
+    CHAT_HISTORY_MAX_MESSAGES, REDIS_URL, TASK_TIMEOUT, BASE_DIR
 )
 
-# IMPORTANT: Set Replicate API token BEFORE importing replicate
-if REPLICATE_API_KEY:
-    os.environ["REPLICATE_API_TOKEN"] = REPLICATE_API_KEY
-
-# Now import replicate (will use the token from environment)
-from pyrogram import Client
-from pyrogram.errors import UsernameNotOccupied, UsernameInvalid, ChannelPrivate
+# Provider clients (OpenAI, Replicate) and models are created on first use;
+# Pyrogram and rembg are imported only by the tasks that need them
+from tasks import providers
 import google.generativeai as genai
-from openai import OpenAI
-import replicate
 import requests
-import feedparser
 from PIL import Image, ImageDraw, ImageFont
-from rembg import remove
+from tasks.rembg_sessions import rembg_sessions
 from io import BytesIO
 import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import re
 import json
-from typing import Dict, List, Optional
+import redis
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 # Ensure sessions directory exists
 os.makedirs(BASE_DIR / "sessions", exist_ok=True)
 
-# Initialize AI clients
-genai.configure(api_key=GEMINI_API_KEY)
-gemini_model = genai.GenerativeModel('gemini-2.5-flash')
-gemini_pro_model = genai.GenerativeModel('gemini-2.5-pro')  # For deep analysis
-gemini_image_model = genai.GenerativeModel('gemini-2.5-flash-image')  # For image generation and editing
-
-if OPENAI_API_KEY:
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
-
-@celery_app.task(name='analyze_channel')
-def analyze_channel_task(channel_url: str) -> Dict:
-    """
-    REVOLUTIONARY AI-POWERED CHANNEL ANALYSIS
+# Gemini models
+STYLE_MODEL = 'gemini-2.5-flash'  # Post generation on top of the cached style prefix
+PRO_MODEL = 'gemini-2.5-pro'  # For deep analysis
+IMAGE_MODEL = 'gemini-2.5-flash-image'  # For image generation and editing
 
-    This function uses advanced AI to deeply understand the writing style,
-    not just count metrics. It creates a psychological profile of the author.
-    """
-    try:
-        # Parse channel with Pyrogram
-        channel_title = ""
-        with Client(SESSION_NAME, API_ID, API_HASH) as client:
-            # Get chat info
-            chat = client.get_chat(channel_url)
-            channel_title = chat.title
-
-            # Get messages from the channel
-            messages = []
-            for message in client.get_chat_history(chat.id, limit=MAX_POSTS_TO_ANALYZE):
-                messages.append(message)
-
-            posts_data = []
-            for msg in messages:
-                # Get text from either text or caption (for media posts)
-                text_content = msg.text or msg.caption
-
-                if text_content:
-                    emoji_count = len(re.findall(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F700-\U0001FAFF\U00002702-\U000027B0]', text_content))
-
-                    # Deep metrics per post
-                    words = text_content.split()
-                    sentences = [s.strip() for s in re.split(r'[.!?]+', text_content) if s.strip()]
-                    lines = [l.strip() for l in text_content.split('\n') if l.strip()]
-
-                    # Formatting analysis
-                    bold_count = text_content.count('<b>') + text_content.count('**')
-                    italic_count = text_content.count('<i>') + text_content.count('_')
-                    code_count = text_content.count('<code>') + text_content.count('`')
-                    link_count = text_content.count('http')
-
-                    # Punctuation analysis
-                    question_marks = text_content.count('?')
-                    exclamation_marks = text_content.count('!')
-                    hashtags = len(re.findall(r'#\w+', text_content))
-
-                    posts_data.append({
-                        "text": text_content,
-                        "word_count": len(words),
-                        "sentence_count": len(sentences),
-                        "line_count": len(lines),
-                        "emoji_count": emoji_count,
-                        "bold_count": bold_count,
-                        "italic_count": italic_count,
-                        "code_count": code_count,
-                        "link_count": link_count,
-                        "question_marks": question_marks,
-                        "exclamation_marks": exclamation_marks,
-                        "hashtags": hashtags,
-                        "avg_word_length": round(sum(len(w) for w in words) / len(words)) if words else 0,
-                        "has_cta": any(word in text_content.lower() for word in ['подпишись', 'жми', 'переходи', 'смотри', 'читай', 'узнай'])
-                    })
-
-        if not posts_data:
-            return {"error": "Текстовые посты не найдены"}
-
-        num_posts = len(posts_data)
-
-        # Calculate basic metrics (supplementary data)
-        metrics = {
-            "channel_title": channel_title,
-            "analyzed_posts_count": num_posts,
-            "average_word_count": round(sum(p['word_count'] for p in posts_data) / num_posts),
-            "average_sentence_count": round(sum(p['sentence_count'] for p in posts_data) / num_posts),
-            "average_line_count": round(sum(p['line_count'] for p in posts_data) / num_posts),
-            "average_emoji_count": round(sum(p['emoji_count'] for p in posts_data) / num_posts),
-            "average_bold_usage": round(sum(p['bold_count'] for p in posts_data) / num_posts, 1),
-            "average_italic_usage": round(sum(p['italic_count'] for p in posts_data) / num_posts, 1),
-            "average_code_usage": round(sum(p['code_count'] for p in posts_data) / num_posts, 1),
-            "average_link_count": round(sum(p['link_count'] for p in posts_data) / num_posts, 1),
-            "average_question_marks": round(sum(p['question_marks'] for p in posts_data) / num_posts, 1),
-            "average_exclamation_marks": round(sum(p['exclamation_marks'] for p in posts_data) / num_posts, 1),
-            "average_hashtags": round(sum(p['hashtags'] for p in posts_data) / num_posts, 1),
-            "average_word_length": round(sum(p['avg_word_length'] for p in posts_data) / num_posts),
-            "cta_frequency": round(sum(1 for p in posts_data if p['has_cta']) / num_posts * 100),
-        }
 
-        # Select diverse example posts (short, medium, long)
-        sorted_by_length = sorted(posts_data, key=lambda x: x['word_count'])
-        example_indices = []
+def _select_example_posts(posts_data: List[Dict]) -> List[str]:
+    """Select diverse example posts (short, medium, long)"""
+    sorted_by_length = sorted(posts_data, key=lambda x: x['word_count'])
+    example_indices = []
 
-        # Get short posts (bottom 20%)
-        short_range = len(sorted_by_length) // 5
-        example_indices.extend([0, short_range // 2] if short_range > 0 else [0])
+    # Get short posts (bottom 20%)
+    short_range = len(sorted_by_length) // 5
+    example_indices.extend([0, short_range // 2] if short_range > 0 else [0])
 
-        # Get medium posts (middle 40-60%)
-        mid_start = len(sorted_by_length) * 2 // 5
-        mid_end = len(sorted_by_length) * 3 // 5
-        example_indices.extend([mid_start, (mid_start + mid_end) // 2, mid_end - 1])
+    # Get medium posts (middle 40-60%)
+    mid_start = len(sorted_by_length) * 2 // 5
+    mid_end = len(sorted_by_length) * 3 // 5
+    example_indices.extend([mid_start, (mid_start + mid_end) // 2, mid_end - 1])
 
-        # Get long posts (top 20%)
-        long_start = len(sorted_by_length) * 4 // 5
-        example_indices.extend([long_start, (long_start + len(sorted_by_length)) // 2, len(sorted_by_length) - 1])
+    # Get long posts (top 20%)
+    long_start = len(sorted_by_length) * 4 // 5
+    example_indices.extend([long_start, (long_start + len(sorted_by_length)) // 2, len(sorted_by_length) - 1])
 
-        # Deduplicate and limit to 12 examples
-        example_indices = list(set(example_indices))[:12]
-        example_posts = [sorted_by_length[i]['text'] for i in example_indices]
+    # Deduplicate and limit to 12 examples
+    example_indices = list(set(example_indices))[:12]
+    return [sorted_by_length[i]['text'] for i in example_indices]
 
-        # ═══════════════════════════════════════════════════════════
-        # DEEP AI ANALYSIS - NO JSON CONSTRAINTS
-        # Let the AI freely analyze the style in natural language
-        # ═══════════════════════════════════════════════════════════
 
-        all_posts_for_analysis = "\n\n━━━━━━━━━━━━━━━━━━━━━━\n\n".join(
-            [p['text'] for p in posts_data[:40]]  # Analyze up to 40 posts
-        )
+def _run_deep_analysis(channel_title: str, posts_data: List[Dict]) -> str:
+    """
+    DEEP AI ANALYSIS - NO JSON CONSTRAINTS
+    Let the AI freely analyze the style in natural language
+    """
+    num_posts = len(posts_data)
+    all_posts_for_analysis = "\n\n━━━━━━━━━━━━━━━━━━━━━━\n\n".join(
+        [p['text'] for p in posts_data[:40]]  # Analyze up to 40 posts
+    )
 
-        deep_analysis_prompt = f"""Ты — эксперт-лингвист и копирайтер с 20-летним опытом анализа стилей письма.
+    deep_analysis_prompt = f"""Ты — эксперт-лингвист и копирайтер с 20-летним опытом анализа стилей письма.
 
 Твоя задача: проанализировать стиль автора Telegram канала настолько глубоко, чтобы ЛЮБОЙ пост, написанный на основе твоего анализа, был НЕОТЛИЧИМ от оригинала.
 
@@ -250,26 +174,106 @@ def analyze_channel_task(channel_url: str) -> Dict:
 
 НАЧИНАЙ АНАЛИЗ:"""
 
-        # Use Gemini Pro for deep analysis (smarter than Flash)
-        deep_response = gemini_model.generate_content(
-            contents=[{"role": "user", "parts": [{"text": deep_analysis_prompt}]}],
-            generation_config=genai.types.GenerationConfig(
-                temperature=1.0,  # High creativity for deep insights
-                top_p=0.95,
-                top_k=40,
-                max_output_tokens=8192,  # Allow long analysis
-            )
-        )
+    # Use Gemini Pro for deep analysis (smarter than Flash)
+    deep_response = providers.gemini().generate_content(
+        contents=[{"role": "user", "parts": [{"text": deep_analysis_prompt}]}],
+        generation_config=genai.types.GenerationConfig(
+            temperature=1.0,  # High creativity for deep insights
+            top_p=0.95,
+            top_k=40,
+            max_output_tokens=8192,  # Allow long analysis
+        ),
+        request_options=providers.GEMINI_REQUEST_OPTIONS
+    )
 
-        deep_analysis_text = deep_response.text
+    return deep_response.text
 
-        return {
-            "success": True,
-            "style": metrics,
-            "deep_analysis": deep_analysis_text,
-            "example_posts": example_posts,
-            "channel_title": channel_title
-        }
+
+def _content_fingerprint(posts_data: List[Dict]) -> str:
+    """Fingerprint of the analyzed posts window (ids + texts)"""
+    digest = hashlib.sha256()
+    for p in posts_data:
+        digest.update(f"{p['message_id']}\x00{p['text']}\x00".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _analysis_result(channel: Dict, **extra) -> Dict:
+    """Task result from a stored channel analysis"""
+    return {
+        "success": True,
+        "chat_id": channel['chat_id'],
+        "style": channel['style_summary'],
+        "deep_analysis": channel['deep_analysis'],
+        "example_posts": channel['example_posts'],
+        "channel_title": channel['channel_title'],
+        **extra
+    }
+
+
+_redis_client: Optional[redis.Redis] = None
+
+
+def _get_redis() -> redis.Redis:
+    """Lazily create the Redis client (one per worker process)"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True, socket_keepalive=True)
+    return _redis_client
+
+
+# How long to wait for another worker's analysis of the same channel;
+# well below TASK_TIMEOUT so the waiting task still has time to answer
+CHANNEL_LOCK_WAIT = 60
+
+
+@contextmanager
+def _channel_lock(username: str):
+    """Let only one worker scrape and analyze a channel at a time; yields whether the lock is held"""
+    lock = _get_redis().lock(f"lock:analyze_channel:{username}", timeout=TASK_TIMEOUT,
+                             blocking_timeout=CHANNEL_LOCK_WAIT)
+    acquired = lock.acquire()
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except redis.exceptions.LockError:
+                pass  # Expired while we were working
+
+
+@celery_app.task(name='analyze_channel')
+def analyze_channel_task(channel_url: str) -> Dict:
+    """
+    REVOLUTIONARY AI-POWERED CHANNEL ANALYSIS
+
+    This function uses advanced AI to deeply understand the writing style,
+    not just count metrics. It creates a psychological profile of the author.
+
+    Analyses are shared between users: a channel synced less than
+    CHANNEL_ANALYSIS_FRESHNESS seconds ago is served from the database
+    without touching Telegram or Gemini. Otherwise only posts newer than
+    the last run are fetched, and the deep analysis is refreshed once
+    ANALYSIS_REFRESH_MIN_NEW_POSTS new posts have arrived.
+    """
+    from pyrogram.errors import UsernameNotOccupied, UsernameInvalid, ChannelPrivate
+
+    try:
+        username = channel_url.lstrip('@').lower()
+
+        cached = db.get_fresh_channel_analysis(username, CHANNEL_ANALYSIS_FRESHNESS)
+        if cached:
+            return _analysis_result(cached, new_posts=0, deep_analysis_refreshed=False, cached=True)
+
+        with _channel_lock(username) as acquired:
+            # Another worker may have analyzed it while we waited
+            cached = db.get_fresh_channel_analysis(username, CHANNEL_ANALYSIS_FRESHNESS)
+            if cached:
+                return _analysis_result(cached, new_posts=0, deep_analysis_refreshed=False, cached=True)
+            if not acquired:
+                return {"error": "Канал уже анализируется, попробуйте через пару минут"}
+
+            return _analyze_channel(channel_url)
 
     except (UsernameNotOccupied, UsernameInvalid, ValueError) as e:
         return {"error": f"Неверный URL канала: {str(e)}"}
@@ -280,53 +284,101 @@ def analyze_channel_task(channel_url: str) -> Dict:
         return {"error": f"Ошибка анализа: {str(e)}\n{traceback.format_exc()}"}
 
 
+def _analyze_channel(channel_url: str) -> Dict:
+    """Fetch new posts, merge metrics and refresh the deep analysis if needed"""
+    # Parse channel with the process' long-lived Pyrogram client
+    channel_title = ""
+    with pyrogram_pool.client() as client:
+        # Get chat info
+        chat = client.get_chat(channel_url)
+        channel_title = chat.title
+
+        previous = db.get_channel_analysis(chat.id)
+        last_message_id = previous['last_message_id'] if previous else 0
+
+        # History comes newest first: stop at the first already seen message
+        new_posts = []
+        newest_id = last_message_id
+        for msg in client.get_chat_history(chat.id, limit=MAX_POSTS_TO_ANALYZE):
+            if msg.id <= last_message_id:
+                break
+            newest_id = max(newest_id, msg.id)
+
+            # Get text from either text or caption (for media posts)
+            text_content = msg.text or msg.caption
+            if text_content:
+                new_posts.append({
+                    "message_id": msg.id,
+                    "text": text_content,
+                    "metrics": post_metrics(text_content),
+                    "posted_at": msg.date
+                })
+
+    pending = db.add_channel_posts(chat.id, channel_title, chat.username, new_posts, newest_id,
+                                   keep=MAX_POSTS_TO_ANALYZE)
+    posts_data = db.get_channel_posts(chat.id, MAX_POSTS_TO_ANALYZE)
+
+    if not posts_data:
+        return {"error": "Текстовые посты не найдены"}
+
+    metrics = MetricsTable.from_records(posts_data).summary(channel_title)
+    example_posts = _select_example_posts(posts_data)
+    fingerprint = _content_fingerprint(posts_data)
+
+    deep_analysis_text = previous.get('deep_analysis') if previous else None
+    unchanged = previous is not None and previous.get('content_fingerprint') == fingerprint
+    refreshed = not deep_analysis_text or (pending >= ANALYSIS_REFRESH_MIN_NEW_POSTS and not unchanged)
+    if refreshed:
+        deep_analysis_text = _run_deep_analysis(channel_title, posts_data)
+        db.save_channel_analysis(chat.id, metrics, example_posts, deep_analysis_text, fingerprint)
+    else:
+        db.save_channel_analysis(chat.id, metrics, example_posts)
+
+    return {
+        "success": True,
+        "chat_id": chat.id,
+        "style": metrics,
+        "deep_analysis": deep_analysis_text,
+        "example_posts": example_posts,
+        "channel_title": channel_title,
+        "new_posts": len(new_posts),
+        "deep_analysis_refreshed": refreshed,
+        "cached": False
+    }
+
+
 @celery_app.task(name='generate_posts')
-def generate_posts_task(style_data: Dict, topic: str) -> Dict:
+def generate_posts_task(channel_id: int, topic: str, stream_to: Dict = None) -> Dict:
     """
     REVOLUTIONARY AI POST GENERATION WITH FEW-SHOT LEARNING
 
-    Uses deep analysis + real examples to generate indistinguishable posts
+    Uses deep analysis + real examples to generate indistinguishable posts.
+    The analysis and examples form a cached prompt prefix per channel;
+    only the topic-specific instructions are sent with each request.
+
+    With stream_to={"chat_id", "message_id"} the text is streamed into
+    that message while it is being generated.
     """
     try:
-        # Extract data
-        style_summary = style_data.get('style_summary', {})
-        deep_analysis = style_data.get('deep_analysis', '')
-        example_posts = style_data.get('example_posts', [])
+        channel = db.get_channel_by_id(channel_id)
+        if not channel:
+            return {"error": "Канал не найден"}
 
         # Extract metrics for reference
+        style_summary = channel.get('style_summary') or {}
         avg_words = style_summary.get("average_word_count", 100)
         avg_sentences = style_summary.get("average_sentence_count", 5)
         avg_emojis = style_summary.get("average_emoji_count", 0)
 
-        # Select 5-7 best examples for few-shot learning
-        selected_examples = example_posts[:7] if len(example_posts) > 7 else example_posts
-
-        # Format examples for prompt
-        examples_text = "\n\n━━━━━ ПРИМЕР ОРИГИНАЛЬНОГО ПОСТА ━━━━━\n\n".join(selected_examples)
-
         # ═══════════════════════════════════════════════════════════
         # FEW-SHOT LEARNING PROMPT
-        # Show real examples + deep analysis for perfect imitation
+        # Real examples + deep analysis come from the cached style prefix
         # ═══════════════════════════════════════════════════════════
 
-        prompt = f"""Ты — автор Telegram канала, который уже много лет ведет свой канал в уникальном стиле.
-
-ТВОЯ ЗАДАЧА: написать 3 разных варианта поста на тему "{topic}"
+        prompt = f"""ТВОЯ ЗАДАЧА: написать 3 разных варианта поста на тему "{topic}"
 
 КРИТИЧЕСКИ ВАЖНО: Посты должны быть НЕОТЛИЧИМЫ от твоего обычного стиля! Никто не должен заподозрить, что это не ты.
 
-═══════════════════════════════════════════════════════════
-ГЛУБОКИЙ АНАЛИЗ ТВОЕГО СТИЛЯ:
-═══════════════════════════════════════════════════════════
-
-{deep_analysis}
-
-═══════════════════════════════════════════════════════════
-ПРИМЕРЫ ТВОИХ ОРИГИНАЛЬНЫХ ПОСТОВ:
-═══════════════════════════════════════════════════════════
-
-{examples_text}
-
 ═══════════════════════════════════════════════════════════
 ТЕПЕРЬ НАПИШИ 3 ПОСТА НА ТЕМУ: "{topic}"
 ═══════════════════════════════════════════════════════════
@@ -369,28 +421,59 @@ def generate_posts_task(style_data: Dict, topic: str) -> Dict:
 
 НАЧИНАЙ:"""
 
-        # Use Gemini Pro for generation (better quality than Flash)
-        response = gemini_model.generate_content(
-            contents=[{"role": "user", "parts": [{"text": prompt}]}],
+        streamer = MessageStreamer.from_target(stream_to, transform=_variants_preview)
+        response = style_prompt_cache.generate(
+            STYLE_MODEL,
+            build_style_prefix(channel),
+            prompt,
             generation_config=genai.types.GenerationConfig(
                 temperature=0.95,  # High creativity but controlled
                 top_p=0.95,
                 top_k=64,
                 max_output_tokens=4096,
-            )
+            ),
+            stream=True
         )
+        text = stream_gemini(response, streamer)
 
-        variants = response.text.split("---VARIANT---")
+        variants = text.split("---VARIANT---")
         clean_variants = [_clean_html(v.strip()) for v in variants if v.strip()]
 
+        if streamer:
+            streamer.finish("✅ Посты готовы! Выберите вариант ниже 👇")
+
         return {"success": True, "posts": clean_variants[:3]}
 
     except Exception as e:
         return {"error": f"Ошибка генерации: {str(e)}"}
 
 
+# News sources for post ideas
+RUSSIAN_NEWS_FEEDS = feeds_of_type("russian")
+WORLD_NEWS_FEEDS = feeds_of_type("world")
+
+
+def _fetch_feed_items(feed_url: str, news_type: str, limit: int = 8) -> List[Dict]:
+    """Latest items of one feed for post ideas, from the news store (empty list on any error)"""
+    try:
+        return [
+            {
+                "title": item["title"],
+                "summary": item["summary"][:300],
+                "source": item["source"],
+                "url": item["url"],
+                "type": news_type,
+                "cluster": item.get("cluster"),
+                "simhash": item.get("simhash")
+            }
+            for item in news_store.get_feed_items(feed_url, limit)
+        ]
+    except Exception:
+        return []
+
+
 @celery_app.task(name='generate_post_ideas')
-def generate_post_ideas_task(style_data: Dict) -> Dict:
+def generate_post_ideas_task(channel_id: int) -> Dict:
     """
     AI-POWERED POST IDEAS GENERATION WITH LANGUAGE DETECTION
 
@@ -398,124 +481,109 @@ def generate_post_ideas_task(style_data: Dict) -> Dict:
     to generate relevant ideas without repetition
     """
     try:
-        style_summary = style_data.get('style_summary', {})
-        deep_analysis = style_data.get('deep_analysis', '')
-        example_posts = style_data.get('example_posts', [])
+        channel = db.get_channel_by_id(channel_id)
+        if not channel:
+            return {"error": "Канал не найден"}
+        style_prefix = build_style_prefix(channel)
 
         # Step 1: Detect channel language and extract themes
-        language_and_themes_prompt = f"""На основе этого анализа канала определи:
+        language_and_themes_prompt = """На основе анализа стиля и примеров постов выше определи:
 1. ЯЗЫК канала (русский/английский/другой)
 2. 3-5 КЛЮЧЕВЫХ ТЕМ канала
-
-АНАЛИЗ КАНАЛА:
-{deep_analysis[:2000]}
-
-ПРИМЕРЫ ПОСТОВ:
-{chr(10).join(example_posts[:3])}
+3. 5-10 КЛЮЧЕВЫХ СЛОВ тематики на английском (для поиска по мировым новостям)
 
 Верни в формате JSON:
-{{
+{
   "language": "русский" или "английский",
-  "themes": ["тема1", "тема2", "тема3"]
-}}
+  "themes": ["тема1", "тема2", "тема3"],
+  "keywords_en": ["keyword1", "keyword2", "keyword3"]
+}
 """
 
-        lang_themes_response = gemini_model.generate_content(
-            contents=[{"role": "user", "parts": [{"text": language_and_themes_prompt}]}],
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.3,
-                response_mime_type="application/json"
+        # Step 2: Analyze recent posts to extract covered topics
+        recent_topics_prompt = """Проанализируй примеры постов выше и извлеки ТЕМЫ, о которых они написаны.
+
+Верни ТОЛЬКО список тем через запятую, без номеров.
+Пример: "новый AI от Google, регулирование криптовалют, запуск стартапа"
+"""
+
+        def detect_language_and_themes():
+            response = style_prompt_cache.generate(
+                STYLE_MODEL,
+                style_prefix,
+                language_and_themes_prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=0.3,
+                    response_mime_type="application/json"
+                )
             )
-        )
+            return json.loads(response.text)
+
+        def extract_recent_topics():
+            response = style_prompt_cache.generate(
+                STYLE_MODEL,
+                style_prefix,
+                recent_topics_prompt,
+                generation_config=genai.types.GenerationConfig(temperature=0.3)
+            )
+            return response.text.strip()
 
-        lang_data = json.loads(lang_themes_response.text)
-        channel_language = lang_data.get("language", "английский")
-        channel_themes = ", ".join(lang_data.get("themes", []))
-
-        # Step 2: Fetch news based on language
-        russian_news = []
-        world_news = []
-
-        if "рус" in channel_language.lower():
-            # Russian news sources
-            russian_feeds = [
-                "https://lenta.ru/rss",
-                "https://habr.com/ru/rss/all/all/",
-                "https://vc.ru/rss/all",
-                "https://tass.ru/rss/v2.xml"
-            ]
-
-            for feed_url in russian_feeds:
-                try:
-                    feed = feedparser.parse(feed_url)
-                    for entry in feed.entries[:8]:
-                        russian_news.append({
-                            "title": entry.get("title", ""),
-                            "summary": entry.get("summary", "")[:300],
-                            "source": feed.feed.get("title", "RSS"),
-                            "url": entry.get("link", ""),
-                            "type": "russian"
-                        })
-                except:
-                    continue
-
-        # World news sources
-        world_feeds = [
-            "https://techcrunch.com/feed/",
-            "https://www.theverge.com/rss/index.xml",
-            "https://cointelegraph.com/rss",
-            "https://www.socialmediatoday.com/rss.xml",
-            "https://feeds.bbci.co.uk/news/technology/rss.xml"
-        ]
+        # Step 3: Run both LLM calls and all feed fetches concurrently.
+        # Russian feeds only matter for Russian channels, but fetching them
+        # speculatively is cheaper than waiting for the language first.
+        pool = ThreadPoolExecutor(max_workers=2 + len(RUSSIAN_NEWS_FEEDS) + len(WORLD_NEWS_FEEDS))
+        try:
+            lang_future = pool.submit(detect_language_and_themes)
+            topics_future = pool.submit(extract_recent_topics)
+            russian_futures = [pool.submit(_fetch_feed_items, url, "russian") for url in RUSSIAN_NEWS_FEEDS]
+            world_futures = [pool.submit(_fetch_feed_items, url, "world") for url in WORLD_NEWS_FEEDS]
 
-        for feed_url in world_feeds:
-            try:
-                feed = feedparser.parse(feed_url)
-                for entry in feed.entries[:8]:
-                    world_news.append({
-                        "title": entry.get("title", ""),
-                        "summary": entry.get("summary", "")[:300],
-                        "source": feed.feed.get("title", "RSS"),
-                        "url": entry.get("link", ""),
-                        "type": "world"
-                    })
-            except:
-                continue
+            lang_data = lang_future.result()
+            channel_language = lang_data.get("language", "английский")
+            channel_themes = ", ".join(lang_data.get("themes", []))
 
-        all_news = russian_news + world_news
+            russian_news = []
+            if "рус" in channel_language.lower():
+                for future in russian_futures:
+                    russian_news.extend(future.result())
 
-        if not all_news:
-            return {"error": "Не удалось загрузить новости"}
+            world_news = []
+            for future in world_futures:
+                world_news.extend(future.result())
 
-        # Step 3: Analyze recent posts to extract covered topics
-        recent_topics_prompt = f"""Проанализируй эти посты и извлеки ТЕМЫ, о которых они написаны.
+            recent_topics = topics_future.result()
+        finally:
+            # Don't wait for speculative fetches nobody needs
+            pool.shutdown(wait=False, cancel_futures=True)
 
-НЕДАВНИЕ ПОСТЫ:
-{chr(10).join([f"- {post[:200]}" for post in example_posts[:10]])}
+        # One item per story, whichever feeds carried it
+        all_news = news_dedup.collapse(russian_news + world_news)
+        russian_news = [news for news in all_news if news["type"] == "russian"]
+        world_news = [news for news in all_news if news["type"] == "world"]
 
-Верни ТОЛЬКО список тем через запятую, без номеров.
-Пример: "новый AI от Google, регулирование криптовалют, запуск стартапа"
-"""
+        if not all_news:
+            return {"error": "Не удалось загрузить новости"}
 
-        topics_response = gemini_model.generate_content(
-            contents=[{"role": "user", "parts": [{"text": recent_topics_prompt}]}],
-            generation_config=genai.types.GenerationConfig(temperature=0.3)
+        # Step 4: Keep only the news most relevant to the channel (local BM25)
+        query = news_ranking.channel_query(
+            lang_data.get("themes", []) + lang_data.get("keywords_en", []),
+            channel.get("deep_analysis") or ""
         )
+        russian_news = news_ranking.top_k(russian_news, query, IDEAS_NEWS_TOP_K)
+        world_news = news_ranking.top_k(world_news, query, IDEAS_NEWS_TOP_K)
 
-        recent_topics = topics_response.text.strip()
-
-        # Step 4: Format news for AI
+        # Step 5: Format news for AI
         russian_news_text = "\n\n".join([
             f"[РФ] {news['title']}\n  {news['summary']}"
-            for news in russian_news[:20]
+            for news in russian_news
         ])
 
         world_news_text = "\n\n".join([
             f"[МИРОВАЯ] {news['title']}\n  {news['summary']}"
-            for news in world_news[:20]
+            for news in world_news
         ])
 
-        # Step 5: Generate ideas with structure
+        # Step 6: Generate ideas with structure
         ideas_prompt = f"""Ты — эксперт по контент-маркетингу для Telegram канала.
 
 ЯЗЫК КАНАЛА: {channel_language}
@@ -555,12 +623,13 @@ def generate_post_ideas_task(style_data: Dict) -> Dict:
 Верни ТОЛЬКО валидный JSON массив с 5 идеями, без дополнительного текста.
 """
 
-        ideas_response = gemini_model.generate_content(
+        ideas_response = providers.gemini().generate_content(
             contents=[{"role": "user", "parts": [{"text": ideas_prompt}]}],
             generation_config=genai.types.GenerationConfig(
                 temperature=0.8,
                 response_mime_type="application/json"
-            )
+            ),
+            request_options=providers.GEMINI_REQUEST_OPTIONS
         )
 
         ideas = json.loads(ideas_response.text)
@@ -572,39 +641,55 @@ def generate_post_ideas_task(style_data: Dict) -> Dict:
         return {"error": f"Ошибка генерации идей: {str(e)}\n{traceback.format_exc()}"}
 
 
+@celery_app.task(name='ingest_news')
+def ingest_news_task() -> Dict:
+    """Poll all RSS feeds into the news store (run periodically by Celery beat)"""
+    try:
+        results = news_store.ingest_all()
+        return {
+            "success": True,
+            "feeds": len(results),
+            "failed": sum(1 for count in results.values() if count < 0),
+            "items": sum(count for count in results.values() if count > 0)
+        }
+    except Exception as e:
+        return {"error": f"News ingest error: {str(e)}"}
+
+
+@celery_app.task(name='purge_blobs')
+def purge_blobs_task() -> Dict:
+    """Delete expired files of the local blob store (run periodically by Celery beat)"""
+    try:
+        store = get_blob_store()
+        # Redis expires blobs by itself
+        removed = store.purge_expired() if isinstance(store, LocalBlobStore) else 0
+        return {"success": True, "removed": removed}
+    except Exception as e:
+        return {"error": f"Blob purge error: {str(e)}"}
+
+
 @celery_app.task(name='fetch_news')
 def fetch_news_task(category: str = None, keywords: List[str] = None) -> Dict:
     """Fetch news from various sources - ASYNC"""
     try:
         news_items = []
 
-        # RSS feeds by category
-        rss_feeds = {
-            "tech": ["https://techcrunch.com/feed/", "https://www.theverge.com/rss/index.xml"],
-            "crypto": ["https://cointelegraph.com/rss"],
-            "marketing": ["https://www.socialmediatoday.com/rss.xml"],
-            "business": ["https://feeds.bbci.co.uk/news/business/rss.xml"]
-        }
-
-        feeds = rss_feeds.get(category, rss_feeds["tech"])
-
-        for feed_url in feeds:
-            try:
-                feed = feedparser.parse(feed_url)
-                for entry in feed.entries[:5]:
-                    published_at = datetime.now()
-                    if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                        published_at = datetime(*entry.published_parsed[:6])
-
-                    news_items.append({
-                        "title": entry.get("title", ""),
-                        "content": entry.get("summary", "")[:500],
-                        "source": feed.feed.get("title", "RSS"),
-                        "url": entry.get("link", ""),
-                        "published_at": published_at.isoformat()
-                    })
-            except:
-                continue
+        # RSS entries come pre-fetched from the news store
+        if category not in CATEGORIES:
+            category = "tech"
+        try:
+            for item in news_store.get_category_items(category, limit_per_feed=5):
+                news_items.append({
+                    "title": item["title"],
+                    "content": item["summary"],
+                    "source": item["source"],
+                    "url": item["url"],
+                    "published_at": item["published_at"],
+                    "cluster": item.get("cluster"),
+                    "simhash": item.get("simhash")
+                })
+        except Exception as e:
+            print(f"Warning: News store unavailable: {e}")
 
         # News API if available and keywords provided
         if NEWS_API_KEY and keywords:
@@ -636,12 +721,14 @@ def fetch_news_task(category: str = None, keywords: List[str] = None) -> Dict:
             except:
                 pass
 
-        # Sort by date and remove duplicates
+        # Keep one item per story (same URL or near-duplicate text)
         seen_urls = set()
         unique_news = []
-        for news in news_items:
+        for news in news_dedup.collapse(news_items):
             if news['url'] not in seen_urls:
                 seen_urls.add(news['url'])
+                news.pop("cluster", None)
+                news.pop("simhash", None)
                 unique_news.append(news)
 
         return {"success": True, "news": unique_news[:10]}
@@ -651,23 +738,19 @@ def fetch_news_task(category: str = None, keywords: List[str] = None) -> Dict:
 
 
 @celery_app.task(name='generate_post_from_news')
-def generate_post_from_news_task(style_data: Dict, news_item: Dict) -> Dict:
-    """Generate post from news with AI style matching"""
+def generate_post_from_news_task(channel_id: int, news_item: Dict) -> Dict:
+    """Generate post from news with AI style matching (cached style prefix)"""
     try:
-        # Extract data
-        style_summary = style_data.get('style_summary', {})
-        deep_analysis = style_data.get('deep_analysis', '')
-        example_posts = style_data.get('example_posts', [])
+        channel = db.get_channel_by_id(channel_id)
+        if not channel:
+            return {"error": "Channel not found"}
 
+        style_summary = channel.get('style_summary') or {}
         avg_words = style_summary.get("average_word_count", 100)
         avg_sentences = style_summary.get("average_sentence_count", 5)
         avg_emojis = style_summary.get("average_emoji_count", 0)
 
-        # Select examples
-        selected_examples = example_posts[:5] if len(example_posts) > 5 else example_posts
-        examples_text = "\n\n━━━━━ ПРИМЕР ━━━━━\n\n".join(selected_examples)
-
-        prompt = f"""Ты — автор Telegram канала. Напиши 3 варианта поста на основе этой новости:
+        prompt = f"""Напиши 3 варианта поста на основе этой новости:
 
 НОВОСТЬ:
 Заголовок: {news_item['title']}
@@ -675,18 +758,6 @@ def generate_post_from_news_task(style_data: Dict, news_item: Dict) -> Dict:
 Источник: {news_item['source']}
 Ссылка: {news_item['url']}
 
-═══════════════════════════════════════════════════════════
-ТВОЙ СТИЛЬ (АНАЛИЗ):
-═══════════════════════════════════════════════════════════
-
-{deep_analysis[:2000]}  # First 2000 chars of analysis
-
-═══════════════════════════════════════════════════════════
-ПРИМЕРЫ ТВОИХ ПОСТОВ:
-═══════════════════════════════════════════════════════════
-
-{examples_text}
-
 ═══════════════════════════════════════════════════════════
 
 ЗАДАЧА:
@@ -701,8 +772,10 @@ def generate_post_from_news_task(style_data: Dict, news_item: Dict) -> Dict:
 
 НАЧИНАЙ:"""
 
-        response = gemini_model.generate_content(
-            contents=[{"role": "user", "parts": [{"text": prompt}]}],
+        response = style_prompt_cache.generate(
+            STYLE_MODEL,
+            build_style_prefix(channel),
+            prompt,
             generation_config=genai.types.GenerationConfig(
                 temperature=0.9,
                 top_p=0.95,
@@ -727,7 +800,7 @@ def generate_image_task(prompt: str, provider: str = "flux_schnell", size: str =
         english_prompt = translate_to_english(prompt)
         if provider == "dalle" and OPENAI_API_KEY:
             # DALL-E 3 - Premium quality
-            response = openai_client.images.generate(
+            response = providers.openai_client().images.generate(
                 model="dall-e-3",
                 prompt=english_prompt,
                 n=1,
@@ -738,13 +811,13 @@ def generate_image_task(prompt: str, provider: str = "flux_schnell", size: str =
             image_url = response.data[0].url
             img_response = requests.get(image_url, timeout=30)
             img_bytes = img_response.content
-            img_b64 = base64.b64encode(img_bytes).decode('utf-8')
+            image_ref = get_blob_store().put(img_bytes)
 
-            return {"success": True, "image": img_b64, "provider": "dalle"}
+            return {"success": True, "image_ref": image_ref, "provider": "dalle"}
 
         elif provider == "sdxl" and REPLICATE_API_KEY:
             # Stable Diffusion XL - Classic, best for photorealism
-            output = replicate.run(
+            output = providers.run_replicate(
                 "stability-ai/sdxl:39ed52f2a78e934b3ba6e2a89f5b1c712de7dfea535525255b1aa35c5565e08b",
                 input={
                     "prompt": english_prompt,
@@ -758,13 +831,13 @@ def generate_image_task(prompt: str, provider: str = "flux_schnell", size: str =
             output_url = output[0] if isinstance(output, list) else output
             response = requests.get(output_url, timeout=60)
             img_bytes = response.content
-            img_b64 = base64.b64encode(img_bytes).decode('utf-8')
+            image_ref = get_blob_store().put(img_bytes)
 
-            return {"success": True, "image": img_b64, "provider": "sdxl"}
+            return {"success": True, "image_ref": image_ref, "provider": "sdxl"}
 
         elif provider == "flux_schnell" and REPLICATE_API_KEY:
             # Flux Schnell - Fast and high quality (2025 version)
-            output = replicate.run(
+            output = providers.run_replicate(
                 "black-forest-labs/flux-schnell:c846a69991daf4c0e5d016514849d14ee5b2e6846ce6b9d6f21369e564cfe51e",
                 input={
                     "prompt": english_prompt,
@@ -778,13 +851,13 @@ def generate_image_task(prompt: str, provider: str = "flux_schnell", size: str =
             output_url = output[0] if isinstance(output, list) else output
             response = requests.get(output_url, timeout=60)
             img_bytes = response.content
-            img_b64 = base64.b64encode(img_bytes).decode('utf-8')
+            image_ref = get_blob_store().put(img_bytes)
 
-            return {"success": True, "image": img_b64, "provider": "flux_schnell"}
+            return {"success": True, "image_ref": image_ref, "provider": "flux_schnell"}
 
         elif provider == "ideogram" and REPLICATE_API_KEY:
             # Ideogram v2 Turbo - Best for text and logos (2025 version)
-            output = replicate.run(
+            output = providers.run_replicate(
                 "ideogram-ai/ideogram-v2-turbo:7cef9d520d672bb802588ad0d13151bc51aee9a408c270aebf25d6530045dd29",
                 input={
                     "prompt": english_prompt,
@@ -796,20 +869,21 @@ def generate_image_task(prompt: str, provider: str = "flux_schnell", size: str =
             output_url = output if isinstance(output, str) else output[0]
             response = requests.get(output_url, timeout=60)
             img_bytes = response.content
-            img_b64 = base64.b64encode(img_bytes).decode('utf-8')
+            image_ref = get_blob_store().put(img_bytes)
 
-            return {"success": True, "image": img_b64, "provider": "ideogram"}
+            return {"success": True, "image_ref": image_ref, "provider": "ideogram"}
 
         elif provider == "nano_banana" and GEMINI_API_KEY:
             # Gemini 2.5 Flash Image (Nano Banana) - Google's image generation
-            response = gemini_image_model.generate_content(
+            response = providers.gemini(IMAGE_MODEL).generate_content(
                 english_prompt,
                 generation_config=genai.GenerationConfig(
                     temperature=1.0,
                     top_p=0.95,
                     top_k=40,
                     max_output_tokens=8192,
-                )
+                ),
+                request_options=providers.GEMINI_REQUEST_OPTIONS
             )
 
             # Gemini 2.5 Flash Image returns image data
@@ -817,8 +891,8 @@ def generate_image_task(prompt: str, provider: str = "flux_schnell", size: str =
                 for part in response.parts:
                     if hasattr(part, 'inline_data') and part.inline_data:
                         img_bytes = part.inline_data.data
-                        img_b64 = base64.b64encode(img_bytes).decode('utf-8')
-                        return {"success": True, "image": img_b64, "provider": "nano_banana"}
+                        image_ref = get_blob_store().put(img_bytes)
+                        return {"success": True, "image_ref": image_ref, "provider": "nano_banana"}
 
             return {"error": "No image generated by Nano Banana"}
 
@@ -832,14 +906,14 @@ def generate_image_task(prompt: str, provider: str = "flux_schnell", size: str =
 
 
 @celery_app.task(name='edit_image')
-def edit_image_task(image_b64: str, instruction: str) -> Dict:
+def edit_image_task(image_ref: str, instruction: str) -> Dict:
     """Edit image with Gemini 2.5 Flash Image (Nano Banana) - ASYNC"""
     try:
         if not GEMINI_API_KEY:
             return {"error": "GEMINI_API_KEY not set"}
 
-        # Decode image
-        image_bytes = base64.b64decode(image_b64)
+        # Load image
+        image_bytes = read_media(image_ref)
 
         # Save to temporary file for PIL
         import tempfile
@@ -853,7 +927,7 @@ def edit_image_task(image_b64: str, instruction: str) -> Dict:
             image = PILImage.open(temp_path)
 
             # Use Gemini 2.5 Flash Image for editing
-            response = gemini_image_model.generate_content(
+            response = providers.gemini(IMAGE_MODEL).generate_content(
                 [
                     f"Transform this image: {instruction}. Maintain the overall composition but apply the requested changes.",
                     image
@@ -863,7 +937,8 @@ def edit_image_task(image_b64: str, instruction: str) -> Dict:
                     top_p=0.95,
                     top_k=40,
                     max_output_tokens=8192,
-                )
+                ),
+                request_options=providers.GEMINI_REQUEST_OPTIONS
             )
 
             # Extract edited image from response
@@ -871,8 +946,8 @@ def edit_image_task(image_b64: str, instruction: str) -> Dict:
                 for part in response.parts:
                     if hasattr(part, 'inline_data') and part.inline_data:
                         result_bytes = part.inline_data.data
-                        result_b64 = base64.b64encode(result_bytes).decode('utf-8')
-                        return {"success": True, "image": result_b64}
+                        result_ref = get_blob_store().put(result_bytes)
+                        return {"success": True, "image_ref": result_ref}
 
             return {"error": "No edited image generated by Nano Banana"}
 
@@ -888,19 +963,20 @@ def edit_image_task(image_b64: str, instruction: str) -> Dict:
 
 
 @celery_app.task(name='remove_watermark')
-def remove_watermark_task(image_b64: str) -> Dict:
+def remove_watermark_task(image_ref: str) -> Dict:
     """Remove watermark from image using AI inpainting - ASYNC"""
     try:
         if not REPLICATE_API_KEY:
             return {"error": "REPLICATE_API_KEY not set"}
 
-        # Decode image
-        image_bytes = base64.b64decode(image_b64)
+        # Load image
+        image_bytes = read_media(image_ref)
+        image_b64 = base64.b64encode(image_bytes).decode('utf-8')
         image_data_uri = f"data:image/png;base64,{image_b64}"
 
         # Use LaMa inpainting model for watermark removal
         # This automatically detects and removes watermarks
-        output = replicate.run(
+        output = providers.run_replicate(
             "cjwbw/lama:7434dcb3e46041a00c9a2f09e72c3aeb9bdb7044eec0fa1df8f2ae19da8cd5aa",
             input={
                 "image": image_data_uri,
@@ -915,10 +991,10 @@ def remove_watermark_task(image_b64: str) -> Dict:
         response = requests.get(output_url, timeout=30)
         result_bytes = response.content
 
-        # Encode back
-        result_b64 = base64.b64encode(result_bytes).decode('utf-8')
+        # Store result
+        result_ref = get_blob_store().put(result_bytes)
 
-        return {"success": True, "image": result_b64}
+        return {"success": True, "image_ref": result_ref}
 
     except Exception as e:
         import traceback
@@ -926,11 +1002,11 @@ def remove_watermark_task(image_b64: str) -> Dict:
 
 
 @celery_app.task(name='add_watermark')
-def add_watermark_task(image_b64: str, text: str) -> Dict:
+def add_watermark_task(image_ref: str, text: str) -> Dict:
     """Add watermark to image - ASYNC (Large size 5x)"""
     try:
-        # Decode image
-        image_bytes = base64.b64decode(image_b64)
+        # Load image
+        image_bytes = read_media(image_ref)
         img = Image.open(BytesIO(image_bytes)).convert("RGBA")
 
         # Create watermark layer
@@ -971,10 +1047,10 @@ def add_watermark_task(image_b64: str, text: str) -> Dict:
         watermarked.convert("RGB").save(output, format="PNG")
         output.seek(0)
 
-        # Encode
-        result_b64 = base64.b64encode(output.getvalue()).decode('utf-8')
+        # Store result
+        result_ref = get_blob_store().put(output.getvalue())
 
-        return {"success": True, "image": result_b64}
+        return {"success": True, "image_ref": result_ref}
 
     except Exception as e:
         import traceback
@@ -982,19 +1058,25 @@ def add_watermark_task(image_b64: str, text: str) -> Dict:
 
 
 @celery_app.task(name='remove_background')
-def remove_background_task(image_b64: str) -> Dict:
-    """Remove background from image using rembg - ASYNC"""
+def remove_background_task(image_ref: str, model: str = None) -> Dict:
+    """Remove background from image using rembg (u2net, u2netp, isnet, ...) - ASYNC"""
     try:
-        # Decode image
-        image_bytes = base64.b64decode(image_b64)
+        try:
+            session = rembg_sessions.get(model)
+        except ValueError as e:
+            return {"error": str(e)}
 
-        # Remove background using rembg
-        output_bytes = remove(image_bytes)
+        # Load image
+        image_bytes = read_media(image_ref)
 
-        # Convert to base64
-        output_b64 = base64.b64encode(output_bytes).decode('utf-8')
+        # Remove background with the process-wide model session
+        from rembg import remove
+        output_bytes = remove(image_bytes, session=session)
 
-        return {"success": True, "image": output_b64}
+        # Store result
+        output_ref = get_blob_store().put(output_bytes)
+
+        return {"success": True, "image_ref": output_ref}
 
     except Exception as e:
         import traceback
@@ -1002,6 +1084,11 @@ def remove_background_task(image_b64: str) -> Dict:
 
 
 # Helper function
+def _variants_preview(text: str) -> str:
+    """Readable separators for variants while they stream in"""
+    return text.replace("---VARIANT---", "━━━━━━━━━━━━━━━")
+
+
 def _clean_html(text: str) -> str:
     """Clean HTML for Telegram"""
     # Remove unsupported tags
@@ -1024,6 +1111,35 @@ def _clean_html(text: str) -> str:
     return text
 
 
+def _openai_speech(text: str, model: str, voice: str, speed: float) -> bytes:
+    """Synthesize speech with OpenAI TTS on the shared client"""
+    response = providers.openai_client().audio.speech.create(
+        model=model,
+        voice=voice,
+        input=text,
+        speed=speed
+    )
+    return response.content
+
+
+def _synthesize_cached(text: str, model: str, voice: str, speed: float, synthesize) -> Tuple[str, bool]:
+    """(audio_ref, cached): a cached voiceover, or synthesize() stored in the blob store and cached"""
+    try:
+        audio_ref = tts_cache.get(text, model, voice, speed)
+    except (redis.RedisError, OSError) as e:
+        print(f"Warning: TTS cache unavailable: {e}")
+        audio_ref = None
+    if audio_ref:
+        return audio_ref, True
+
+    audio_ref = get_blob_store().put(synthesize())
+    try:
+        tts_cache.set(text, model, voice, speed, audio_ref)
+    except redis.RedisError as e:
+        print(f"Warning: Failed to cache TTS audio: {e}")
+    return audio_ref, False
+
+
 @celery_app.task(name='text_to_speech')
 def text_to_speech_task(text: str, voice: str = "neutral") -> Dict:
     """Convert text to speech using OpenAI TTS - ASYNC"""
@@ -1042,21 +1158,13 @@ def text_to_speech_task(text: str, voice: str = "neutral") -> Dict:
 
         openai_voice = voice_map.get(voice, "alloy")
 
-        # Generate speech
-        response = openai_client.audio.speech.create(
-            model="tts-1",
-            voice=openai_voice,
-            input=text,
-            speed=1.0
+        # Generate speech (or reuse an identical earlier voiceover)
+        audio_ref, _ = _synthesize_cached(
+            text, "tts-1", openai_voice, 1.0,
+            lambda: _openai_speech(text, "tts-1", openai_voice, 1.0)
         )
 
-        # Get audio bytes
-        audio_bytes = response.content
-
-        # Encode to base64
-        audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
-
-        return {"success": True, "audio": audio_b64}
+        return {"success": True, "audio_ref": audio_ref}
 
     except Exception as e:
         import traceback
@@ -1064,39 +1172,19 @@ def text_to_speech_task(text: str, voice: str = "neutral") -> Dict:
 
 
 @celery_app.task(name='transcribe_audio')
-def transcribe_audio_task(audio_b64: str) -> Dict:
-    """Transcribe audio/video to text using OpenAI Whisper - ASYNC"""
+def transcribe_audio_task(audio_ref: str) -> Dict:
+    """Transcribe audio/video to text using OpenAI Whisper - ASYNC (long files in parallel chunks)"""
     try:
         if not OPENAI_API_KEY:
             return {"error": "OPENAI_API_KEY not set"}
 
-        # Decode audio
-        audio_bytes = base64.b64decode(audio_b64)
+        # Get a local file (Telegram uploads are streamed straight to disk);
+        # ffmpeg detects the real container, the suffix only matters without it
+        with media_file(audio_ref, default_suffix=".mp3") as temp_path:
+            # Split on pauses and transcribe the chunks with Whisper in parallel
+            result = transcribe(temp_path, language="ru")  # Auto-detect if None, or specify "ru" or "en"
 
-        # Save to temporary file
-        import tempfile
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-            temp_file.write(audio_bytes)
-            temp_path = temp_file.name
-
-        try:
-            # Transcribe with Whisper
-            with open(temp_path, "rb") as audio_file:
-                transcript = openai_client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="ru"  # Auto-detect if None, or specify "ru" or "en"
-                )
-
-            text = transcript.text
-
-            return {"success": True, "text": text}
-
-        finally:
-            # Clean up temp file
-            import os
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        return {"success": True, **result}
 
     except Exception as e:
         import traceback
@@ -1116,7 +1204,7 @@ def generate_video_task(prompt: str, model: str = "minimax") -> Dict:
         # Text-to-video models (2025 - Modern alternatives)
         if model == "sora2":
             # OpenAI Sora 2 - Flagship video generation with synced audio
-            output = replicate.run(
+            output = providers.run_replicate(
                 "openai/sora-2:6dd6f49244af4fc3cc2de9b65ab589e85870035dba05329d21c434e9172f0143",
                 input={
                     "prompt": english_prompt
@@ -1125,7 +1213,7 @@ def generate_video_task(prompt: str, model: str = "minimax") -> Dict:
 
         elif model == "veo3":
             # Google Veo 3.1 - Higher-fidelity video, context-aware audio
-            output = replicate.run(
+            output = providers.run_replicate(
                 "google/veo-3.1:20ebd92c5919f20e8fa2e983bdb60016a99794c9accfab496ea25a68e0dbbaad",
                 input={
                     "prompt": english_prompt
@@ -1134,7 +1222,7 @@ def generate_video_task(prompt: str, model: str = "minimax") -> Dict:
 
         elif model == "minimax":
             # Minimax Video-01 - High quality, realistic motion
-            output = replicate.run(
+            output = providers.run_replicate(
                 "minimax/video-01:5aa835260ff7f40f4069c41185f72036accf99e29957bb4a3b3a911f3b6c1912",
                 input={
                     "prompt": english_prompt
@@ -1143,7 +1231,7 @@ def generate_video_task(prompt: str, model: str = "minimax") -> Dict:
 
         elif model == "ltx":
             # LTX-Video - Fast, DiT-based, 24 FPS at 768x512
-            output = replicate.run(
+            output = providers.run_replicate(
                 "lightricks/ltx-video:8c47da666861d081eeb4d1261853087de23923a268a69b63febdf5dc1dee08e4",
                 input={
                     "prompt": english_prompt,
@@ -1154,7 +1242,7 @@ def generate_video_task(prompt: str, model: str = "minimax") -> Dict:
 
         elif model == "animate_diff":
             # AnimateDiff - Classic model (fallback option)
-            output = replicate.run(
+            output = providers.run_replicate(
                 "lucataco/animate-diff:beecf59c4aee8d81bf04f0381033dfa10dc16e845b4ae00d281e2fa377e48a9f",
                 input={
                     "prompt": english_prompt,
@@ -1171,9 +1259,9 @@ def generate_video_task(prompt: str, model: str = "minimax") -> Dict:
         video_url = output if isinstance(output, str) else output[0]
         response = requests.get(video_url, timeout=180)
         video_bytes = response.content
-        video_b64 = base64.b64encode(video_bytes).decode('utf-8')
+        video_ref = get_blob_store().put(video_bytes)
 
-        return {"success": True, "video": video_b64}
+        return {"success": True, "video_ref": video_ref}
 
     except Exception as e:
         import traceback
@@ -1181,19 +1269,20 @@ def generate_video_task(prompt: str, model: str = "minimax") -> Dict:
 
 
 @celery_app.task(name='image_to_video')
-def image_to_video_task(image_b64: str, model: str = "svd") -> Dict:
+def image_to_video_task(image_ref: str, model: str = "svd") -> Dict:
     """Generate video from image using AI - ASYNC (Updated 2025)"""
     try:
         if not REPLICATE_API_KEY:
             return {"error": "REPLICATE_API_KEY not set"}
 
-        # Convert base64 to data URI
+        # Convert image to data URI
+        image_b64 = base64.b64encode(read_media(image_ref)).decode('utf-8')
         image_data_uri = f"data:image/png;base64,{image_b64}"
 
         # Image-to-video models (2025 versions)
         if model == "svd":
             # Stable Video Diffusion - Classic, reliable (2025 version)
-            output = replicate.run(
+            output = providers.run_replicate(
                 "stability-ai/stable-video-diffusion:3f0457e4619daac51203dedb472816fd4af51f3149fa7a9e0b5ffcf1b8172438",
                 input={
                     "cond_aug": 0.02,
@@ -1208,7 +1297,7 @@ def image_to_video_task(image_b64: str, model: str = "svd") -> Dict:
 
         elif model == "svd_xt":
             # Stable Video Diffusion XL - Extended, higher quality
-            output = replicate.run(
+            output = providers.run_replicate(
                 "stability-ai/stable-video-diffusion:3f0457e4619daac51203dedb472816fd4af51f3149fa7a9e0b5ffcf1b8172438",
                 input={
                     "cond_aug": 0.02,
@@ -1223,7 +1312,7 @@ def image_to_video_task(image_b64: str, model: str = "svd") -> Dict:
 
         elif model == "svd_enhanced":
             # Stable Video Diffusion - Enhanced motion
-            output = replicate.run(
+            output = providers.run_replicate(
                 "stability-ai/stable-video-diffusion:3f0457e4619daac51203dedb472816fd4af51f3149fa7a9e0b5ffcf1b8172438",
                 input={
                     "cond_aug": 0.02,
@@ -1243,9 +1332,9 @@ def image_to_video_task(image_b64: str, model: str = "svd") -> Dict:
         video_url = output if isinstance(output, str) else output[0]
         response = requests.get(video_url, timeout=180)
         video_bytes = response.content
-        video_b64 = base64.b64encode(video_bytes).decode('utf-8')
+        video_ref = get_blob_store().put(video_bytes)
 
-        return {"success": True, "video": video_b64}
+        return {"success": True, "video_ref": video_ref}
 
     except Exception as e:
         import traceback
@@ -1257,32 +1346,9 @@ def image_to_video_task(image_b64: str, model: str = "svd") -> Dict:
 # ═══════════════════════════════════════════════════════════
 
 def translate_to_english(text: str) -> str:
-    """Translate text to English using Gemini (synchronous helper)"""
+    """Translate text to English using Gemini (synchronous helper, cached)"""
     try:
-        # Detect if text is already in English (simple heuristic)
-        # If text contains mostly Latin characters, assume it's English
-        latin_chars = sum(1 for c in text if ord(c) < 128)
-        if latin_chars / len(text) > 0.8:
-            return text  # Already in English
-
-        # Use Gemini for translation
-        translation_prompt = f"""Translate the following text to English.
-Return ONLY the translation, nothing else.
-
-Text to translate:
-{text}"""
-
-        response = gemini_model.generate_content(
-            contents=[{"role": "user", "parts": [{"text": translation_prompt}]}],
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.3,  # Low temperature for accurate translation
-                max_output_tokens=2048,
-            )
-        )
-
-        translated = response.text.strip()
-        return translated
-
+        return translate(text, "en")
     except Exception as e:
         # If translation fails, return original text
         return text
@@ -1295,37 +1361,7 @@ def translate_text_task(text: str, target_language: str = "en") -> Dict:
         if not GEMINI_API_KEY:
             return {"error": "GEMINI_API_KEY not set"}
 
-        # Language names mapping
-        lang_names = {
-            "en": "English",
-            "ru": "Russian",
-            "es": "Spanish",
-            "fr": "French",
-            "de": "German",
-            "it": "Italian",
-            "pt": "Portuguese",
-            "zh": "Chinese",
-            "ja": "Japanese",
-            "ko": "Korean"
-        }
-
-        target_lang_name = lang_names.get(target_language, target_language)
-
-        translation_prompt = f"""Translate the following text to {target_lang_name}.
-Return ONLY the translation, nothing else. Maintain the tone and style.
-
-Text to translate:
-{text}"""
-
-        response = gemini_model.generate_content(
-            contents=[{"role": "user", "parts": [{"text": translation_prompt}]}],
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.3,
-                max_output_tokens=2048,
-            )
-        )
-
-        translated = response.text.strip()
+        translated = translate(text, target_language, assume_english=False)
 
         return {"success": True, "translated_text": translated}
 
@@ -1338,9 +1374,17 @@ Text to translate:
 # ADVANCED TTS WITH MULTIPLE MODELS AND VOICES (2025)
 # ═══════════════════════════════════════════════════════════
 
+# Replicate TTS models: model name -> (Replicate model, input field for the voice)
+REPLICATE_TTS_MODELS = {
+    "minimax_turbo": ("minimax/speech-02-turbo", "voice_id"),  # Fast, multilingual
+    "minimax_hd": ("minimax/speech-02-hd", "voice_id"),  # High quality, multilingual
+    "kokoro": ("jaaari/kokoro-82m", "voice"),  # 82M params, efficient
+}
+
+
 @celery_app.task(name='advanced_tts')
-def advanced_tts_task(text: str, model: str = "openai", voice: str = "alloy") -> Dict:
-    """Advanced Text-to-Speech with multiple models and 50+ voices - ASYNC"""
+def advanced_tts_task(text: str, model: str = "openai", voice: str = "alloy", speed: float = 1.0) -> Dict:
+    """Advanced Text-to-Speech with multiple models and 50+ voices - ASYNC (repeats served from the TTS cache)"""
     try:
         # OpenAI TTS (6 voices)
         if model == "openai":
@@ -1348,72 +1392,44 @@ def advanced_tts_task(text: str, model: str = "openai", voice: str = "alloy") ->
                 return {"error": "OPENAI_API_KEY not set"}
 
             # OpenAI voices: alloy, echo, fable, onyx, nova, shimmer
-            response = openai_client.audio.speech.create(
-                model="tts-1-hd",  # High quality
-                voice=voice,
-                input=text,
-                speed=1.0
-            )
-
-            audio_bytes = response.content
-            audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
-
-            return {"success": True, "audio": audio_b64, "model": "openai", "voice": voice}
-
-        # Minimax Speech-02 Turbo (fast, multilingual)
-        elif model == "minimax_turbo" and REPLICATE_API_KEY:
-            output = replicate.run(
-                "minimax/speech-02-turbo",
-                input={
-                    "text": text,
-                    "voice_id": voice  # Supports various voice IDs
-                }
-            )
-
-            # Download audio
-            audio_url = output if isinstance(output, str) else output[0]
-            response = requests.get(audio_url, timeout=60)
-            audio_bytes = response.content
-            audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
-
-            return {"success": True, "audio": audio_b64, "model": "minimax_turbo", "voice": voice}
-
-        # Minimax Speech-02 HD (high quality, multilingual)
-        elif model == "minimax_hd" and REPLICATE_API_KEY:
-            output = replicate.run(
-                "minimax/speech-02-hd",
-                input={
-                    "text": text,
-                    "voice_id": voice
-                }
-            )
-
-            audio_url = output if isinstance(output, str) else output[0]
-            response = requests.get(audio_url, timeout=60)
-            audio_bytes = response.content
-            audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
-
-            return {"success": True, "audio": audio_b64, "model": "minimax_hd", "voice": voice}
+            provider_model = "tts-1-hd"  # High quality
+
+            def synthesize():
+                return _openai_speech(text, provider_model, voice, speed)
+
+        # Replicate models
+        elif model in REPLICATE_TTS_MODELS and REPLICATE_API_KEY:
+            provider_model, voice_field = REPLICATE_TTS_MODELS[model]
+
+            def synthesize():
+                output = providers.run_replicate(
+                    provider_model,
+                    input={
+                        "text": text,
+                        voice_field: voice,
+                        "speed": speed
+                    }
+                )
 
-        # Kokoro TTS (82M params, efficient)
-        elif model == "kokoro" and REPLICATE_API_KEY:
-            output = replicate.run(
-                "jaaari/kokoro-82m",
-                input={
-                    "text": text,
-                    "voice": voice  # Supports multiple voices
-                }
-            )
+                # Download audio
+                audio_url = output if isinstance(output, str) else output[0]
+                response = providers.http_session().get(audio_url, timeout=60)
+                response.raise_for_status()
+                return response.content
 
-            audio_url = output if isinstance(output, str) else output[0]
-            response = requests.get(audio_url, timeout=60)
-            audio_bytes = response.content
-            audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
+        else:
+            return {"error": f"Invalid model '{model}' or API key not set. Available: openai, {', '.join(REPLICATE_TTS_MODELS)}"}
 
-            return {"success": True, "audio": audio_b64, "model": "kokoro", "voice": voice}
+        audio_ref, cached = _synthesize_cached(text, provider_model, voice, speed, synthesize)
 
-        else:
-            return {"error": f"Invalid model '{model}' or API key not set. Available: openai, minimax_turbo, minimax_hd, kokoro"}
+        return {
+            "success": True,
+            "audio_ref": audio_ref,
+            "model": model,
+            "voice": voice,
+            "speed": speed,
+            "cached": cached
+        }
 
     except Exception as e:
         import traceback
@@ -1425,12 +1441,40 @@ def advanced_tts_task(text: str, model: str = "openai", voice: str = "alloy") ->
 # ═══════════════════════════════════════════════════════════
 
 @celery_app.task(name='chat_with_ai')
-def chat_with_ai_task(message: str, model: str = "gemini-flash", history: List[Dict] = None) -> Dict:
-    """Chat with AI models - OpenAI, Gemini, Anthropic - ASYNC"""
-    try:
-        if history is None:
+def chat_with_ai_task(message: str, model: str = "gemini-flash", history: List[Dict] = None,
+                      stream_to: Dict = None, user_id: int = None) -> Dict:
+    """
+    Chat with AI models - OpenAI, Gemini, Anthropic - ASYNC (streams into stream_to if given).
+
+    With user_id the conversation history is read from the user's state
+    and the new turn is appended to it atomically once the reply is ready.
+    """
+    if history is None and user_id is not None:
+        try:
+            history = state_manager.get_data(user_id, "chat_history")
+        except Exception as e:
+            # Answer without context rather than not at all
+            print(f"Warning: Failed to read chat history for user {user_id}: {e}")
             history = []
 
+    result = _chat_reply(message, model, history or [], MessageStreamer.from_target(stream_to))
+
+    if user_id is not None and result.get("success"):
+        try:
+            state_manager.append_to_list(
+                user_id, "chat_history",
+                [{"role": "user", "content": message}, {"role": "assistant", "content": result["response"]}],
+                CHAT_HISTORY_MAX_MESSAGES
+            )
+        except Exception as e:
+            print(f"Warning: Failed to save chat history for user {user_id}: {e}")
+
+    return result
+
+
+def _chat_reply(message: str, model: str, history: List[Dict], streamer: Optional[MessageStreamer]) -> Dict:
+    """Generate a chat reply with the chosen model, feeding the streamer"""
+    try:
         # OpenAI Chat Models
         if model.startswith("gpt"):
             if not OPENAI_API_KEY:
@@ -1443,20 +1487,34 @@ def chat_with_ai_task(message: str, model: str = "gemini-flash", history: List[D
             messages.append({"role": "user", "content": message})
 
             # Call OpenAI API
-            response = openai_client.chat.completions.create(
+            stream = providers.openai_client().chat.completions.create(
                 model=model,  # gpt-4, gpt-4-turbo, gpt-3.5-turbo
                 messages=messages,
                 temperature=0.7,
-                max_tokens=2048
+                max_tokens=2048,
+                stream=True,
+                stream_options={"include_usage": True}
             )
 
-            reply = response.choices[0].message.content
+            reply = ""
+            tokens_used = None
+            for chunk in stream:
+                if chunk.usage:
+                    tokens_used = chunk.usage.total_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    delta = chunk.choices[0].delta.content
+                    reply += delta
+                    if streamer:
+                        streamer.feed(delta)
+
+            if streamer:
+                streamer.finish()
 
             return {
                 "success": True,
                 "response": reply,
                 "model": model,
-                "tokens_used": response.usage.total_tokens
+                "tokens_used": tokens_used
             }
 
         # Gemini Models
@@ -1466,9 +1524,9 @@ def chat_with_ai_task(message: str, model: str = "gemini-flash", history: List[D
 
             # Select model
             if "pro" in model:
-                chat_model = gemini_pro_model
+                chat_model = providers.gemini(PRO_MODEL)
             else:
-                chat_model = gemini_model  # Default to Flash
+                chat_model = providers.gemini()  # Default to Flash
 
             # Build conversation history
             conversation = []
@@ -1483,10 +1541,14 @@ def chat_with_ai_task(message: str, model: str = "gemini-flash", history: List[D
                 generation_config=genai.types.GenerationConfig(
                     temperature=0.7,
                     max_output_tokens=2048,
-                )
+                ),
+                stream=True,
+                request_options=providers.GEMINI_REQUEST_OPTIONS
             )
 
-            reply = response.text
+            reply = stream_gemini(response, streamer)
+            if streamer:
+                streamer.finish()
 
             return {
                 "success": True,
@@ -1507,7 +1569,7 @@ def chat_with_ai_task(message: str, model: str = "gemini-flash", history: List[D
             prompt += f"User: {message}\n\nAssistant:"
 
             # Call LLaMA model
-            output = replicate.run(
+            output = providers.run_replicate(
                 "meta/llama-2-70b-chat",
                 input={
                     "prompt": prompt,
@@ -1521,6 +1583,10 @@ def chat_with_ai_task(message: str, model: str = "gemini-flash", history: List[D
             reply = ""
             for item in output:
                 reply += str(item)
+                if streamer:
+                    streamer.feed(str(item))
+            if streamer:
+                streamer.finish()
 
             return {
                 "success": True,
@@ -0,0 +1,94 @@
+"""Download Telegram files by file_id from the worker side"""
+import os
+import tempfile
+from typing import Optional
+
+import requests
+
+from core.config import BOT_TOKEN, TELEGRAM_API_URL
+
+TELEGRAM_REF_PREFIX = "tg:"
+
+# Stream downloads in 1 MB chunks
+CHUNK_SIZE = 1024 * 1024
+
+_session: Optional[requests.Session] = None
+
+
+def telegram_ref(file_id: str) -> str:
+    """Reference to a Telegram file that workers can fetch themselves"""
+    return TELEGRAM_REF_PREFIX + file_id
+
+
+def is_telegram_ref(value) -> bool:
+    """Check whether value is a Telegram file reference"""
+    return isinstance(value, str) and value.startswith(TELEGRAM_REF_PREFIX)
+
+
+def file_id_from_ref(ref: str) -> str:
+    """Extract file_id from a Telegram file reference"""
+    if not is_telegram_ref(ref):
+        raise ValueError(f"Not a Telegram file reference: {ref!r}")
+    return ref[len(TELEGRAM_REF_PREFIX):]
+
+
+def get_session() -> requests.Session:
+    """Keep-alive HTTP session to the Bot API (one per worker process)"""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+    return _session
+
+
+def get_file_path(file_id: str) -> str:
+    """Resolve file_id to its path on the Bot API file server"""
+    response = get_session().get(
+        f"{TELEGRAM_API_URL}/bot{BOT_TOKEN}/getFile",
+        params={"file_id": file_id},
+        timeout=30
+    )
+    data = response.json()
+    if not data.get("ok"):
+        raise ValueError(f"Telegram getFile failed: {data.get('description', response.status_code)}")
+    return data["result"]["file_path"]
+
+
+def download_to_tempfile(file_id: str, suffix: str = None, default_suffix: str = ".bin") -> str:
+    """
+    Stream a Telegram file to a temporary file and return its path.
+
+    The suffix defaults to the extension Telegram reports for the file
+    (or default_suffix if it has none).
+    The caller is responsible for removing the file.
+    """
+    file_path = get_file_path(file_id)
+    if suffix is None:
+        suffix = os.path.splitext(file_path)[1] or default_suffix
+
+    fd, temp_path = tempfile.mkstemp(suffix=suffix)
+    try:
+        # Own the descriptor first so it is closed whatever the request does
+        with os.fdopen(fd, "wb") as f, get_session().get(
+            f"{TELEGRAM_API_URL}/file/bot{BOT_TOKEN}/{file_path}",
+            stream=True,
+            timeout=(10, 120)
+        ) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return temp_path
+
+
+def download_bytes(file_id: str) -> bytes:
+    """Download a (small) Telegram file into memory"""
+    temp_path = download_to_tempfile(file_id)
+    try:
+        with open(temp_path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(temp_path)
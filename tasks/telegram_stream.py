@@ -0,0 +1,113 @@
+"""Stream LLM output into a Telegram message with throttled edits"""
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from core.config import BOT_TOKEN, TELEGRAM_API_URL, STREAM_EDIT_INTERVAL
+from tasks.telegram_files import get_session
+
+# Telegram message length limit
+MAX_MESSAGE_LENGTH = 4096
+
+# Longest we wait out a 429 before the final edit
+MAX_FINAL_RETRY_WAIT = 10
+
+
+class MessageStreamer:
+    """
+    Progressively edit a message as text arrives.
+
+    Edits go out at most every `interval` seconds; a 429 pushes the next
+    edit back by retry_after instead of blocking the stream. Text is sent
+    plain (partial HTML would not parse) and, when too long, only its tail
+    is shown. Any other edit failure just disables the preview.
+    """
+
+    def __init__(self, chat_id: int, message_id: int, interval: float = STREAM_EDIT_INTERVAL,
+                 transform: Callable[[str], str] = None):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.interval = interval
+        self.transform = transform
+        self.text = ""
+        self._shown = None
+        self._next_edit = 0.0
+        self._enabled = True
+
+    @classmethod
+    def from_target(cls, stream_to: Optional[Dict], **kwargs) -> Optional["MessageStreamer"]:
+        """Streamer for a {"chat_id", "message_id"} target, or None if not streaming"""
+        if not stream_to:
+            return None
+        return cls(stream_to["chat_id"], stream_to["message_id"], **kwargs)
+
+    def feed(self, delta: str):
+        """Append a chunk and edit the message if the throttle allows"""
+        if not delta:
+            return
+        self.text += delta
+        if self._enabled and time.monotonic() >= self._next_edit:
+            self._edit(self._render(self.text))
+
+    def finish(self, final_text: str = None):
+        """Show the final text (or the full streamed text) regardless of the throttle"""
+        if not self._enabled:
+            return
+        wait = self._next_edit - time.monotonic()
+        if 0 < wait <= MAX_FINAL_RETRY_WAIT:
+            time.sleep(wait)
+        self._edit(self._render(final_text if final_text is not None else self.text))
+
+    def _render(self, text: str) -> str:
+        if self.transform:
+            text = self.transform(text)
+        text = text.strip() or "…"
+        if len(text) > MAX_MESSAGE_LENGTH:
+            text = "…" + text[-(MAX_MESSAGE_LENGTH - 1):]
+        return text
+
+    def _edit(self, text: str):
+        if text == self._shown:
+            return
+        self._next_edit = time.monotonic() + self.interval
+        try:
+            response = get_session().post(
+                f"{TELEGRAM_API_URL}/bot{BOT_TOKEN}/editMessageText",
+                json={
+                    "chat_id": self.chat_id,
+                    "message_id": self.message_id,
+                    "text": text,
+                    "disable_web_page_preview": True
+                },
+                timeout=10
+            )
+            data = response.json()
+        except Exception as e:
+            print(f"Warning: Stream edit failed, disabling preview: {e}")
+            self._enabled = False
+            return
+
+        if data.get("ok"):
+            self._shown = text
+        elif data.get("error_code") == 429:
+            retry_after = data.get("parameters", {}).get("retry_after", 1)
+            self._next_edit = time.monotonic() + retry_after
+        elif "message is not modified" in data.get("description", ""):
+            self._shown = text
+        else:
+            print(f"Warning: Stream edit rejected, disabling preview: {data.get('description')}")
+            self._enabled = False
+
+
+def stream_gemini(response: Iterable, streamer: Optional[MessageStreamer]) -> str:
+    """Consume a Gemini stream=True response, feeding the streamer; return the full text"""
+    text = ""
+    for chunk in response:
+        try:
+            delta = chunk.text
+        except ValueError:
+            # Chunk without text parts (e.g. safety/finish metadata)
+            continue
+        text += delta
+        if streamer:
+            streamer.feed(delta)
+    return text
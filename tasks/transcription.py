@@ -0,0 +1,176 @@
+"""Speech-to-text for long recordings: split on silence, transcribe chunks in parallel"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from core.config import TRANSCRIBE_CHUNK_SECONDS, TRANSCRIBE_PARALLELISM
+from tasks import providers
+
+WHISPER_MODEL = "whisper-1"
+
+# Pauses quieter than this and at least this long are cut candidates
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_DURATION = 0.5
+
+# A chunk is not cut shorter than this share of TRANSCRIBE_CHUNK_SECONDS to hit a pause
+MIN_CHUNK_SHARE = 0.5
+
+# Chunks are re-encoded as mono 16 kHz speech: ~0.5 MB per minute, far below Whisper's 25 MB
+CHUNK_AUDIO_ARGS = ["-vn", "-ac", "1", "-ar", "16000", "-c:a", "libmp3lame", "-b:a", "64k"]
+
+_SILENCE_START_RE = re.compile(r"silence_start: (-?\d+(?:\.\d+)?)")
+_SILENCE_END_RE = re.compile(r"silence_end: (\d+(?:\.\d+)?)")
+_PROGRESS_TIME_RE = re.compile(r"time=(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+def analyze_audio(path: str) -> Tuple[float, List[Tuple[float, float]]]:
+    """
+    Duration (s) and (start, end) pauses of the first audio stream.
+
+    One decoding pass: the duration is the position ffmpeg reached, which
+    also works for containers that do not store it (e.g. voice messages).
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-hide_banner", "-i", path, "-vn",
+         "-af", f"silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_DURATION}",
+         "-f", "null", "-"],
+        capture_output=True, text=True, check=True
+    )
+    silences = []
+    duration = 0.0
+    start = None
+    for line in result.stderr.splitlines():
+        match = _PROGRESS_TIME_RE.search(line)
+        if match:
+            hours, minutes, seconds = match.groups()
+            duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return duration, silences
+
+
+def plan_chunks(duration: float, silences: List[Tuple[float, float]],
+                max_seconds: float = TRANSCRIBE_CHUNK_SECONDS) -> List[Tuple[float, float]]:
+    """
+    Split [0, duration] into (start, end) chunks of at most max_seconds.
+
+    Each cut is placed in the middle of the last pause that keeps the chunk
+    within bounds, so words are not split; without such a pause the chunk
+    is cut at max_seconds.
+    """
+    cuts = [(start + end) / 2 for start, end in silences]
+    chunks = []
+    position = 0.0
+    while duration - position > max_seconds:
+        window_start = position + max_seconds * MIN_CHUNK_SHARE
+        window_end = position + max_seconds
+        candidates = [cut for cut in cuts if window_start <= cut <= window_end]
+        cut = candidates[-1] if candidates else window_end
+        chunks.append((position, cut))
+        position = cut
+    chunks.append((position, duration))
+    return chunks
+
+
+def extract_chunk(path: str, start: float, end: Optional[float], out_path: str):
+    """Cut [start, end) of the audio track (to the end if end is None) into out_path"""
+    length = ["-t", f"{end - start:.3f}"] if end is not None else []
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-v", "error", "-y",
+         "-ss", f"{start:.3f}", *length, "-i", path,
+         *CHUNK_AUDIO_ARGS, out_path],
+        check=True
+    )
+
+
+def _transcribe_file(path: str, language: Optional[str]) -> Dict:
+    """Whisper transcription with segment timestamps"""
+    with open(path, "rb") as audio_file:
+        transcript = providers.openai_client().audio.transcriptions.create(
+            model=WHISPER_MODEL,
+            file=audio_file,
+            language=language,
+            response_format="verbose_json"
+        )
+    segments = [
+        {"start": segment.start, "end": segment.end, "text": segment.text.strip()}
+        for segment in (transcript.segments or [])
+    ]
+    return {"text": transcript.text.strip(), "segments": segments}
+
+
+def _transcribe_chunk(path: str, start: float, end: Optional[float], language: Optional[str]) -> Dict:
+    """Extract one chunk to a temporary file and transcribe it; timestamps are absolute"""
+    fd, chunk_path = tempfile.mkstemp(suffix=".mp3")
+    os.close(fd)
+    try:
+        extract_chunk(path, start, end, chunk_path)
+        result = _transcribe_file(chunk_path, language)
+    finally:
+        os.remove(chunk_path)
+
+    for segment in result["segments"]:
+        segment["start"] += start
+        segment["end"] += start
+    return result
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def transcribe(path: str, language: Optional[str] = None) -> Dict:
+    """
+    Transcribe an audio or video file of any length.
+
+    The audio track is split on pauses into chunks of at most
+    TRANSCRIBE_CHUNK_SECONDS, which are transcribed concurrently, so a long
+    recording takes about as long as its slowest chunk. Returns the plain
+    text, the text with a timestamp per segment, the segments, the duration
+    and the number of chunks.
+    """
+    if not ffmpeg_available():
+        # Without ffmpeg the file goes to Whisper as is (must be under its size limit)
+        print("Warning: ffmpeg not found, transcribing without chunking")
+        result = _transcribe_file(path, language)
+        chunks = [result]
+        duration = result["segments"][-1]["end"] if result["segments"] else 0.0
+    else:
+        duration, silences = analyze_audio(path)
+        # Unknown duration: one chunk, still demuxed and re-encoded
+        spans = plan_chunks(duration, silences) if duration else [(0.0, None)]
+        with ThreadPoolExecutor(max_workers=min(TRANSCRIBE_PARALLELISM, len(spans))) as executor:
+            chunks = list(executor.map(lambda span: _transcribe_chunk(path, *span, language), spans))
+
+    segments = [segment for chunk in chunks for segment in chunk["segments"]]
+    text = " ".join(chunk["text"] for chunk in chunks if chunk["text"])
+    timestamped_text = "\n".join(
+        f"[{format_timestamp(segment['start'])}] {segment['text']}"
+        for segment in segments if segment["text"]
+    )
+    return {
+        "text": text,
+        "timestamped_text": timestamped_text or text,
+        "segments": segments,
+        "duration": duration,
+        "chunks": len(chunks)
+    }
@@ -0,0 +1,210 @@
+"""Translation with offline language detection and a shared Redis cache"""
+import hashlib
+import re
+import time
+import unicodedata
+from typing import Optional
+
+import google.generativeai as genai
+import redis
+
+from tasks import providers
+from core.config import REDIS_URL, TRANSLATION_CACHE_TTL, TRANSLATION_CACHE_MAX_ENTRIES
+
+LANGUAGE_NAMES = {
+    "en": "English",
+    "ru": "Russian",
+    "es": "Spanish",
+    "fr": "French",
+    "de": "German",
+    "it": "Italian",
+    "pt": "Portuguese",
+    "zh": "Chinese",
+    "ja": "Japanese",
+    "ko": "Korean"
+}
+
+# Scripts that identify the language on their own (checked in this order,
+# so kana wins over Han for Japanese)
+_SCRIPTS = (
+    ("ja", re.compile(r'[\u3040-\u30FF]')),
+    ("ko", re.compile(r'[\uAC00-\uD7AF\u1100-\u11FF]')),
+    ("zh", re.compile(r'[\u4E00-\u9FFF]')),
+    ("ru", re.compile(r'[\u0400-\u04FF]')),
+    ("el", re.compile(r'[\u0370-\u03FF]')),
+    ("ar", re.compile(r'[\u0600-\u06FF]')),
+    ("he", re.compile(r'[\u0590-\u05FF]')),
+    ("hi", re.compile(r'[\u0900-\u097F]')),
+    ("th", re.compile(r'[\u0E00-\u0E7F]')),
+)
+_UKRAINIAN_RE = re.compile(r'[іїєґІЇЄҐ]')
+
+# Frequent function words for Latin-script languages
+_STOPWORDS = {
+    "en": {"the", "and", "of", "to", "in", "is", "with", "for", "on", "a", "an", "at", "it", "this", "that", "by", "from", "are"},
+    "es": {"el", "la", "los", "las", "de", "del", "y", "en", "con", "por", "para", "una", "un", "que", "es", "muy", "sobre"},
+    "fr": {"le", "la", "les", "des", "du", "et", "est", "dans", "avec", "pour", "une", "un", "sur", "que", "au", "aux"},
+    "de": {"der", "die", "das", "und", "ist", "mit", "ein", "eine", "auf", "für", "im", "den", "dem", "von", "zu", "nicht"},
+    "it": {"il", "lo", "gli", "della", "di", "e", "che", "con", "per", "una", "un", "nel", "sul", "sono", "del"},
+    "pt": {"o", "os", "as", "do", "da", "dos", "das", "e", "em", "com", "para", "uma", "um", "que", "não", "no", "na"},
+}
+
+# Letters that only show up in some Latin-script languages
+_DIACRITICS = {
+    "es": set("ñ¿¡"),
+    "fr": set("œæëÿ"),
+    "de": set("ßäöü"),
+    "pt": set("ãõ"),
+    "it": set(),
+}
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_LETTER_RE = re.compile(r"[^\W\d_]")
+
+# Share of letters from a non-Latin script that decides the language
+_SCRIPT_SHARE = 0.2
+
+
+def detect_language(text: str, default: str = "en", script_share: float = _SCRIPT_SHARE) -> Optional[str]:
+    """
+    Guess the language of text without calling a model.
+
+    Non-Latin scripts are detected by Unicode range, Latin text by function
+    words and language-specific letters. Latin text with no evidence either
+    way (e.g. short image prompts) gets `default`. Returns None if the text
+    has no letters.
+
+    script_share is the share of letters a non-Latin script needs; with 0
+    a single foreign word makes a mixed text count as that language.
+    """
+    letters = _LETTER_RE.findall(text)
+    if not letters:
+        return None
+
+    for code, pattern in _SCRIPTS:
+        count = len(pattern.findall(text))
+        if count and count / len(letters) >= script_share:
+            if code == "ru" and _UKRAINIAN_RE.search(text):
+                return "uk"
+            return code
+
+    lowered = text.lower()
+    words = _WORD_RE.findall(lowered)
+    scores = {code: sum(1 for w in words if w in stopwords) for code, stopwords in _STOPWORDS.items()}
+    for code, chars in _DIACRITICS.items():
+        if any(c in chars for c in lowered):
+            scores[code] += 2
+
+    best = max(scores, key=scores.get)
+    if scores[best] == 0:
+        return default
+    if scores[best] <= scores["en"]:
+        return "en"
+    return best
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used as cache key"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class TranslationCache:
+    """
+    Translations in Redis keyed by target language and normalized text.
+
+    Entries have a sliding TTL and a sorted-set index of last access, so
+    the least recently used entries are evicted beyond max_entries.
+    """
+
+    INDEX_KEY = "translation:lru"
+
+    def __init__(self, ttl: int = TRANSLATION_CACHE_TTL, max_entries: int = TRANSLATION_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._redis: Optional[redis.Redis] = None
+
+    def _get_redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(REDIS_URL, decode_responses=True, socket_keepalive=True)
+        return self._redis
+
+    @staticmethod
+    def _key(text: str, target_language: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"translation:{target_language}:{digest}"
+
+    def get(self, text: str, target_language: str) -> Optional[str]:
+        key = self._key(text, target_language)
+        pipe = self._get_redis().pipeline()
+        pipe.getex(key, ex=self.ttl)
+        pipe.zadd(self.INDEX_KEY, {key: time.time()}, xx=True)
+        translated, _ = pipe.execute()
+        return translated
+
+    def set(self, text: str, target_language: str, translated: str):
+        key = self._key(text, target_language)
+        client = self._get_redis()
+        pipe = client.pipeline()
+        pipe.set(key, translated, ex=self.ttl)
+        pipe.zadd(self.INDEX_KEY, {key: time.time()})
+        pipe.zcard(self.INDEX_KEY)
+        size = pipe.execute()[-1]
+
+        overflow = size - self.max_entries
+        if overflow > 0:
+            evicted = [member for member, _ in client.zpopmin(self.INDEX_KEY, overflow)]
+            if evicted:
+                client.delete(*evicted)
+
+
+translation_cache = TranslationCache()
+
+
+def translate(text: str, target_language: str = "en", assume_english: bool = True) -> str:
+    """
+    Translate text, skipping the model if it is already in the target language.
+
+    assume_english treats Latin text without language evidence as English
+    (right for image prompts, too eager for explicit translation requests).
+    When translating to English, any non-Latin word triggers translation
+    so mixed prompts are not passed through half-untranslated.
+    Raises on API errors.
+    """
+    detected = detect_language(
+        text,
+        default="en" if assume_english else "",
+        script_share=0 if target_language == "en" else _SCRIPT_SHARE
+    )
+    if detected is None or detected == target_language:
+        return text
+
+    try:
+        cached = translation_cache.get(text, target_language)
+    except redis.RedisError as e:
+        print(f"Warning: Translation cache unavailable: {e}")
+        cached = None
+    if cached is not None:
+        return cached
+
+    target_lang_name = LANGUAGE_NAMES.get(target_language, target_language)
+    translation_prompt = f"""Translate the following text to {target_lang_name}.
+Return ONLY the translation, nothing else. Maintain the tone and style.
+
+Text to translate:
+{text}"""
+
+    response = providers.gemini().generate_content(
+        contents=[{"role": "user", "parts": [{"text": translation_prompt}]}],
+        generation_config=genai.types.GenerationConfig(
+            temperature=0.3,  # Low temperature for accurate translation
+            max_output_tokens=2048,
+        ),
+        request_options=providers.GEMINI_REQUEST_OPTIONS
+    )
+    translated = response.text.strip()
+
+    try:
+        translation_cache.set(text, target_language, translated)
+    except redis.RedisError as e:
+        print(f"Warning: Failed to cache translation: {e}")
+    return translated
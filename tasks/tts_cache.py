@@ -0,0 +1,47 @@
+"""Cache of synthesized voiceovers: (text, model, voice, speed) -> audio blob"""
+import hashlib
+import unicodedata
+from typing import Optional
+
+import redis
+
+from core.config import REDIS_URL, TTS_CACHE_TTL, BLOB_TTL
+from tasks.blob_store import get_blob_store
+
+
+class TTSCache:
+    """
+    Blob references of generated audio in Redis.
+
+    The audio itself stays in the blob store; an entry is only served
+    while its blob still exists, and a hit restarts the expiry of both.
+    """
+
+    def __init__(self, ttl: int = TTS_CACHE_TTL):
+        # An entry must not outlive the blob it points to
+        self.ttl = min(ttl, BLOB_TTL)
+        self._redis: Optional[redis.Redis] = None
+
+    def _get_redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(REDIS_URL, decode_responses=True, socket_keepalive=True)
+        return self._redis
+
+    @staticmethod
+    def _key(text: str, model: str, voice: str, speed: float) -> str:
+        # Only NFC: whitespace and line breaks change the pauses, so they are part of the key
+        digest = hashlib.sha256(unicodedata.normalize("NFC", text).encode("utf-8")).hexdigest()
+        return f"tts:{model}:{voice}:{float(speed):g}:{digest}"
+
+    def get(self, text: str, model: str, voice: str, speed: float) -> Optional[str]:
+        key = self._key(text, model, voice, speed)
+        audio_ref = self._get_redis().getex(key, ex=self.ttl)
+        if audio_ref and get_blob_store().touch(audio_ref):
+            return audio_ref
+        return None
+
+    def set(self, text: str, model: str, voice: str, speed: float, audio_ref: str):
+        self._get_redis().set(self._key(text, model, voice, speed), audio_ref, ex=self.ttl)
+
+
+tts_cache = TTSCache()